@@ -0,0 +1,185 @@
+"""Command-line batch mode: process directory trees or image lists into a JSONL file, resumably.
+
+    python batch.py C:/scans --output results.jsonl
+    python batch.py C:/scans --output results-0.jsonl --shard 0/4
+
+Each line of the output is one image (or one page of a multi-page TIFF) with the
+fields of the folder API plus its path. Rerunning the same command after a crash
+or Ctrl-C skips every image already in the output. With --shard i/n an invocation
+takes only the images whose path relative to the input root hashes to shard i, so
+n invocations with distinct outputs split one tree between them.
+
+An image on which a pipeline stage failed, or whose task timed out, is written as
+an error line. --retry-errors runs those images again and appends their new line,
+so an image can appear twice in the output; its last line is the one that counts.
+"""
+import os, sys
+import gc
+import time
+import argparse
+import multiprocessing
+import toml
+from functools import partial
+from src.logger import setup_logger, start_log_writer
+from src.worker_pool import WorkerPool, TaskError, process_image_with_path
+from src.batch_checkpoint import BatchCheckpoint, CheckpointMismatch, shard_of
+from src.image_source import expand_pages
+from src.manifest import IMAGE_EXTENSIONS
+from src.rules import RULES
+from src.model_registry import get_model_registry
+from src.cpu_budget import CpuBudget
+
+config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'config', 'config.toml'))
+config = toml.load(config_path)
+nlp_model_path = config['paths']['nlp_model']
+
+logger = setup_logger()
+
+
+def parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/n, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..n-1, got {value!r}")
+    return index, count
+
+
+def find_images(inputs, shard):
+    """Yield (key, image path) for every image of this shard, in a stable order.
+
+    Directories are walked like DirectoryProcessor; files are checked like
+    ImageListProcessor. The key of an image under a directory is its path relative
+    to that directory, so shards agree wherever the tree is mounted.
+    """
+    index, count = shard
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        image_path = os.path.join(root, filename)
+                        key = os.path.relpath(image_path, path).replace(os.sep, "/")
+                        if shard_of(key, count) == index:
+                            yield key, image_path
+        elif os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+            key = os.path.abspath(path)
+            if shard_of(key, count) == index:
+                yield key, path
+        else:
+            raise ValueError(f"Invalid image path: {path}")
+
+
+def work_items(images, done, keys):
+    """Yield the pages still to process, recording each page's checkpoint key in keys."""
+    for key, image_path in images:
+        for item in expand_pages([image_path]):
+            # Pages of a multi-page file share its key plus the page suffix.
+            item_key = key + item[len(image_path):]
+            if item_key not in done:
+                keys[item] = item_key
+                yield item
+
+
+def result_record(item, key_value_pairs=None, error=None):
+    record = {
+        "folder_name": os.path.basename(os.path.dirname(item)),
+        "image_filename": os.path.basename(item),
+        "image_path": item,
+    }
+    if error is None:
+        record["key_value_pairs"] = key_value_pairs
+    else:
+        record["error"] = error
+    return record
+
+
+def create_worker_pool(processes=0, models=()):
+    """The warm worker pool set up as the app sets it up, for command-line runs; call once in the parent."""
+    cache_config = config.get('cache', {})
+    cache_settings = None
+    if cache_config.get('enabled', True):
+        cache_settings = {
+            "db_path": os.path.abspath(os.path.join(os.path.dirname(__file__), cache_config.get('db_path', 'cache/results.sqlite'))),
+            "max_size_mb": cache_config.get('max_size_mb', 512),
+        }
+    cpu_config = dict(config.get('cpu', {}))
+    if processes:
+        cpu_config['processes'] = processes
+    cpu_budget = CpuBudget.from_config(cpu_config)
+    cpu_budget.apply()
+
+    log_queue = start_log_writer()
+    task_timeout = config.get('workers', {}).get('task_timeout', 600)
+    # Forked workers inherit pipelines preloaded here and share them copy-on-write; keep them out of the
+    # GC's reach. Spawned workers (Windows, macOS) load their own copy, so preloading would only cost time.
+    if multiprocessing.get_start_method() == "fork":
+        get_model_registry().preload([nlp_model_path] + list(models) + config.get('models', {}).get('preload', []))
+        gc.freeze()
+    return WorkerPool(cpu_budget.processes, nlp_model_path, RULES.noise_characters, cache_settings, cpu_budget,
+                      log_queue=log_queue, task_timeout=task_timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process directory trees or images into a JSONL file, resuming after interruptions.")
+    parser.add_argument("inputs", nargs="+", help="directories to walk and/or image files")
+    parser.add_argument("--output", required=True, help="JSONL results file, appended to as images complete")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="process only shard i of n, 0-based (e.g. 2/4)")
+    parser.add_argument("--model", help="model name or path from the model registry (default: routed per document type)")
+    parser.add_argument("--processes", type=int, default=0, help="pool workers (default: [cpu] processes)")
+    parser.add_argument("--restart", action="store_true", help="discard the output and checkpoint and start over")
+    parser.add_argument("--retry-errors", action="store_true", help="process images that failed on earlier runs again; their new line is appended after the old error line")
+    args = parser.parse_args()
+
+    model_registry = get_model_registry()
+    try:
+        model = model_registry.resolve(args.model) if args.model else None
+    except KeyError as e:
+        parser.error(str(e))
+
+    run = {"inputs": [os.path.abspath(path) for path in args.inputs], "shard": list(args.shard), "model": model}
+    checkpoint = BatchCheckpoint(args.output, args.checkpoint, run)
+    try:
+        done = checkpoint.open(restart=args.restart, retry_errors=args.retry_errors)
+    except CheckpointMismatch as e:
+        parser.error(str(e))
+
+    worker_pool = create_worker_pool(args.processes, [model] if model else [])
+    keys = {}
+    processed = failed = 0
+    start_time = time.time()
+    try:
+        items = work_items(find_images(args.inputs, args.shard), done, keys)
+        for result in worker_pool.iter_unordered(partial(process_image_with_path, model=model, strict=True), items):
+            if isinstance(result, TaskError):
+                logger.error(f"Error processing {result.item}: {result.error}")
+                checkpoint.record(keys.pop(result.item), result_record(result.item, error=str(result.error)), ok=False)
+                failed += 1
+            else:
+                item = result["image_path"]
+                checkpoint.record(keys.pop(item), result_record(item, result["key_value_pairs"]))
+                processed += 1
+    except KeyboardInterrupt:
+        worker_pool.terminate()
+        logger.info(f"Interrupted after {processed + failed} images; rerun the same command to resume.")
+        print(f"Interrupted: {processed} processed, {failed} failed this run; rerun to resume.", file=sys.stderr)
+        return 130
+    except ValueError as e:
+        worker_pool.terminate()
+        parser.error(str(e))
+    finally:
+        checkpoint.close()
+
+    worker_pool.close()
+    total_time = time.time() - start_time
+    logger.info(f"Batch run into {args.output}: {processed} processed, {failed} failed, {len(done)} already done, "
+                f"in {total_time:.2f} seconds")
+    print(f"{processed} processed, {failed} failed, {len(done)} skipped as already done in {total_time:.1f} s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
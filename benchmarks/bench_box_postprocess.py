@@ -0,0 +1,65 @@
+import os, sys
+import time
+import argparse
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.textdetector import (non_max_suppression_legacy, fast_non_max_suppression,
+                              group_boxes_dilate, group_boxes)
+
+
+def synthetic_candidates(count, width, height, seed=0):
+    """EAST-like candidates: clusters of jittered, overlapping word boxes along text lines."""
+    rng = np.random.default_rng(seed)
+    words = max(1, count // 8)
+    cx = rng.integers(0, width, words)
+    cy = (rng.integers(0, height // 40, words) * 40 + 20)
+    ww = rng.integers(20, 160, words)
+    hh = rng.integers(12, 30, words)
+    owner = rng.integers(0, words, count)
+    jitter = rng.normal(0, 3, (count, 4))
+    x1 = cx[owner] - ww[owner] // 2 + jitter[:, 0]
+    y1 = cy[owner] - hh[owner] // 2 + jitter[:, 1]
+    x2 = np.maximum(cx[owner] + ww[owner] // 2 + jitter[:, 2], x1)
+    y2 = np.maximum(cy[owner] + hh[owner] // 2 + jitter[:, 3], y1)
+    boxes = np.stack([x1, y1, x2, y2], axis=1).astype(int)
+    probs = rng.random(count).astype(np.float32) * 0.5 + 0.5
+    return boxes, list(probs)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity check and benchmark for EAST box post-processing.")
+    parser.add_argument("--width", type=int, default=2528)
+    parser.add_argument("--height", type=int, default=3296)
+    parser.add_argument("--padding", type=int, default=5)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 5000, 10000, 20000])
+    args = parser.parse_args()
+
+    for count in args.counts:
+        boxes, probs = synthetic_candidates(count, args.width, args.height)
+
+        legacy_nms, legacy_kept = timed(lambda: non_max_suppression_legacy(boxes, probs))
+        fast_nms, fast_kept = timed(lambda: fast_non_max_suppression(boxes, probs))
+        if sorted(map(tuple, legacy_kept.tolist())) != sorted(map(tuple, fast_kept.tolist())):
+            print(f"NMS parity FAILED at {count} boxes")
+            sys.exit(1)
+
+        # Group the raw candidates too, so grouping is measured at the full box count.
+        legacy_group, legacy_regions = timed(lambda: group_boxes_dilate(boxes, args.width, args.height, args.padding))
+        fast_group, fast_regions = timed(lambda: group_boxes(boxes, args.width, args.height, args.padding))
+        if sorted(legacy_regions) != sorted(fast_regions):
+            print(f"Grouping parity FAILED at {count} boxes")
+            sys.exit(1)
+
+        print(f"boxes={count:6d} kept={len(fast_kept):5d} regions={len(fast_regions):4d}  "
+              f"nms legacy={legacy_nms * 1000:9.1f} ms fast={fast_nms * 1000:7.1f} ms  "
+              f"group legacy={legacy_group * 1000:7.1f} ms fast={fast_group * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os, sys
+import time
+import argparse
+import logging
+import toml
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.cpu_budget import CpuBudget
+from src.worker_pool import WorkerPool, process_image
+from src.rules import RULES
+
+TEXT_NOISE = RULES.noise_characters
+
+
+def parse_split(value):
+    """'P:O:C' -> processes, OCR threads per worker, OpenCV threads per worker."""
+    processes, ocr_threads, opencv_threads = (int(part) for part in value.split(":"))
+    return processes, ocr_threads, opencv_threads
+
+
+def main():
+    config = toml.load(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
+    parser = argparse.ArgumentParser(description="Throughput of the image pipeline for different CPU budget splits.")
+    parser.add_argument("images", help="Folder of images to process for every split")
+    parser.add_argument("--model", default=config['paths']['nlp_model'])
+    parser.add_argument("--cores", type=int, default=os.cpu_count())
+    parser.add_argument("--splits", nargs="+", type=parse_split,
+                        help="Splits as P:O:C; defaults to the auto split plus a sweep of worker counts")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the folder per split; the first warms the pool")
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    image_paths = [os.path.join(root, name) for root, _, files in os.walk(args.images) for name in files
+                   if name.lower().endswith(('.png', '.jpg', '.jpeg', '.tif'))]
+    if not image_paths:
+        sys.exit(f"No images found under {args.images}")
+
+    auto = CpuBudget(total_cores=args.cores)
+    splits = args.splits or sorted({(auto.processes, auto.ocr_threads, auto.opencv_threads)} | {
+        (processes, max(1, args.cores // processes), max(1, args.cores // processes))
+        for processes in (1, 2, 4, 8, 12, 16, 24, 32) if processes <= args.cores
+    })
+
+    print(f"{len(image_paths)} images, {args.cores} cores, auto split {auto.as_dict()}")
+    for processes, ocr_threads, opencv_threads in splits:
+        budget = CpuBudget(total_cores=args.cores, processes=processes,
+                           ocr_threads=ocr_threads, opencv_threads=opencv_threads)
+        pool = WorkerPool(processes, args.model, TEXT_NOISE, cpu_budget=budget).start()
+        try:
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                pool.map(process_image, image_paths)
+                elapsed = time.perf_counter() - start
+        finally:
+            pool.close()
+        print(f"processes={processes:3d} ocr_threads={ocr_threads:3d} opencv_threads={opencv_threads:3d}  "
+              f"{len(image_paths) / elapsed:7.2f} images/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os, sys
+import time
+import random
+import resource
+import argparse
+import logging
+import tempfile
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.image_filter import LinesFilter
+from src.duplicate_index import DuplicateIndex, hamming
+from benchmarks.synthetic_forms import generate_form
+
+
+def rescan(image, seed, rotation=0.2, shift=40):
+    """The page as a rescan: offset, slightly rotated and scaled, with exposure change and sensor noise."""
+    rng = np.random.default_rng(seed)
+    dy, dx = rng.integers(-shift, shift + 1, size=2)
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), rng.uniform(-rotation, rotation), rng.uniform(0.99, 1.01))
+    matrix[:, 2] += (dx, dy)
+    out = cv2.warpAffine(image, matrix, (width, height), borderValue=(255, 255, 255))
+    return np.clip(out.astype(np.float32) * rng.uniform(0.9, 1.05) + rng.normal(0, 8, out.shape), 0, 255).astype(np.uint8)
+
+
+def bench_lookup(entries, radius, bits, queries):
+    """Radius search latency over entries hashes in the SQLite index: random pages plus clusters of near-identical ones."""
+    rng = random.Random(0)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="doc_ai_dups_"), "duplicates.sqlite")
+    index = DuplicateIndex(db_path, max_distance=radius, hash_size=int(bits ** 0.5), max_size_mb=1 << 20)
+    # The lookup never reads the mask; a blank one keeps the build fast.
+    mask = np.zeros((index.mask_size, index.mask_size), bool)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    codes = []
+    start = time.perf_counter()
+    for key in range(entries):
+        if codes and rng.random() < 0.3:
+            # A variant of an earlier page: a few bits flipped.
+            code = rng.choice(codes)
+            for _ in range(rng.randint(1, radius)):
+                code ^= 1 << rng.randrange(bits)
+        else:
+            code = rng.getrandbits(bits)
+        codes.append(code)
+        index.add((code, mask), "bench", {})
+    build = time.perf_counter() - start
+
+    probes = []
+    for _ in range(queries):
+        code = rng.choice(codes)
+        for _ in range(rng.randint(0, radius)):
+            code ^= 1 << rng.randrange(bits)
+        probes.append(code)
+    misses = [rng.getrandbits(bits) for _ in range(queries)]
+
+    start = time.perf_counter()
+    found = sum(1 for code in probes if index.search(code, "bench"))
+    hit_time = (time.perf_counter() - start) / queries
+    start = time.perf_counter()
+    for code in misses:
+        index.search(code, "bench")
+    miss_time = (time.perf_counter() - start) / queries
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    # Exactness on a sample: the multi-index result equals a linear scan (page ids start at 1).
+    for code in probes[:20]:
+        expected = sorted((hamming(code, other), key + 1) for key, other in enumerate(codes) if hamming(code, other) <= radius)
+        assert index.search(code, "bench") == expected
+    file_size = sum(os.path.getsize(db_path + suffix) for suffix in ("", "-wal") if os.path.exists(db_path + suffix))
+    return build, hit_time, miss_time, found / queries, file_size, rss_growth * 1024
+
+
+def bench_accuracy(forms, rescans, width, height):
+    """Near-duplicate decisions on rescans of filled forms and on other filled copies of the same form."""
+    line_filter = LinesFilter(method="fill")
+    db_path = os.path.join(tempfile.mkdtemp(prefix="doc_ai_dups_"), "duplicates.sqlite")
+    index = DuplicateIndex(db_path)
+
+    def filtered(image):
+        page = line_filter.apply_filter(image)
+        return page if page.ndim == 2 else cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
+
+    found, false_matches, signature_times = 0, 0, []
+    originals = [generate_form(seed=seed, layout_seed=0, width=width, height=height)[0] for seed in range(forms)]
+    for seed, image in enumerate(originals):
+        page = filtered(image)
+        start = time.perf_counter()
+        signature = index.signature(page)
+        signature_times.append(time.perf_counter() - start)
+        if index.find(signature, "bench") is not None:
+            false_matches += 1
+        index.add(signature, "bench", {"form": seed})
+
+    for seed, image in enumerate(originals):
+        for copy in range(rescans):
+            duplicate = index.find(index.signature(filtered(rescan(image, seed * 100 + copy))), "bench")
+            if duplicate is None:
+                continue
+            if duplicate[1] == {"form": seed}:
+                found += 1
+            else:
+                false_matches += 1
+    return found / (forms * rescans), false_matches, float(np.mean(signature_times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookup latency and accuracy of the near-duplicate page index.")
+    parser.add_argument("--entries", type=int, default=100000, help="hashes in the latency test (try 1000000)")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--radius", type=int, default=10)
+    parser.add_argument("--forms", type=int, default=8, help="filled copies of one form in the accuracy test")
+    parser.add_argument("--rescans", type=int, default=3, help="rescans per filled copy")
+    parser.add_argument("--width", type=int, default=2550)
+    parser.add_argument("--height", type=int, default=3300)
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    build, hit_time, miss_time, hit_rate, file_size, rss_growth = bench_lookup(args.entries, args.radius, 256, args.queries)
+    print(f"multi-index hashing in SQLite, {args.entries} x 256-bit hashes, radius {args.radius}")
+    print(f"  build {build:.1f} s   lookup {hit_time * 1e6:.0f} us (near a stored hash), {miss_time * 1e6:.0f} us (new page)"
+          f"   found {hit_rate:.1%}")
+    print(f"  file {file_size / args.entries:.0f} bytes/page (blank masks)   process memory growth {rss_growth / (1024 * 1024):.0f} MB")
+
+    recall, false_matches, signature_time = bench_accuracy(args.forms, args.rescans, args.width, args.height)
+    print(f"{args.forms} filled copies of one form, {args.rescans} rescans each, at {args.width}x{args.height}")
+    print(f"  signature {signature_time * 1000:.1f} ms/page   rescans found {recall:.1%}   false matches {false_matches}")
+
+
+if __name__ == "__main__":
+    main()
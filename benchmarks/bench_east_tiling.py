@@ -0,0 +1,93 @@
+import os, sys
+import time
+import argparse
+import logging
+import multiprocessing
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.synthetic_forms import generate_form
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+
+def box_iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def match_rate(reference, boxes, threshold=0.5):
+    """Fraction of reference boxes that have a box with IoU >= threshold."""
+    if not reference:
+        return 1.0
+    return sum(any(box_iou(ref, box) >= threshold for box in boxes) for ref in reference) / len(reference)
+
+
+def measure(model, size, detector_options, repeats, queue):
+    """Run in a fresh process so ru_maxrss is the peak of this configuration alone."""
+    from src import textdetector
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+    textdetector.east_model_path = model
+    detector = textdetector.EASTTextDetection(**detector_options)
+    width, height = size
+    page, _ = generate_form(seed=0, width=width, height=height)
+    page = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _, boxes = detector.detect_text_areas(page)
+        timings.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    queue.put((min(timings), boxes, peak, before))
+
+
+def run_isolated(model, size, detector_options, repeats):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure, args=(model, size, detector_options, repeats, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def parse_size(value):
+    width, height = (int(part) for part in value.lower().split("x"))
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EAST latency, peak memory and box agreement: single pass vs max_side cap vs tiles.")
+    parser.add_argument("--model", required=True, help="Path to frozen_east_text_detection.pb")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(1700, 2200), (2550, 3300), (5000, 7000)])
+    parser.add_argument("--max-side", type=int, default=2560)
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--tile-overlap", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=2)
+    args = parser.parse_args()
+
+    modes = {
+        "single": {"max_side": 0, "tile_size": 0},
+        f"max_side={args.max_side}": {"max_side": args.max_side, "tile_size": 0},
+        f"tiles={args.tile_size}/{args.tile_overlap}": {"max_side": 0, "tile_size": args.tile_size, "tile_overlap": args.tile_overlap},
+    }
+    print(f"{'page':>10s} {'mode':>16s} {'ms':>9s} {'peak MB':>9s} {'boxes':>6s} {'match':>6s}")
+    for size in args.sizes:
+        reference = None
+        for name, options in modes.items():
+            elapsed, boxes, peak, _ = run_isolated(args.model, size, options, args.repeats)
+            if reference is None:
+                reference = boxes
+            peak_mb = f"{peak / 1024:9.0f}" if peak is not None else f"{'n/a':>9s}"
+            print(f"{size[0]:>4d}x{size[1]:<5d} {name:>16s} {elapsed * 1000:9.1f} {peak_mb} {len(boxes):6d} "
+                  f"{match_rate(reference, boxes):6.3f}")
+
+
+if __name__ == "__main__":
+    main()
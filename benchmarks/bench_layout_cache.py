@@ -0,0 +1,82 @@
+import os, sys
+import time
+import argparse
+import logging
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.image_filter import LinesFilter
+from src.layout_cache import LayoutCache
+from benchmarks.synthetic_forms import generate_form
+
+
+def ink_boxes(img):
+    """Stand-in for EAST: bounding boxes of the ink blobs of a filtered page, dilated into words and lines."""
+    _, bw = cv2.threshold(img, 128, 255, cv2.THRESH_BINARY_INV)
+    bw = cv2.morphologyEx(bw, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    bw = cv2.dilate(bw, np.ones((5, 25), np.uint8))
+    contours, _ = cv2.findContours(bw, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [(x, y, x + w, y + h) for x, y, w, h in map(cv2.boundingRect, contours) if w * h > 200]
+
+
+def coverage(cached, detected, tolerance=4):
+    """Fraction of detected boxes that lie inside some cached box."""
+    inside = [any(c[0] <= d[0] + tolerance and c[1] <= d[1] + tolerance and c[2] >= d[2] - tolerance and c[3] >= d[3] - tolerance
+                  for c in cached) for d in detected]
+    return float(np.mean(inside)) if inside else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hit rate, false matches and box coverage of LayoutCache on synthetic filled forms.")
+    parser.add_argument("--layouts", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=10, help="filled pages per layout")
+    parser.add_argument("--width", type=int, default=2550)
+    parser.add_argument("--height", type=int, default=3300)
+    parser.add_argument("--shift", type=int, default=40, help="largest scan offset in pixels")
+    parser.add_argument("--min-observations", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    rng = np.random.default_rng(0)
+    line_filter = LinesFilter(method="fill")
+    cache = LayoutCache(min_observations=args.min_observations)
+    templates = {}
+    match_times, detect_times, coverages = [], [], []
+    hits = false_matches = 0
+
+    # Pages of all layouts interleaved, as they arrive in a mixed folder.
+    pages = [(page, layout) for page in range(args.pages) for layout in range(args.layouts)]
+    for page, layout in pages:
+        image, _ = generate_form(seed=layout * 1000 + page, layout_seed=layout, width=args.width, height=args.height)
+        dy, dx = rng.integers(-args.shift, args.shift + 1, size=2)
+        image = np.roll(image, (dy, dx), axis=(0, 1))
+        filtered = line_filter.apply_filter(image)
+
+        start = time.perf_counter()
+        template, boxes = cache.match(filtered)
+        match_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        detected = ink_boxes(filtered)
+        detect_times.append(time.perf_counter() - start)
+
+        if template is None:
+            cache.learn(filtered, detected, f"LAYOUT{layout}")
+            templates.setdefault(f"LAYOUT{layout}", layout)
+        elif template.document_type != f"LAYOUT{layout}":
+            false_matches += 1
+        else:
+            hits += 1
+            coverages.append(coverage(boxes, detected))
+
+    total = len(pages)
+    learning = args.layouts * args.min_observations
+    print(f"{args.layouts} layouts x {args.pages} pages at {args.width}x{args.height}, offsets up to {args.shift}px")
+    print(f"match: {np.mean(match_times) * 1000:.1f} ms/page   ink-box detection stand-in: {np.mean(detect_times) * 1000:.1f} ms/page")
+    print(f"hits: {hits}/{total} ({hits / total:.1%}; {hits / max(total - learning, 1):.1%} after the {learning} learning pages)")
+    print(f"false matches: {false_matches}")
+    print(f"detected boxes covered by cached boxes on hits: {np.mean(coverages) if coverages else float('nan'):.4f}")
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os, sys
+import time
+import argparse
+import logging
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.image_filter import LinesFilter
+from benchmarks.synthetic_forms import generate_form
+
+
+def ink(img):
+    """Ink mask of a filter output (black text on white)."""
+    return img < 128
+
+
+def reference_ink(clean):
+    """Ink mask of the same form rendered without table rules, binarized the way LinesFilter does."""
+    gray = cv2.cvtColor(clean, cv2.COLOR_BGR2GRAY)
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_OTSU | cv2.THRESH_BINARY_INV)
+    return bw > 0
+
+
+def score(output, text_ink, line_ink):
+    """Text recall, residual line ink and F1 of output ink against the rule-free reference."""
+    out = ink(output)
+    kept = np.count_nonzero(out & text_ink)
+    recall = kept / max(np.count_nonzero(text_ink), 1)
+    precision = kept / max(np.count_nonzero(out), 1)
+    residual = np.count_nonzero(out & line_ink) / max(np.count_nonzero(line_ink), 1)
+    f1 = 2 * precision * recall / max(precision + recall, 1e-9)
+    return recall, residual, f1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed and accuracy of LinesFilter line removal modes on synthetic forms.")
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--width", type=int, default=2550)
+    parser.add_argument("--height", type=int, default=3300)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--scales", nargs="+", type=float, default=[1.0, 0.5, 0.25],
+                        help="detect_scale values to try with the fill method")
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    modes = [("inpaint", 1.0)] + [("fill", scale) for scale in args.scales]
+    filters = {mode: LinesFilter(method=mode[0], detect_scale=mode[1]) for mode in modes}
+    rows = {mode: [] for mode in modes}
+
+    for seed in range(args.count):
+        ruled, _ = generate_form(seed=seed, width=args.width, height=args.height, noise=args.noise)
+        clean, _ = generate_form(seed=seed, width=args.width, height=args.height, noise=args.noise, rules=False)
+        text_ink = reference_ink(clean)
+        # Line pixels are ruled-page ink that is not near any text ink.
+        line_ink = (reference_ink(ruled) & ~cv2.dilate(text_ink.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool))
+        outputs = {}
+        for mode, line_filter in filters.items():
+            start = time.perf_counter()
+            outputs[mode] = line_filter.apply_filter(ruled)
+            elapsed = time.perf_counter() - start
+            agreement = np.mean(ink(outputs[mode]) == ink(outputs[("inpaint", 1.0)])) if mode != ("inpaint", 1.0) else 1.0
+            rows[mode].append((elapsed, *score(outputs[mode], text_ink, line_ink), agreement))
+
+    print(f"{args.count} forms at {args.width}x{args.height}, noise={args.noise}")
+    print(f"{'mode':>14s} {'ms':>8s} {'text recall':>12s} {'line residual':>14s} {'ink F1':>8s} {'vs inpaint':>11s}")
+    for (method, scale), samples in rows.items():
+        elapsed, recall, residual, f1, agreement = np.mean(samples, axis=0)
+        print(f"{method + '@' + format(scale, 'g'):>14s} {elapsed * 1000:8.1f} {recall:12.4f} {residual:14.4f} {f1:8.4f} {agreement:11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os, sys
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+import multiprocessing
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import CallFileHandler, LogWriter, RecordQueueHandler
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def flushing_handler(logs_dir, max_size_mb):
+    """The previous behaviour: format, write and flush every record in the calling process."""
+    handler = CallFileHandler("Bench", max_size_mb, logs_dir)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    emit = handler.emit
+
+    def emit_and_flush(record):
+        emit(record)
+        handler.flush()
+    handler.emit = emit_and_flush
+    return handler
+
+
+def caller(mode, records, target, results):
+    """Runs in a child process, like a pool worker: CPU time of logger.info with the given handler.
+
+    Thread time is what the logging call costs the worker's processing thread;
+    process time adds the worker's own background threads (the log sender). CPU
+    time, unlike wall time, leaves out the parent's LogWriter, which shares the
+    CPU on small machines.
+    """
+    if mode == "direct":
+        handler = flushing_handler(target, 1.0)
+    elif mode == "queue":
+        handler = RecordQueueHandler(target)
+    else:
+        handler = logging.NullHandler()
+    logger = logging.getLogger("bench")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    thread_start, process_start = time.thread_time(), time.process_time()
+    for index in range(records):
+        logger.info(f"Text recognition completed. Recognized {index} text segments.")
+    handler.close()
+    results.put((mode, ((time.thread_time() - thread_start) / records, (time.process_time() - process_start) / records)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-record logging cost in a worker: direct file writes vs the queue writer.")
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--max-size-mb", type=float, default=1.0, help="Small, so the run also exercises rotation")
+    args = parser.parse_args()
+
+    logs_dir = tempfile.mkdtemp(prefix="doc_ai_logbench_")
+    results = multiprocessing.Queue()
+    try:
+        file_handler = CallFileHandler("Bench", args.max_size_mb, os.path.join(logs_dir, "queued"))
+        file_handler.setFormatter(logging.Formatter(FORMAT))
+        log_queue = multiprocessing.Queue()
+        writer = LogWriter(log_queue, [file_handler]).start()
+
+        costs = {}
+        for mode, target in (("none", None), ("direct", os.path.join(logs_dir, "direct")), ("queue", log_queue)):
+            process = multiprocessing.Process(target=caller, args=(mode, args.records, target, results))
+            process.start()
+            name, cost = results.get()
+            process.join()
+            costs[name] = cost
+
+        start = time.perf_counter()
+        writer.stop()
+        drain = time.perf_counter() - start
+        files = sorted(os.listdir(os.path.join(logs_dir, "queued")))
+        lines = sum(1 for name in files for _ in open(os.path.join(logs_dir, "queued", name)))
+
+        print(f"{'worker CPU per record':22s} {'caller thread':>14s} {'whole process':>14s}")
+        for name, label in (("none", "record creation only"), ("direct", "direct write+flush"), ("queue", "queue handler")):
+            thread_cost, process_cost = costs[name]
+            print(f"{label:22s} {thread_cost * 1e6:11.2f} us {process_cost * 1e6:11.2f} us")
+        print(f"writer wrote {lines} lines across {len(files)} rotated files; final drain took {drain:.2f} s")
+    finally:
+        shutil.rmtree(logs_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os, sys
+import time
+import random
+import argparse
+import logging
+import spacy
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.key_value_extractor import NLPKeyValueExtraction
+from src.rules import RULES
+
+TEXT_NOISE = RULES.noise_characters
+
+SAMPLE_LINES = [
+    "DATE OF BIRTH: 04/12/1987",
+    "DLN: S123-456-789-012",
+    "APPLICANT NAME: JOHN Q PUBLIC",
+    "TODAY'S DATE: 11/18/2024",
+    "MOTOR VEHICLE ADMINISTRATION",
+    "Health Questionnaire (DC-1234)",
+    "Driver Wellness & Safety",
+    "CITATION DATE 02/02/2023 NY REF ID 99812",
+    "COURT REPORT ID ACD CODE B21",
+    "REASON FOR CONVICTION SPEEDING",
+    "Do you have any medical condition that affects driving? YES NO",
+    "Signature of applicant ____________",
+]
+
+
+def load_pipeline(model_path):
+    """Load the packaged pipeline, or rebuild it from its config when weights are missing."""
+    try:
+        return spacy.load(model_path)
+    except (OSError, FileNotFoundError) as e:
+        print(f"Could not load weights from {model_path} ({e}); "
+              f"timing a freshly initialized pipeline built from its config.cfg instead.")
+        cfg = spacy.util.load_config(os.path.join(model_path, "config.cfg"))
+        nlp = spacy.util.load_model_from_config(cfg, auto_fill=True)
+        labels = spacy.util.load_meta(os.path.join(model_path, "meta.json"))["labels"]["ner"]
+        ner = nlp.get_pipe("ner")
+        for label in labels:
+            ner.add_label(label)
+        nlp.initialize()
+        return nlp
+
+
+def synthetic_pages(num_pages, lines_per_page, seed=0):
+    rng = random.Random(seed)
+    return [[rng.choice(SAMPLE_LINES) for _ in range(lines_per_page)] for _ in range(num_pages)]
+
+
+def per_line(extractor, pages):
+    results = []
+    for recognized_text in pages:
+        key_value_pairs = {}
+        for text in recognized_text:
+            extractor.merge_entities(key_value_pairs, extractor.nlp(extractor.text_noise_remover.remove_text_noise(text)))
+        results.append(key_value_pairs)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of per-line vs batched spaCy NER.")
+    parser.add_argument("--model", default=os.path.join(os.path.dirname(__file__), "..", "models", "model-best"))
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--lines-per-page", type=int, default=30)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    nlp = load_pipeline(os.path.abspath(args.model))
+    pages = synthetic_pages(args.pages, args.lines_per_page)
+    total_lines = args.pages * args.lines_per_page
+
+    extractor = NLPKeyValueExtraction(nlp, TEXT_NOISE)
+    start = time.perf_counter()
+    per_line(extractor, pages)
+    elapsed = time.perf_counter() - start
+    print(f"per-line              : {total_lines / elapsed:8.0f} lines/s")
+
+    for batch_size in args.batch_sizes:
+        extractor = NLPKeyValueExtraction(nlp, TEXT_NOISE, batch_size=batch_size)
+
+        start = time.perf_counter()
+        for recognized_text in pages:
+            extractor.extract_key_value_pairs(recognized_text)
+        page_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        extractor.extract_key_value_pairs_batch(pages)
+        job_elapsed = time.perf_counter() - start
+
+        print(f"batch_size={batch_size:<4d} page : {total_lines / page_elapsed:8.0f} lines/s   "
+              f"folder job : {total_lines / job_elapsed:8.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
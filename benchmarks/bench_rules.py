@@ -0,0 +1,79 @@
+import os, sys
+import re
+import time
+import random
+import argparse
+import logging
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.rules import RuleEngine, DocumentType, RULES
+
+WORDS = ["APPLICANT", "NAME", "DATE", "BIRTH", "LICENSE", "NUMBER", "COURT", "REPORT", "CITATION", "REASON",
+         "Health", "Questionnaire", "Driver", "Wellness", "Safety", "MOTOR", "VEHICLE", "ADMINISTRATION"]
+
+
+def synthetic_types(count, rng):
+    """The configured types plus count - 1 made-up ones, each with a form-number pattern and three keywords."""
+    types = list(RULES.document_types)
+    for index in range(len(types), count):
+        keywords = [" ".join(rng.choice(WORDS) for _ in range(3)) + f" {index}" for _ in range(3)]
+        types.append(DocumentType(f"T{index}", [rf"F{index:04d}[-\s]?\d{{3,4}}"], keywords))
+    return types[:count]
+
+
+def per_type_scan(lines, document_types):
+    """The previous approach generalised to many types: two searches per pattern and one substring test per keyword."""
+    scores = {}
+    for document_type in document_types:
+        score = 0
+        for text in lines:
+            for pattern in document_type.patterns:
+                if re.search(pattern, text):
+                    score += document_type.pattern_score
+                    re.search(pattern, text).group()
+            score += sum(document_type.keyword_score for keyword in document_type.keywords if keyword in text)
+        scores[document_type.name] = score
+    return scores
+
+
+def synthetic_page(rng, line_count):
+    lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 7))) + f": {rng.randint(0, 99999)}" for _ in range(line_count)]
+    lines[0] = "MOTOR VEHICLE ADMINISTRATION"
+    lines[1] = f"Form (DC-{rng.randint(100, 9999)})"
+    return lines
+
+
+def timed(fn, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            fn(page)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-page document typing cost as the number of document types grows.")
+    parser.add_argument("--types", type=int, nargs="+", default=[1, 2, 4, 8, 16, 100, 500])
+    parser.add_argument("--lines", type=int, default=40, help="OCR lines per page")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    rng = random.Random(0)
+    pages = [synthetic_page(rng, args.lines) for _ in range(args.pages)]
+    for count in args.types:
+        document_types = synthetic_types(count, rng)
+        scan = RuleEngine(RULES.noise_characters, {}, document_types, automaton_min_types=count + 1)
+        automaton = RuleEngine(RULES.noise_characters, {}, document_types, automaton_min_types=0)
+        for page in pages:
+            assert scan.classify(page) == automaton.classify(page)
+        old = timed(lambda page: per_type_scan(page, document_types), pages, args.rounds)
+        scanned = timed(scan.classify, pages, args.rounds)
+        matched = timed(automaton.classify, pages, args.rounds)
+        print(f"types={count:5d} automaton words={len(automaton.keyword_matcher.keywords):5d}  "
+              f"per-type scan={old * 1000:8.3f}  engine scan={scanned * 1000:8.3f}  "
+              f"engine automaton={matched * 1000:7.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os, sys
+import time
+import argparse
+import logging
+import tempfile
+from multiprocessing import Process
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.work_queue import create_work_queue
+
+
+def open_queue(backend, path, lease_seconds):
+    return create_work_queue(backend, path, lease_seconds=lease_seconds)
+
+
+def worker(backend, path, lease_seconds, task_ms, prefetch, die_after=None):
+    """Lease, 'process' (sleep task_ms) and ack items until the queue is drained; with die_after, exit holding leases."""
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+    work_queue = open_queue(backend, path, lease_seconds)
+    handled = 0
+    while True:
+        tasks = work_queue.lease(f"bench-{os.getpid()}", prefetch)
+        if not tasks:
+            stats = work_queue.stats()
+            if not stats["queued"] and not stats["leased"]:
+                return
+            # Leases held by others; wait in case one of them expires.
+            time.sleep(0.05)
+            continue
+        for task in tasks:
+            if die_after is not None and handled >= die_after:
+                os._exit(1)
+            time.sleep(task_ms / 1000)
+            work_queue.ack(task, {"item": task.payload["item"]})
+            handled += 1
+
+
+def run(backend, workers, items, task_ms, prefetch, lease_seconds, die_after=None):
+    """Seconds to drain items with workers processes (one of them dying early when die_after is set), plus the final stats."""
+    root = tempfile.mkdtemp(prefix="doc_ai_queue_")
+    path = os.path.join(root, "work.sqlite") if backend == "sqlite" else root
+    work_queue = open_queue(backend, path, lease_seconds)
+    work_queue.enqueue({"key": f"page-{index}", "item": f"page-{index}.png"} for index in range(items))
+
+    start = time.perf_counter()
+    processes = [Process(target=worker, args=(backend, path, lease_seconds, task_ms, prefetch,
+                                              die_after if index == 0 else None)) for index in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    results = list(work_queue.results())
+    done_items = {payload["item"] for payload, state, _ in results if state == "done"}
+    return elapsed, work_queue.stats(), len(done_items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain throughput of the work queue backends as workers are added.")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--task-ms", type=float, default=20.0, help="simulated processing time per item")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--prefetch", type=int, default=4, help="items leased per call")
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "directory"])
+    args = parser.parse_args()
+    logging.getLogger('Image_Processing').setLevel(logging.WARNING)
+
+    for backend in args.backends:
+        print(f"{backend}: {args.items} items of {args.task_ms:.0f} ms, {args.prefetch} leased per call")
+        base = None
+        for workers in args.workers:
+            elapsed, stats, done = run(backend, workers, args.items, args.task_ms, args.prefetch, lease_seconds=60)
+            throughput = args.items / elapsed
+            base = base or throughput / workers
+            print(f"  {workers:3d} workers: {throughput:8.1f} items/s   speedup {throughput / base:5.2f}"
+                  f" ({throughput / base / workers:.0%} of linear)   done {done}/{args.items}")
+
+        # One worker dies holding leases; its items come back once the lease runs out.
+        elapsed, stats, done = run(backend, 4, 200, 5, args.prefetch, lease_seconds=1, die_after=10)
+        print(f"  worker killed mid-run: done {done}/200 in {elapsed:.1f} s, {stats['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
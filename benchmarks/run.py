@@ -0,0 +1,184 @@
+import os, sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import toml
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.synthetic_forms import write_dataset
+from src.rules import RULES
+
+config = toml.load(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
+TEXT_NOISE = RULES.noise_characters
+
+# Throughput metrics are better when higher; every other metric is a duration.
+HIGHER_IS_BETTER = ("throughput",)
+
+
+def summarize(samples):
+    samples = np.asarray(samples, dtype=float)
+    return {
+        "mean": float(samples.mean()),
+        "p50": float(np.percentile(samples, 50)),
+        "p95": float(np.percentile(samples, 95)),
+        "n": int(len(samples)),
+    }
+
+
+def bench_stages(image_paths, model_path):
+    """Per-stage seconds over the dataset: the filter alone, then the full ImageProcessor if it can be built."""
+    from src.image_filter import LinesFilter
+    results, errors = {}, {}
+
+    line_filter = LinesFilter()
+    samples = []
+    for path in image_paths:
+        img = cv2.imread(path)
+        start = time.perf_counter()
+        line_filter.apply_filter(img)
+        samples.append(time.perf_counter() - start)
+    results["filter_only"] = summarize(samples)
+
+    try:
+        import spacy
+        from src.image_processor import ImageProcessorFactory
+        processor = ImageProcessorFactory.create(spacy.load(model_path), TEXT_NOISE)
+    except Exception as e:
+        errors["pipeline"] = f"full pipeline unavailable: {e}"
+        return results, errors
+
+    per_stage = {}
+    end_to_end = []
+    for path in image_paths:
+        start = time.perf_counter()
+        processor.process_single_image(path)
+        end_to_end.append(time.perf_counter() - start)
+        for stage, seconds in processor.stage_timings.items():
+            per_stage.setdefault(stage, []).append(seconds)
+    for stage, samples in per_stage.items():
+        results[stage] = summarize(samples)
+    results["image"] = summarize(end_to_end)
+    return results, errors
+
+
+def bench_throughput(image_paths, model_path, max_workers):
+    """Images per second through a warm WorkerPool for 1..max_workers processes."""
+    from src.cpu_budget import CpuBudget
+    from src.worker_pool import WorkerPool, process_image
+    throughput = {}
+    for workers in range(1, max_workers + 1):
+        budget = CpuBudget(processes=workers)
+        pool = WorkerPool(workers, model_path, TEXT_NOISE, cpu_budget=budget).start()
+        try:
+            pool.map(process_image, image_paths[:workers])
+            start = time.perf_counter()
+            pool.map(process_image, image_paths)
+            throughput[str(workers)] = len(image_paths) / (time.perf_counter() - start)
+        finally:
+            pool.close()
+    return throughput
+
+
+def run(args):
+    from src.logger import setup_logger
+    setup_logger().setLevel(logging.WARNING)
+    dataset = args.dataset or tempfile.mkdtemp(prefix="doc_ai_bench_")
+    image_paths = sorted(os.path.join(dataset, name) for name in os.listdir(dataset) if name.endswith(".png")) \
+        if args.dataset else write_dataset(dataset, args.count, seed=args.seed, width=args.width,
+                                           height=args.height, field_count=args.fields, noise=args.noise)
+
+    stages, errors = bench_stages(image_paths, args.model)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+            "images": len(image_paths),
+            "dataset": dataset,
+            "form": {"width": args.width, "height": args.height, "fields": args.fields, "noise": args.noise},
+        },
+        "stages": stages,
+        "errors": errors,
+    }
+    if args.workers and "pipeline" not in errors:
+        report["throughput"] = bench_throughput(image_paths, args.model, args.workers)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for stage, summary in stages.items():
+        print(f"{stage:12s} mean={summary['mean'] * 1000:9.1f} ms  p95={summary['p95'] * 1000:9.1f} ms")
+    for workers, rate in report.get("throughput", {}).items():
+        print(f"workers={workers:>3s} {rate:7.2f} images/s")
+    for name, message in errors.items():
+        print(f"[{name}] {message}")
+    print(f"Wrote {args.output}")
+
+
+def compare(args):
+    """Flag stage means that got slower, or throughput that dropped, by more than threshold."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = []
+    for stage, summary in current.get("stages", {}).items():
+        if stage not in baseline.get("stages", {}):
+            continue
+        before, after = baseline["stages"][stage]["mean"], summary["mean"]
+        change = (after - before) / before if before else 0.0
+        marker = "REGRESSION" if change > args.threshold else ""
+        print(f"stage {stage:12s} {before * 1000:9.1f} -> {after * 1000:9.1f} ms ({change:+.1%}) {marker}")
+        if marker:
+            regressions.append(stage)
+
+    for workers, after in current.get("throughput", {}).items():
+        before = baseline.get("throughput", {}).get(workers)
+        if not before:
+            continue
+        change = (after - before) / before
+        marker = "REGRESSION" if -change > args.threshold else ""
+        print(f"throughput workers={workers:>3s} {before:7.2f} -> {after:7.2f} images/s ({change:+.1%}) {marker}")
+        if marker:
+            regressions.append(f"throughput@{workers}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the document pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Benchmark stages and throughput on synthetic forms")
+    run_parser.add_argument("--output", default="bench_results.json")
+    run_parser.add_argument("--dataset", help="Existing folder of PNG forms; generated when omitted")
+    run_parser.add_argument("--count", type=int, default=20)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--width", type=int, default=2550)
+    run_parser.add_argument("--height", type=int, default=3300)
+    run_parser.add_argument("--fields", type=int, default=8)
+    run_parser.add_argument("--noise", type=float, default=0.02)
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Measure throughput at 1..N workers; 0 skips")
+    run_parser.add_argument("--model", default=config['paths']['nlp_model'])
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub.add_parser("compare", help="Compare a result file against a stored baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
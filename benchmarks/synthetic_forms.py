@@ -0,0 +1,142 @@
+import os, sys
+import json
+import random
+import argparse
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+TITLES = ["MOTOR VEHICLE ADMINISTRATION", "Driver Wellness & Safety", "Health Questionnaire"]
+
+FIELD_LABELS = {
+    "APPLICANT_NAME": "APPLICANT NAME",
+    "DOB": "DATE OF BIRTH",
+    "DLN": "DLN",
+    "DOC_DATE": "TODAY'S DATE",
+    "CITATION_DATE": "CITATION DATE",
+    "CONVICTION_DATE": "CONVICTION DATE",
+    "NY REF ID": "NY REF ID",
+    "COURT REPORT ID": "COURT REPORT ID",
+    "CONVICTION REASON": "REASON FOR CONVICTION",
+    "ADDRESS": "ADDRESS",
+}
+
+FIRST_NAMES = ["JOHN", "MARIA", "WEI", "AISHA", "CARLOS", "EMMA", "RAVI", "NOAH"]
+LAST_NAMES = ["SMITH", "GARCIA", "CHEN", "KHAN", "JOHNSON", "PATEL", "NGUYEN", "BROWN"]
+STREETS = ["MAIN ST", "OAK AVE", "PINE RD", "ELM ST", "CEDAR LN"]
+REASONS = ["SPEEDING", "RED LIGHT", "NO SEATBELT", "UNSAFE LANE CHANGE"]
+
+
+def random_date(rng):
+    return f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(1950, 2024)}"
+
+
+def random_value(label, rng):
+    if label == "APPLICANT_NAME":
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    if label in ("DOB", "DOC_DATE", "CITATION_DATE", "CONVICTION_DATE"):
+        return random_date(rng)
+    if label == "DLN":
+        return f"{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.randint(100, 999)}-{rng.randint(100, 999)}-{rng.randint(100, 999)}"
+    if label == "ADDRESS":
+        return f"{rng.randint(10, 9999)} {rng.choice(STREETS)}"
+    if label == "CONVICTION REASON":
+        return rng.choice(REASONS)
+    return str(rng.randint(10000, 99999))
+
+
+def generate_form(seed=0, width=2550, height=3300, field_count=8, noise=0.02, font_scale=None, rules=True, layout_seed=None):
+    """Render a synthetic DMV-style form and return (BGR image, {label: value}).
+
+    The page has a title, a DC-xxxx document number, and a ruled table with one
+    "LABEL: value" row per field, so LinesFilter has real table lines to remove.
+    noise is the fraction of pixels flipped by salt-and-pepper noise. rules=False
+    renders the same page without the table, as a reference for line removal.
+    layout_seed fixes the title and field order, so pages differ only in their
+    values, like filled copies of one form.
+    """
+    rng = random.Random(seed)
+    layout_rng = rng if layout_seed is None else random.Random(layout_seed)
+    scale = font_scale or width / 1700.0
+    thickness = max(1, int(round(scale * 2)))
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    margin = int(width * 0.08)
+    y = int(height * 0.06)
+    cv2.putText(image, layout_rng.choice(TITLES), (margin, y), FONT, scale * 1.3, (0, 0, 0), thickness + 1, cv2.LINE_AA)
+    doc_name = f"DC-{rng.randint(100, 9999)}"
+    y += int(60 * scale)
+    cv2.putText(image, f"Form ({doc_name})", (margin, y), FONT, scale, (0, 0, 0), thickness, cv2.LINE_AA)
+
+    labels = list(FIELD_LABELS)
+    layout_rng.shuffle(labels)
+    labels = (labels * (field_count // len(labels) + 1))[:field_count]
+
+    truth = {"DOC_NAME": doc_name}
+    top = y + int(50 * scale)
+    row_height = int(min(90 * scale, (height - top - margin) / max(field_count, 1)))
+    right = width - margin
+    split = margin + int((right - margin) * 0.45)
+
+    for row, label in enumerate(labels):
+        row_top = top + row * row_height
+        value = random_value(label, rng)
+        truth.setdefault(label, value)
+        text_y = row_top + int(row_height * 0.65)
+        cv2.putText(image, f"{FIELD_LABELS[label]}:", (margin + 15, text_y), FONT, scale * 0.8, (0, 0, 0), thickness, cv2.LINE_AA)
+        cv2.putText(image, value, (split + 15, text_y), FONT, scale * 0.8, (0, 0, 0), thickness, cv2.LINE_AA)
+
+    # Ruled table: horizontal rules per row and three vertical rules.
+    bottom = top + len(labels) * row_height
+    line_thickness = max(2, thickness)
+    for row in range(len(labels) + 1 if rules else 0):
+        cv2.line(image, (margin, top + row * row_height), (right, top + row * row_height), (0, 0, 0), line_thickness)
+    for x in ((margin, split, right) if rules else ()):
+        cv2.line(image, (x, top), (x, bottom), (0, 0, 0), line_thickness)
+
+    if noise > 0:
+        np_rng = np.random.default_rng(seed)
+        flips = np_rng.random((height, width)) < noise
+        salt = np_rng.random((height, width)) < 0.5
+        image[flips & salt] = 255
+        image[flips & ~salt] = 0
+        image = cv2.GaussianBlur(image, (3, 3), 0)
+
+    return image, truth
+
+
+def write_dataset(out_dir, count, seed=0, **form_options):
+    """Write count forms as PNGs plus truth.json mapping filename -> fields; return the image paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    truth = {}
+    paths = []
+    for index in range(count):
+        image, fields = generate_form(seed=seed + index, **form_options)
+        filename = f"form_{index:04d}.png"
+        path = os.path.join(out_dir, filename)
+        cv2.imwrite(path, image)
+        truth[filename] = fields
+        paths.append(path)
+    with open(os.path.join(out_dir, "truth.json"), "w") as f:
+        json.dump(truth, f, indent=2)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render synthetic DMV-style forms for benchmarking.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=2550)
+    parser.add_argument("--height", type=int, default=3300)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--noise", type=float, default=0.02)
+    args = parser.parse_args()
+    paths = write_dataset(args.out_dir, args.count, seed=args.seed, width=args.width, height=args.height,
+                          field_count=args.fields, noise=args.noise)
+    print(f"Wrote {len(paths)} forms to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
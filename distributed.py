@@ -0,0 +1,196 @@
+"""Distributed mode: a coordinator enqueues images, workers on any number of hosts lease and process them.
+
+    python distributed.py enqueue //fileserver/scans --model Model_123456789_T/model-best
+    python distributed.py work                          # on every worker host
+    python distributed.py status
+    python distributed.py results --output results.jsonl
+
+Every worker runs the same warm worker pool as the app, keeps up to 2 x processes
+items leased, renews its leases while they are processed and acks each result as
+it completes. An item whose processing fails, or takes longer than [workers]
+task_timeout, is failed back to the queue and retried up to max_attempts times.
+Items leased by a worker that dies go back to the queue once their lease runs out. The queue backend and location come from [work_queue] in
+config/config.toml; image paths must be readable from every worker host.
+"""
+import os, sys
+import json
+import time
+import queue
+import socket
+import argparse
+import toml
+from src.logger import setup_logger
+from src.worker_pool import TaskError, TaskTimeout, process_queued_task
+from src.work_queue import create_work_queue
+from src.image_source import expand_pages
+from src.model_registry import get_model_registry
+from batch import find_images, result_record, create_worker_pool
+
+config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'config', 'config.toml'))
+config = toml.load(config_path)
+queue_config = config.get('work_queue', {})
+
+logger = setup_logger()
+
+
+def open_queue(args):
+    if args.queue:
+        path = os.path.abspath(args.queue)
+    else:
+        path = os.path.abspath(os.path.join(os.path.dirname(__file__), queue_config.get('path', 'queue/work.sqlite')))
+    return create_work_queue(args.backend or queue_config.get('backend', 'sqlite'), path,
+                             lease_seconds=queue_config.get('lease_seconds', 300),
+                             max_attempts=queue_config.get('max_attempts', 3))
+
+
+def enqueue(args, work_queue):
+    try:
+        model = get_model_registry().resolve(args.model) if args.model else None
+    except KeyError as e:
+        raise ValueError(str(e))
+
+    def payloads():
+        for key, image_path in find_images(args.inputs, (0, 1)):
+            for item in expand_pages([image_path]):
+                yield {"key": key + item[len(image_path):], "item": item, "model": model}
+
+    added = total = 0
+    batch = []
+    for payload in payloads():
+        batch.append(payload)
+        if len(batch) == 1000:
+            added += work_queue.enqueue(batch)
+            total += len(batch)
+            batch = []
+    added += work_queue.enqueue(batch)
+    total += len(batch)
+    logger.info(f"Enqueued {added} new of {total} images.")
+    print(f"{added} enqueued, {total - added} already queued", file=sys.stderr)
+    return 0
+
+
+def work(args, work_queue):
+    worker = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    worker_pool = create_worker_pool(args.processes).start()
+    max_in_flight = args.max_in_flight or 2 * worker_pool.processes
+    poll_interval = queue_config.get('poll_interval', 2.0)
+    renew_interval = work_queue.lease_seconds / 3
+    done = queue.Queue()
+    held = {}
+    # Task id -> time.monotonic() by which its result must arrive; a pool task whose worker died never reports back.
+    deadlines = {}
+    processed = failed = 0
+    last_renewal = time.time()
+    logger.info(f"Worker {worker} polling the queue with {worker_pool.processes} processes.")
+
+    try:
+        while True:
+            if len(held) < max_in_flight:
+                for task in work_queue.lease(worker, max_in_flight - len(held)):
+                    held[task.id] = task
+                    if worker_pool.task_timeout:
+                        deadlines[task.id] = time.monotonic() + worker_pool.task_timeout
+                    worker_pool.apply_async(process_queued_task, ((task.id, task.payload),), callback=done.put,
+                                            error_callback=lambda e, task_id=task.id: done.put(TaskError(task_id, e)))
+            if not held:
+                if args.exit_when_idle and not any(work_queue.stats()[state] for state in ("queued", "leased")):
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            try:
+                results = [done.get(timeout=min(poll_interval, renew_interval))]
+            except queue.Empty:
+                results = []
+            while True:
+                try:
+                    results.append(done.get_nowait())
+                except queue.Empty:
+                    break
+            for result in results:
+                task_id = result.item if isinstance(result, TaskError) else result[0]
+                deadlines.pop(task_id, None)
+                task = held.pop(task_id, None)
+                if task is None:
+                    # Already failed as timed out; its lease is no longer ours to ack.
+                    continue
+                if isinstance(result, TaskError):
+                    logger.error(f"Error processing {task.payload['item']}: {result.error}")
+                    work_queue.fail(task, result.error)
+                    failed += 1
+                else:
+                    work_queue.ack(task, result[1])
+                    processed += 1
+
+            now = time.monotonic()
+            for task_id, deadline in list(deadlines.items()):
+                if deadline <= now:
+                    # Stop renewing the lease and hand the item back instead of holding it forever.
+                    del deadlines[task_id]
+                    task = held.pop(task_id)
+                    logger.error(f"Processing {task.payload['item']} did not finish within {worker_pool.task_timeout} seconds.")
+                    work_queue.fail(task, TaskTimeout(f"Task did not finish within {worker_pool.task_timeout} seconds."))
+                    failed += 1
+
+            if time.time() - last_renewal >= renew_interval:
+                for task in work_queue.renew(list(held.values())):
+                    logger.warning(f"Lease on {task.payload['item']} was lost; another worker may process it too.")
+                last_renewal = time.time()
+    except KeyboardInterrupt:
+        # Leases of the items in flight run out and they return to the queue.
+        worker_pool.terminate()
+        logger.info(f"Worker {worker} interrupted with {len(held)} items leased.")
+        return 130
+
+    worker_pool.close()
+    logger.info(f"Worker {worker} finished: {processed} processed, {failed} failed.")
+    return 0
+
+
+def status(args, work_queue):
+    print(json.dumps(work_queue.stats()))
+    return 0
+
+
+def results(args, work_queue):
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for payload, state, value in work_queue.results():
+            record = result_record(payload["item"], value) if state == "done" else result_record(payload["item"], error=value)
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    print(f"{count} results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process images on any number of hosts through a shared work queue.")
+    parser.add_argument("--backend", choices=("sqlite", "directory"), help="work queue backend (default: [work_queue] backend)")
+    parser.add_argument("--queue", help="queue database file or directory (default: [work_queue] path)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="add the images of directories and/or files to the queue")
+    enqueue_parser.add_argument("inputs", nargs="+")
+    enqueue_parser.add_argument("--model", help="model name or path from the model registry")
+
+    work_parser = commands.add_parser("work", help="lease and process queued images until interrupted")
+    work_parser.add_argument("--processes", type=int, default=0, help="pool workers (default: [cpu] processes)")
+    work_parser.add_argument("--max-in-flight", type=int, default=0, help="items leased at once (default: 2 x processes)")
+    work_parser.add_argument("--worker-id", help="name recorded on leases (default: host-pid)")
+    work_parser.add_argument("--exit-when-idle", action="store_true", help="stop once nothing is queued or leased")
+
+    commands.add_parser("status", help="print item counts per state as JSON")
+
+    results_parser = commands.add_parser("results", help="write finished and failed items as JSONL")
+    results_parser.add_argument("--output", required=True)
+
+    args = parser.parse_args()
+    try:
+        work_queue = open_queue(args)
+        return {"enqueue": enqueue, "work": work, "status": status, "results": results}[args.command](args, work_queue)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,24 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import json
 from flask_cors import CORS
-from flask_caching import Cache
-import spacy
 import os
+import gc
 import toml
 import time
-from multiprocessing import Pool, cpu_count
+from functools import partial
+from multiprocessing import parent_process
 from src.image_processor import ImageProcessorFactory, logger  # Import your ImageProcessorFactory
+from src.logger import start_log_writer
+from src.worker_pool import WorkerPool, TaskError, run_processor, run_indexed, process_image, process_image_with_path, process_image_chunk
+from src.metrics import PipelineMetrics
+from src.jobs import JobStore, JobManager, JobQueueFull
+from src.result_cache import ResultCache
+from src.manifest import FolderManifest
+from src.image_source import expand_pages
+from src.rules import RULES
+from src.model_registry import get_model_registry
+from src.cpu_budget import CpuBudget
+from src.admission import AdmissionController, AdmissionRejected, DeadlineExceeded
 from src.json_cleaning import *  # Import your JSON cleaning module
 import win32security
 import win32con
@@ -17,19 +29,66 @@ config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'config',
 config = toml.load(config_path)
 nlp_model_path = config['paths']['nlp_model']
 
-# Initialize Flask app and caching
+# Initialize Flask app
 app = Flask(__name__)
 CORS(app)
-app.config['CACHE_TYPE'] = 'SimpleCache'
-app.config['CACHE_DEFAULT_TIMEOUT'] = 500
-cache = Cache(app)
 
-# Load NLP model globally at app startup
-nlp = spacy.load(nlp_model_path)
+# Per-image result cache on local disk, shared by the app process and all workers
+cache_config = config.get('cache', {})
+cache_settings = None
+if cache_config.get('enabled', True):
+    cache_settings = {
+        "db_path": os.path.abspath(os.path.join(os.path.dirname(__file__), cache_config.get('db_path', 'cache/results.sqlite'))),
+        "max_size_mb": cache_config.get('max_size_mb', 512),
+    }
+result_cache = ResultCache(**cache_settings) if cache_settings else None
+
+# Registry of the spaCy pipelines under [models] dir; the default one is loaded at app startup
+model_registry = get_model_registry()
+nlp = model_registry.get(nlp_model_path)
+
+# Split the machine's cores across pool workers, OCR threads, OpenCV and tesseract
+cpu_budget = CpuBudget.from_config(config.get('cpu', {}))
+cpu_budget.apply()
+logger.info(f"CPU budget: {cpu_budget.as_dict()}")
 
 # Define number of processors to use
-num_processors = 12
-text_noise = "![]+{};'\"\\,<>.?#$%^*_~'—|"
+num_processors = cpu_budget.processes
+# Images on the worker pool at once across all requests; requests beyond it wait in a bounded queue
+admission_config = config.get('admission', {})
+admission = AdmissionController(
+    admission_config.get('max_images_in_flight', 0) or config.get('workers', {}).get('max_in_flight', 0) or 2 * num_processors,
+    max_queued=admission_config.get('max_queued', 16),
+    max_wait_seconds=admission_config.get('max_wait_seconds', 60),
+    retry_after=admission_config.get('retry_after', 5))
+default_deadline = admission_config.get('default_deadline', 0)
+# Pages handed to a worker at once on folder runs, so same-sized pages share EAST forward passes
+detect_batch_size = config.get('detection', {}).get('batch_size', 1)
+# Characters stripped from OCR lines before NER, from the [noise] table of config/rules.toml
+text_noise = RULES.noise_characters
+
+# Processor configured like the workers' ones, for the layout cache and duplicate index stats endpoints.
+# It never processes images: request threads would share its per-call state.
+image_processor = ImageProcessorFactory.create(nlp, text_noise, result_cache, cpu_budget.ocr_threads, model_registry)
+
+# Stage histograms: every process writes its own snapshot here and /metrics merges them
+metrics_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), config.get('metrics', {}).get('dir', 'metrics')))
+if parent_process() is None:
+    os.makedirs(metrics_dir, exist_ok=True)
+    PipelineMetrics.reset(metrics_dir)
+
+# One log writer thread in the app process; the app and every worker only enqueue records
+log_queue = start_log_writer() if parent_process() is None else None
+
+# Warm worker pool, started once; each worker loads its own EAST net. Models preloaded here serve the
+# app process; where workers fork (Linux) they also inherit them and share them copy-on-write, so freeze
+# them out of the GC's reach first. Spawned workers (Windows, macOS) load their own copy in init_worker.
+worker_pool = WorkerPool(num_processors, nlp_model_path, text_noise, cache_settings, cpu_budget, metrics_dir, log_queue,
+                         task_timeout=config.get('workers', {}).get('task_timeout', 600))
+if parent_process() is None:
+    model_registry.preload(config.get('models', {}).get('preload', []))
+    gc.freeze()
+    worker_pool.start()
 
 def GetConfigSetting(obj, name):
     config_object = ConfigParser()
@@ -54,8 +113,7 @@ def impersonate_and_process_image(image_path):
         )
         win32security.ImpersonateLoggedOnUser(handle)
 
-        processor = ImageProcessorFactory.create(nlp, text_noise)
-        result = processor.process_single_image(image_path)
+        result = run_processor(image_path)
 
         return result
     except Exception as e:
@@ -66,14 +124,6 @@ def impersonate_and_process_image(image_path):
             win32security.RevertToSelf()
             handle.Close()
 
-# Multiprocessing helper to process single images
-def process_single_image(args):
-    text_noise, image_path = args
-    return {
-        "image_filename": os.path.basename(image_path),
-        "key_value_pairs": ImageProcessorFactory.create(nlp, text_noise).process_single_image(image_path)
-    }
-
 # Helper to get all images in a folder
 def get_all_images_from_folder(folder_path):
     image_paths = []
@@ -81,12 +131,292 @@ def get_all_images_from_folder(folder_path):
         for file in files:
             if file.lower().endswith(('.png', '.jpg', '.jpeg', '.tif')):
                 image_paths.append(os.path.join(root, file))
-    return image_paths
+    # Multi-page TIFFs become one work item per page, decoded lazily by the worker that gets it.
+    return list(expand_pages(image_paths))
+
+def requested_deadline():
+    """time.time() by which a request must finish, from ?deadline=<seconds> or [admission] default_deadline; None for none."""
+    value = request.args.get('deadline')
+    seconds = float(value) if value else default_deadline
+    if seconds < 0:
+        raise ValueError("deadline must be a number of seconds >= 0")
+    return time.time() + seconds if seconds else None
+
+def too_busy(e):
+    return jsonify({"error": str(e), "retry_after": e.retry_after}), 429, {"Retry-After": str(e.retry_after)}
+
+def run_admitted(func, items, deadline=None, images_per_item=1):
+    """Admit the images of items, then run func over items on the worker pool within the admitted images in flight.
+
+    Returns (results in item order, complete). An item whose task raised or timed
+    out gets an error result (see error_result) and the others carry on. At the
+    deadline no more items are submitted; items not finished by then, including
+    those whose tesseract calls were killed by the deadline in the worker, are None
+    and complete is False. Items left in flight keep their admission until they end
+    on the pool. Raises AdmissionRejected when the server is too busy.
+    """
+    results = [None] * len(items)
+    try:
+        ticket = admission.admit(len(items) * images_per_item, deadline)
+    except DeadlineExceeded:
+        return results, False
+    admitted = worker_pool.iter_admitted(partial(run_indexed, func), enumerate(items), ticket, images_per_item)
+    try:
+        for result in admitted:
+            if isinstance(result, TaskError):
+                if not isinstance(result.error, DeadlineExceeded):
+                    index, item = result.item
+                    logger.error(f"Error processing {item}: {result.error}")
+                    results[index] = error_result(item, result.error)
+            else:
+                index, value = result
+                results[index] = value
+            if deadline is not None and time.time() >= deadline:
+                # Items still in flight end at their first stage or tesseract call past the deadline.
+                break
+    finally:
+        admitted.close()
+    return results, all(result is not None for result in results)
+
+def error_result(item, error):
+    """Result entry of an item whose task failed; a chunk of images gets one entry per image."""
+    if isinstance(item, (list, tuple)):
+        return [error_result(image, error) for image in item]
+    return {"image_filename": os.path.basename(item), "error": str(error) or type(error).__name__}
+
+def incomplete_fields(items, results):
+    """Fields marking a partial response, listing the images that were not processed."""
+    return {"incomplete": True,
+            "unprocessed_images": [os.path.basename(item) for item, result in zip(items, results) if result is None]}
+
+# Per-root change manifests for incremental folder runs
+manifest_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), config.get('manifest', {}).get('dir', 'manifests')))
+
+def process_folder_incremental(path, full_scan=False, deadline=None):
+    """Process only new or modified images under path and return results for every current image.
+
+    Raises AdmissionRejected when the server is too busy. When the deadline cuts the
+    run short, the summary lists the unprocessed images; they are processed next run.
+    """
+    # Runs over the same root wait for each other, so neither saves over the other's results.
+    with FolderManifest(path, manifest_dir) as manifest:
+        changed, unchanged, deleted = manifest.scan(full=full_scan)
+        # Pages a deadline cut short last time, in files that have not changed since.
+        pages = list(expand_pages(changed)) + manifest.unfinished_pages()
+
+        summary = {"processed": len(changed), "unchanged": len(unchanged), "deleted": len(deleted)}
+        try:
+            if pages:
+                # strict: a page a stage failed on raises ImageProcessingError instead of storing its partial result.
+                results, complete = run_admitted(partial(process_image_with_path, deadline=deadline, strict=True), pages,
+                                                 deadline)
+                failed = []
+                for page, result in zip(pages, results):
+                    if result is None or "error" in result:
+                        # Processed again next run, even if the file does not change.
+                        manifest.clear_result(page)
+                        if result is not None:
+                            failed.append(result)
+                    else:
+                        manifest.set_result(result["image_path"], result["key_value_pairs"])
+                if failed:
+                    summary["failed_images"] = failed
+                if not complete:
+                    summary.update(incomplete_fields(pages, results))
+        finally:
+            # Whatever finished is kept even when the run fails part way.
+            manifest.save()
+
+        return manifest.results(), summary
+
+# Background folder jobs, persisted so they survive a restart
+jobs_config = config.get('jobs', {})
+job_db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), jobs_config.get('db_path', 'jobs/jobs.sqlite')))
+job_manager = JobManager(JobStore(job_db_path), worker_pool, get_all_images_from_folder,
+                         max_queued=jobs_config.get('max_queued', 16), admission=admission,
+                         slice_images=jobs_config.get('slice_images', 32))
+if parent_process() is None:
+    job_manager.start()
+
+@app.route('/jobs', methods=["POST"])
+def submit_job():
+    payload = request.get_json(silent=True) or {}
+    path = payload.get('folderPath') or request.args.get('folderPath')
+
+    if not path:
+        return jsonify({"error": "folderPath parameter is missing"}), 400
+
+    if not os.path.isdir(path):
+        return jsonify({"error": "Invalid path"}), 400
+
+    profile = str(payload.get('profile') or request.args.get('profile', '0')).lower() in ('1', 'true')
+
+    try:
+        job_id = job_manager.submit(path, profile=profile)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route('/jobs/<job_id>', methods=["GET"])
+def get_job(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/results', methods=["GET"])
+def get_job_results(job_id):
+    status = job_manager.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify({
+        "job_id": job_id,
+        "status": status["status"],
+        "complete": status["status"] == "finished",
+        "processed_images": job_manager.results(job_id)
+    })
+
+@app.route('/metrics', methods=["GET"])
+def metrics():
+    """Pipeline histograms merged across the app process and all pool workers."""
+    merged = PipelineMetrics.collect(metrics_dir)
+    if request.args.get('format') == 'json':
+        return jsonify(merged.snapshot())
+    return Response(merged.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/cache/stats', methods=["GET"])
+def cache_stats():
+    if result_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **result_cache.stats()})
+
+@app.route('/layout_cache/stats', methods=["GET"])
+def layout_cache_stats():
+    """Layout cache outcomes summed across the app process and all pool workers."""
+    counters = PipelineMetrics.collect(metrics_dir).counters
+    hits, misses, fallbacks = (counters.get(name, 0) for name in ("layout_cache_hits", "layout_cache_misses", "layout_cache_fallbacks"))
+    lookups = hits + misses + fallbacks
+    return jsonify({
+        "enabled": image_processor.layout_cache is not None,
+        "lookups": lookups,
+        "hits": hits,
+        "misses": misses,
+        "fallbacks": fallbacks,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    })
+
+@app.route('/duplicates/stats', methods=["GET"])
+def duplicate_stats():
+    """Duplicate index size plus page outcomes summed across the app process and all pool workers."""
+    if image_processor.duplicate_index is None:
+        return jsonify({"enabled": False})
+    counters = PipelineMetrics.collect(metrics_dir).counters
+    outcomes = {name: counters.get(name, 0) for name in ("duplicate_pages_reused", "duplicate_checks_agreed",
+                                                         "duplicate_checks_disagreed", "duplicate_pages_indexed")}
+    checks = outcomes["duplicate_checks_agreed"] + outcomes["duplicate_checks_disagreed"]
+    return jsonify({
+        "enabled": True,
+        **image_processor.duplicate_index.stats(),
+        **outcomes,
+        "agreement_rate": round(outcomes["duplicate_checks_agreed"] / checks, 4) if checks else None,
+    })
+
+@app.route('/admission/stats', methods=["GET"])
+def admission_stats():
+    """Images in flight and requests waiting for admission, plus deadline expiries summed across all pool workers."""
+    counters = PipelineMetrics.collect(metrics_dir).counters
+    return jsonify({**admission.stats(), "images_deadline_exceeded": counters.get("images_deadline_exceeded", 0)})
+
+@app.route('/models', methods=["GET"])
+def models():
+    return jsonify(model_registry.describe())
+
+def requested_model():
+    """The ?model= of a request as a registry name; None when absent.
+
+    Only models discovered under [models] dir can be named; KeyError (a 400) for anything else.
+    """
+    model = request.args.get('model')
+    return model_registry.named(model) if model else None
+
+@app.route('/process_images/stream', methods=["GET"])
+def stream_images():
+    """Stream one JSON object per image as NDJSON, in completion order."""
+    path = request.args.get('folderPath')
+
+    if not path:
+        return jsonify({"error": "folderPath parameter is missing"}), 400
+
+    try:
+        model = requested_model()
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        deadline = requested_deadline()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not os.path.isdir(path):
+        return jsonify({"error": "Invalid path"}), 400
+
+    image_paths = get_all_images_from_folder(path)
+    if not image_paths:
+        return jsonify({"error": "No valid image files found"}), 400
+
+    try:
+        ticket = admission.admit(len(image_paths), deadline)
+    except AdmissionRejected as e:
+        return too_busy(e)
+    except DeadlineExceeded:
+        return jsonify(incomplete_fields(image_paths, [None] * len(image_paths)))
+
+    started = False
+
+    def generate():
+        nonlocal started
+        started = True
+        start_time = time.time()
+        count = 0
+        done = set()
+        admitted = worker_pool.iter_admitted(partial(process_image_with_path, model=model, deadline=deadline),
+                                             image_paths, ticket)
+        try:
+            for result in admitted:
+                if isinstance(result, TaskError):
+                    if isinstance(result.error, DeadlineExceeded):
+                        continue
+                    logger.error(f"Error processing {result.item}: {result.error}")
+                    done.add(result.item)
+                    result = {"image_filename": os.path.basename(result.item), "error": str(result.error)}
+                else:
+                    done.add(result["image_path"])
+                    result = {"image_filename": os.path.basename(result["image_path"]), "key_value_pairs": result["key_value_pairs"]}
+                count += 1
+                yield json.dumps(result) + "\n"
+                if deadline is not None and time.time() >= deadline:
+                    break
+        finally:
+            admitted.close()
+        if len(done) < len(image_paths):
+            # Last line of a stream cut short by its deadline.
+            yield json.dumps(incomplete_fields(image_paths, [path if path in done else None for path in image_paths])) + "\n"
+        logger.info(f"Streamed {count} images in {time.time() - start_time:.2f} seconds")
+
+    def cancel_unstarted():
+        # A client gone before the first line never runs the generator, so none of its images were submitted.
+        if not started:
+            ticket.cancel(len(image_paths))
+
+    response = Response(generate(), mimetype="application/x-ndjson")
+    response.call_on_close(cancel_unstarted)
+    return response
 
 @app.route('/process_images', methods=["GET"])
-@cache.cached(query_string=True)
 def process_images():
     impersonate_flag = request.args.get('imp', default='0')
+    incremental_flag = request.args.get('incremental', default='0')
     path = request.args.get('folderPath')
 
     if not path:
@@ -95,6 +425,12 @@ def process_images():
     if not os.path.exists(path):
         return jsonify({"error": "Invalid path"}), 400
 
+    try:
+        model = requested_model()
+        deadline = requested_deadline()
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
     start_time = time.time()
 
     try:
@@ -106,9 +442,7 @@ def process_images():
                 if not image_paths:
                     return jsonify({"error": "No valid image files found"}), 400
 
-                results = []
-                with Pool(num_processors) as pool:
-                    results = pool.map(impersonate_and_process_image, [(img) for img in image_paths])
+                results, _ = run_admitted(impersonate_and_process_image, image_paths)
 
                 total_time = time.time() - start_time
                 logger.info(f"Processed {len(image_paths)} images in {total_time:.2f} seconds")
@@ -117,47 +451,72 @@ def process_images():
 
             elif os.path.isfile(path):
                 folder_name = os.path.basename(os.path.dirname(path))
-                result = impersonate_and_process_image(path, text_noise)
+                pages = list(expand_pages([path]))
+                results, _ = run_admitted(impersonate_and_process_image, pages)
                 
                 total_time = time.time() - start_time
                 logger.info(f"Processed single image {path} in {total_time:.2f} seconds")
 
                 return jsonify({
                     folder_name: [{
-                        "image_filename": os.path.basename(path),
+                        "image_filename": os.path.basename(page),
                         "key_value_pairs": result
-                    }]
+                    } for page, result in zip(pages, results)]
                 })
 
         else:
-            if os.path.isdir(path):
+            if os.path.isdir(path) and incremental_flag in ('1', 'full'):
+                results, summary = process_folder_incremental(path, full_scan=incremental_flag == 'full', deadline=deadline)
+
+                total_time = time.time() - start_time
+                logger.info(f"Incremental run over {path}: {summary} in {total_time:.2f} seconds")
+
+                response = {"processed_images": results, "incremental": summary}
+                if summary.get("incomplete"):
+                    response["incomplete"] = True
+                return jsonify(response)
+
+            elif os.path.isdir(path):
                 image_paths = get_all_images_from_folder(path)
 
                 if not image_paths:
                     return jsonify({"error": "No valid image files found"}), 400
 
-                with Pool(num_processors) as pool:
-                    results = pool.map(process_single_image, [(text_noise, img) for img in image_paths])
+                if detect_batch_size > 1:
+                    chunks = [image_paths[i:i + detect_batch_size] for i in range(0, len(image_paths), detect_batch_size)]
+                    chunk_results, complete = run_admitted(partial(process_image_chunk, model=model, deadline=deadline), chunks,
+                                                           deadline, images_per_item=detect_batch_size)
+                    results = [result for chunk, chunk_result in zip(chunks, chunk_results)
+                               for result in (chunk_result if chunk_result is not None else [None] * len(chunk))]
+                else:
+                    results, complete = run_admitted(partial(process_image, model=model, deadline=deadline), image_paths, deadline)
 
                 total_time = time.time() - start_time
-                logger.info(f"Processed {len(image_paths)} images in {total_time:.2f} seconds")
+                logger.info(f"Processed {sum(1 for result in results if result is not None)} of {len(image_paths)} images "
+                            f"in {total_time:.2f} seconds")
 
-                return jsonify({"processed_images": results})
+                response = {"processed_images": [result for result in results if result is not None]}
+                if not complete:
+                    response.update(incomplete_fields(image_paths, results))
+                return jsonify(response)
 
             elif os.path.isfile(path):
                 folder_name = os.path.basename(os.path.dirname(path))
-                image_result = ImageProcessorFactory.create(nlp, text_noise).process_single_image(path)
+                pages = list(expand_pages([path]))
+                # On the pool like folders: a processor keeps per-call state and its EAST net is not thread-safe,
+                # so request threads must not share one.
+                results, complete = run_admitted(partial(process_image, model=model, deadline=deadline), pages, deadline)
 
                 total_time = time.time() - start_time
                 logger.info(f"Processed single image {path} in {total_time:.2f} seconds")
 
-                return jsonify({
-                    folder_name: [{
-                        "image_filename": os.path.basename(path),
-                        "key_value_pairs": image_result
-                    }]
-                })
+                response = {folder_name: [result for result in results if result is not None]}
+                if not complete:
+                    response.update(incomplete_fields(pages, results))
+                return jsonify(response)
 
+    except AdmissionRejected as e:
+        return too_busy(e)
     except Exception as e:
         logger.error(f"Error in process_images: {e}")
         return jsonify({"error": str(e)}), 500
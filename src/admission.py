@@ -0,0 +1,148 @@
+import os, sys
+import math
+import time
+import threading
+from collections import deque
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before this image was finished."""
+
+
+class AdmissionRejected(Exception):
+    """The wait queue is full, or a request waited max_wait_seconds without being admitted."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def remaining(deadline):
+    """Seconds left until deadline (a time.time() value); None when there is no deadline."""
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def check_deadline(deadline):
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded("Request deadline exceeded.")
+
+
+class Admission:
+    """Capacity held by one admitted request: one unit per image it may have in flight."""
+
+    def __init__(self, controller, images, units):
+        self.controller = controller
+        self.images = images
+        self.units = units
+
+    def release(self, images=1):
+        """Mark images finished; units beyond the images still to run go back to the controller."""
+        self._drop(images, images)
+
+    def cancel(self, images):
+        """Drop images that will never run, e.g. those left unsubmitted when a request stops early.
+
+        Units of images still in flight stay held until those images are released.
+        """
+        self._drop(images, 0)
+
+    def _drop(self, images, completed):
+        if not images:
+            return
+        # Releases come from the pool's result thread while the request thread cancels.
+        with self.controller.condition:
+            self.images = max(0, self.images - images)
+            surplus = self.units - min(self.units, self.images)
+            self.units -= surplus
+            self.controller._release(surplus, completed)
+
+
+class AdmissionController:
+    """Caps the images in flight across all requests of this process; requests beyond it wait in a bounded FIFO queue.
+
+    A request for n images is admitted with min(n, max_images) units and never has
+    more images than that on the worker pool; it returns units as it runs out of
+    images to run. An image a request stopped waiting for keeps its unit until its
+    task actually ends, so abandoned work still counts against max_images. When
+    max_queued requests are already waiting, or a request has waited
+    max_wait_seconds, it is rejected with a Retry-After estimate from the images
+    queued and in flight and the recent completion rate.
+    """
+
+    def __init__(self, max_images, max_queued=16, max_wait_seconds=60, retry_after=5):
+        self.max_images = max(1, max_images)
+        self.max_queued = max_queued
+        self.max_wait_seconds = max_wait_seconds
+        self.retry_after_default = retry_after
+        self.in_flight = 0
+        self.waiting = deque()
+        self.completions = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.condition = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until the work queued and in flight now is likely done, from the completions of the last minute."""
+        now = time.time()
+        while self.completions and self.completions[0][0] < now - 60:
+            self.completions.popleft()
+        done = sum(count for _, count in self.completions)
+        if not done:
+            return self.retry_after_default
+        backlog = self.in_flight + sum(waiting.units for waiting in self.waiting)
+        rate = done / max(1.0, now - self.completions[0][0])
+        return max(1, min(300, math.ceil(backlog / rate)))
+
+    def admit(self, images, deadline=None):
+        """Wait for capacity for a request of images images and return its Admission.
+
+        Raises AdmissionRejected when the queue is full or max_wait_seconds pass, and
+        DeadlineExceeded when deadline passes first.
+        """
+        units = max(1, min(images, self.max_images))
+        # Queued as itself: Admission compares by identity, so equal-sized requests are never confused.
+        admission = Admission(self, images, units)
+        with self.condition:
+            if len(self.waiting) >= self.max_queued:
+                self.rejected += 1
+                raise AdmissionRejected(f"Too many requests waiting ({len(self.waiting)}).", self.retry_after())
+            self.waiting.append(admission)
+            give_up = time.time() + self.max_wait_seconds if self.max_wait_seconds else None
+            limits = [t for t in (deadline, give_up) if t is not None]
+            limit = min(limits) if limits else None
+            try:
+                while self.waiting[0] is not admission or self.in_flight + units > self.max_images:
+                    timeout = None if limit is None else limit - time.time()
+                    if timeout is not None and timeout <= 0:
+                        if deadline is not None and time.time() >= deadline:
+                            raise DeadlineExceeded("Request deadline passed while waiting for admission.")
+                        self.rejected += 1
+                        raise AdmissionRejected(f"Not admitted within {self.max_wait_seconds} seconds.", self.retry_after())
+                    self.condition.wait(timeout)
+            finally:
+                self.waiting.remove(admission)
+                # The next request in line may fit now.
+                self.condition.notify_all()
+            self.in_flight += units
+            self.admitted += 1
+        return admission
+
+    def _release(self, units, images):
+        with self.condition:
+            self.in_flight -= units
+            if images:
+                self.completions.append((time.time(), images))
+            if units:
+                self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {"max_images": self.max_images, "images_in_flight": self.in_flight, "waiting": len(self.waiting),
+                    "max_queued": self.max_queued, "admitted": self.admitted, "rejected": self.rejected,
+                    "retry_after": self.retry_after()}
@@ -0,0 +1,115 @@
+import os, sys
+import json
+import hashlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+
+class CheckpointMismatch(Exception):
+    """The output or checkpoint on disk belongs to another run, or they no longer agree with each other."""
+
+
+def shard_of(key, shards):
+    """Shard index of a work item key, stable across machines, processes and Python hash seeds."""
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+class BatchCheckpoint:
+    """A JSONL results file plus an append-only checkpoint of the items it holds, for resumable batch runs.
+
+    Every result is appended to the output as one line; then the item, its status
+    and the output size after that line are appended to the checkpoint, and both
+    files are flushed to disk. The checkpoint's first line describes the run, so a
+    resume with other inputs or another shard is refused. On open, a torn last line
+    of either file is dropped and the output is truncated to the size recorded by
+    the last checkpoint entry, so a crash at any point loses at most the results
+    still in flight and never leaves a result in the output twice.
+
+    The one exception is open(retry_errors=True): items whose last status is
+    "error" run again and their new result is appended, so the output then holds
+    the old error line and the new line for the same key. Readers should keep the
+    last line per image, as the checkpoint does per key.
+    """
+
+    def __init__(self, output_path, checkpoint_path=None, run=None):
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+        self.run = run or {}
+        self.done = {}
+        self.output = None
+        self.checkpoint = None
+
+    def open(self, restart=False, retry_errors=False):
+        """Open both files for appending and return the set of item keys already finished."""
+        if restart:
+            for path in (self.output_path, self.checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        output_size = 0
+        if os.path.exists(self.checkpoint_path):
+            output_size = self._load()
+        elif os.path.exists(self.output_path) and os.path.getsize(self.output_path) > 0:
+            raise CheckpointMismatch(f"{self.output_path} exists without a checkpoint; pass --restart to overwrite it.")
+
+        for path in (self.output_path, self.checkpoint_path):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.output = open(self.output_path, "ab")
+        if self.output.tell() < output_size:
+            raise CheckpointMismatch(f"{self.output_path} is shorter than its checkpoint records; pass --restart to start over.")
+        if self.output.tell() > output_size:
+            # Results written after the last checkpoint entry; their items run again.
+            self.output.truncate(output_size)
+            self.output.seek(output_size)
+        self.checkpoint = open(self.checkpoint_path, "ab")
+        if self.checkpoint.tell() == 0:
+            self._append(self.checkpoint, self.run)
+
+        if retry_errors:
+            return {key for key, status in self.done.items() if status == "ok"}
+        return set(self.done)
+
+    def _load(self):
+        """Read the checkpoint into self.done and return the output size its last entry records."""
+        with open(self.checkpoint_path, "rb") as f:
+            data = f.read()
+        # Only lines ending in a newline were written completely.
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) < len(data):
+            with open(self.checkpoint_path, "r+b") as f:
+                f.truncate(len(complete))
+        lines = complete.splitlines()
+        if not lines:
+            return 0
+        run = json.loads(lines[0])
+        if run != self.run:
+            raise CheckpointMismatch(f"{self.checkpoint_path} belongs to another run ({run}); pass --restart to start over.")
+
+        output_size = 0
+        for line in lines[1:]:
+            output_size, status, key = json.loads(line)
+            self.done[key] = status
+        logger.info(f"Resuming from {self.checkpoint_path}: {len(self.done)} items finished.")
+        return output_size
+
+    @staticmethod
+    def _append(f, value):
+        f.write((json.dumps(value, ensure_ascii=False) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def record(self, key, result, ok=True):
+        """Append one result line and mark key finished."""
+        self._append(self.output, result)
+        status = "ok" if ok else "error"
+        self._append(self.checkpoint, [self.output.tell(), status, key])
+        self.done[key] = status
+
+    def close(self):
+        for f in (self.output, self.checkpoint):
+            if f is not None:
+                f.close()
+        self.output = self.checkpoint = None
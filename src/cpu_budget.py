@@ -0,0 +1,60 @@
+import os, sys
+import cv2
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+
+class CpuBudget:
+    """One core budget split across pool workers, OCR threads, OpenCV threads and tesseract.
+
+    Every pool worker runs up to ocr_threads tesseract subprocesses at once (each
+    limited to tesseract_threads OpenMP threads), and OpenCV's own thread pool for
+    inpainting and DNN. Any value left as 0/None is derived from total_cores so that
+    processes * max(ocr_threads * tesseract_threads, opencv_threads) <= total_cores.
+    """
+
+    def __init__(self, total_cores=None, processes=None, ocr_threads=None, opencv_threads=None, tesseract_threads=None):
+        self.total_cores = total_cores or os.cpu_count() or 1
+        self.tesseract_threads = tesseract_threads or 1
+
+        if processes and ocr_threads:
+            self.processes, self.ocr_threads = processes, ocr_threads
+        elif processes:
+            self.processes = processes
+            self.ocr_threads = max(1, self.total_cores // (processes * self.tesseract_threads))
+        elif ocr_threads:
+            self.ocr_threads = ocr_threads
+            self.processes = max(1, self.total_cores // (ocr_threads * self.tesseract_threads))
+        else:
+            # Two OCR subprocesses per worker keeps one busy while the other starts up.
+            self.ocr_threads = 2 if self.total_cores >= 2 * self.tesseract_threads else 1
+            self.processes = max(1, self.total_cores // (self.ocr_threads * self.tesseract_threads))
+
+        self.opencv_threads = opencv_threads or max(1, self.total_cores // self.processes)
+
+    @classmethod
+    def from_config(cls, cpu_config):
+        return cls(
+            total_cores=cpu_config.get('total_cores', 0),
+            processes=cpu_config.get('processes', 0),
+            ocr_threads=cpu_config.get('ocr_threads', 0),
+            opencv_threads=cpu_config.get('opencv_threads', 0),
+            tesseract_threads=cpu_config.get('tesseract_threads', 1),
+        )
+
+    def apply(self):
+        """Apply the per-process limits; call once in every worker before any OCR or OpenCV work."""
+        os.environ["OMP_THREAD_LIMIT"] = str(self.tesseract_threads)
+        cv2.setNumThreads(self.opencv_threads)
+        logger.debug(f"Applied CPU budget in process {os.getpid()}: {self.as_dict()}")
+
+    def as_dict(self):
+        return {
+            "total_cores": self.total_cores,
+            "processes": self.processes,
+            "ocr_threads": self.ocr_threads,
+            "opencv_threads": self.opencv_threads,
+            "tesseract_threads": self.tesseract_threads,
+        }
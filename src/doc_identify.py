@@ -1,21 +1,12 @@
-import re
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.rules import RULES
 
 def identify_document_type(recognized_text):
-    dc_pattern = re.compile(r"DC[-\s]?\d{3,4}")  # Pattern to identify DC-type documents
-    keywords = ["Health Questionnaire", "Driver Wellness & Safety", "MOTOR VEHICLE ADMINISTRATION"]
-    score = 0
-    document_name = None
-    
-    for text in recognized_text:
-        # Check for the DC pattern
-        if dc_pattern.search(text):
-            score += 2  # Higher score for DC pattern match
-            document_name = dc_pattern.search(text).group()  # Capture the document name (e.g., "DC-001")
+    """Score the page's lines against the document type rules in config/rules.toml.
 
-        # Check for keywords and add to score
-        score += sum(1 for keyword in keywords if keyword in text)
-    
-    # Use boolean to indicate if the document is a DC-type
-    is_dc_type = score >= 2
-    
-    return is_dc_type, document_name
\ No newline at end of file
+    Returns (is_known_type, document_name); document_name is the last type pattern
+    match (e.g. "DC-001"), or None.
+    """
+    document_type, document_name, score = RULES.classify(recognized_text)
+    return document_type is not None, document_name
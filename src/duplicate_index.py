@@ -0,0 +1,267 @@
+import os, sys
+import json
+import time
+import sqlite3
+import zlib
+import threading
+from contextlib import contextmanager
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def ink_crop(image, work_size=1024):
+    """The page, reduced by a whole factor to about work_size, cropped to the bounding box of its ink.
+
+    Cropping to the ink makes the hashes ignore scan offsets and margins.
+    """
+    h, w = image.shape[:2]
+    factor = max(1, min(h, w) // work_size)
+    if factor > 1:
+        image = cv2.resize(image[:h - h % factor, :w - w % factor], (w // factor, h // factor), interpolation=cv2.INTER_AREA)
+    _, bw = cv2.threshold(image, 0, 255, cv2.THRESH_OTSU | cv2.THRESH_BINARY_INV)
+    bw = cv2.morphologyEx(bw, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    points = cv2.findNonZero(bw)
+    if points is None:
+        return image
+    x, y, cw, ch = cv2.boundingRect(points)
+    return image[y:y + ch, x:x + cw]
+
+
+def difference_hash(image, hash_size):
+    """dHash of hash_size * hash_size bits as an int: whether each cell is brighter than its right neighbour."""
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def ink_mask(image, size, threshold=200):
+    """size x size boolean mask of the cells of a page that hold ink."""
+    return cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA) < threshold
+
+
+def ink_difference(a, b, tolerance=5):
+    """Ink cells of either mask with no ink within tolerance // 2 cells in the other.
+
+    Misregistration between two scans of one page moves ink by a cell or two and
+    is absorbed by the tolerance; a different value written in a field leaves ink
+    the other page cannot explain.
+    """
+    kernel = np.ones((tolerance, tolerance), np.uint8)
+    near_a = cv2.dilate(a.view(np.uint8), kernel).astype(bool)
+    near_b = cv2.dilate(b.view(np.uint8), kernel).astype(bool)
+    return int(np.count_nonzero(a & ~near_b) + np.count_nonzero(b & ~near_a))
+
+
+def hash_chunks(bits, chunks):
+    """(shift, mask) of each of chunks disjoint, near-equal slices of a bits-wide hash."""
+    widths = [bits // chunks + (1 if index < bits % chunks else 0) for index in range(chunks)]
+    slices = []
+    shift = bits
+    for width in widths:
+        shift -= width
+        slices.append((shift, (1 << width) - 1))
+    return slices
+
+
+class DuplicateIndex:
+    """Perceptual hashes of processed pages and their key-value pairs, to reuse results for near-duplicate pages.
+
+    A page is cropped to its ink. A 256-bit dHash of the crop is split into
+    max_distance + 1 chunks; two hashes within max_distance bits agree exactly on
+    at least one chunk (multi-index hashing), so a lookup is one indexed query per
+    chunk plus an exact distance check of the pages found. Candidates are then
+    checked against an ink mask of the crop and accepted when at most
+    max_ink_difference mask cells differ. A whole-page hash cannot tell a rescan of
+    a page from another filled copy of the same form; the mask check can.
+
+    Everything lives in one SQLite file shared by every process, read through
+    mmap, so workers share the OS page cache instead of each holding a copy of the
+    index. Entries are namespaced by the pipeline fingerprint, so results from
+    another model or other settings are never reused. Once the file grows past
+    max_size_mb the least recently matched pages are evicted.
+    """
+
+    def __init__(self, db_path, mode="verify", max_distance=10, max_ink_difference=10, hash_size=16, mask_size=384,
+                 max_candidates=8, max_size_mb=1024, mmap_size_mb=256):
+        self.db_path = db_path
+        # "reuse" returns a near-duplicate's result; "verify" still processes the page and records whether they agree.
+        self.mode = mode
+        self.max_distance = max_distance
+        self.max_ink_difference = max_ink_difference
+        self.hash_size = hash_size
+        self.mask_size = mask_size
+        self.max_candidates = max_candidates
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.mmap_bytes = int(mmap_size_mb * 1024 * 1024)
+        self.chunks = hash_chunks(hash_size * hash_size, max_distance + 1)
+        self.candidate_query = "SELECT id, hash FROM duplicate_pages WHERE id IN ({})".format(" UNION ".join(
+            ["SELECT page_id FROM page_chunks WHERE namespace_id = ? AND chunk = ? AND value = ?"] * len(self.chunks)))
+        self.namespace_ids = {}
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS namespaces (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL UNIQUE,
+                        bits INTEGER NOT NULL,
+                        chunks INTEGER NOT NULL
+                    )""")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS duplicate_pages (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        namespace_id INTEGER NOT NULL,
+                        hash TEXT NOT NULL,
+                        mask BLOB NOT NULL,
+                        result TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used REAL NOT NULL
+                    )""")
+                conn.execute("CREATE INDEX IF NOT EXISTS duplicate_pages_last_used ON duplicate_pages (last_used)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS page_chunks (
+                        namespace_id INTEGER NOT NULL,
+                        chunk INTEGER NOT NULL,
+                        value INTEGER NOT NULL,
+                        page_id INTEGER NOT NULL,
+                        PRIMARY KEY (namespace_id, chunk, value, page_id)
+                    ) WITHOUT ROWID""")
+                conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                conn.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", [("evictions",), ("bytes",)])
+        finally:
+            conn.close()
+
+    def _connection(self):
+        """This thread's connection, opened on first use and after a fork."""
+        if getattr(self.local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute(f"PRAGMA mmap_size = {self.mmap_bytes}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return self.local.conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _namespace_id(self, conn, namespace, create=False):
+        # The chunk layout is part of the name, so pages indexed under another max_distance are never searched.
+        name = f"{namespace}:{self.hash_size}:{self.max_distance}"
+        namespace_id = self.namespace_ids.get(name)
+        if namespace_id is None:
+            if create:
+                conn.execute("INSERT OR IGNORE INTO namespaces (name, bits, chunks) VALUES (?, ?, ?)",
+                             (name, self.hash_size * self.hash_size, len(self.chunks)))
+            row = conn.execute("SELECT id FROM namespaces WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            namespace_id = self.namespace_ids[name] = row[0]
+        return namespace_id
+
+    def _chunk_values(self, code, chunks=None):
+        return [(code >> shift) & mask for shift, mask in chunks or self.chunks]
+
+    def signature(self, image):
+        """(dHash, ink mask) of a page."""
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        page = ink_crop(image)
+        return difference_hash(page, self.hash_size), ink_mask(page, self.mask_size)
+
+    def _unpack_mask(self, blob):
+        bits = np.unpackbits(np.frombuffer(zlib.decompress(blob), dtype=np.uint8))
+        return bits[:self.mask_size * self.mask_size].reshape(self.mask_size, self.mask_size).astype(bool)
+
+    def search(self, page_hash, namespace):
+        """(distance, page id) of every stored page of namespace within max_distance bits of page_hash, nearest first."""
+        conn = self._connection()
+        namespace_id = self._namespace_id(conn, namespace)
+        if namespace_id is None:
+            return []
+        params = []
+        for chunk, value in enumerate(self._chunk_values(page_hash)):
+            params += [namespace_id, chunk, value]
+        found = []
+        for page_id, stored_hash in conn.execute(self.candidate_query, params):
+            distance = hamming(page_hash, int(stored_hash, 16))
+            if distance <= self.max_distance:
+                found.append((distance, page_id))
+        found.sort()
+        return found
+
+    def find(self, signature, namespace):
+        """Return (page id, key-value pairs) of a stored near-duplicate of the page, or None."""
+        page_hash, mask = signature
+        conn = self._connection()
+        for _, page_id in self.search(page_hash, namespace)[:self.max_candidates]:
+            row = conn.execute("SELECT mask, result FROM duplicate_pages WHERE id = ?", (page_id,)).fetchone()
+            if row is not None and ink_difference(mask, self._unpack_mask(row[0])) <= self.max_ink_difference:
+                with self._write() as conn:
+                    conn.execute("UPDATE duplicate_pages SET last_used = ? WHERE id = ?", (time.time(), page_id))
+                return page_id, json.loads(row[1])
+        return None
+
+    def add(self, signature, namespace, result):
+        page_hash, mask = signature
+        hex_hash = format(page_hash, "x")
+        blob = zlib.compress(np.packbits(mask).tobytes())
+        data = json.dumps(result)
+        # The chunk rows cost about as much as the hash they index.
+        size = len(blob) + len(data) + len(hex_hash) * 2
+        with self._write() as conn:
+            namespace_id = self._namespace_id(conn, namespace, create=True)
+            page_id = conn.execute("INSERT INTO duplicate_pages (namespace_id, hash, mask, result, size, last_used) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)",
+                                   (namespace_id, hex_hash, blob, data, size, time.time())).lastrowid
+            conn.executemany("INSERT INTO page_chunks (namespace_id, chunk, value, page_id) VALUES (?, ?, ?, ?)",
+                             [(namespace_id, chunk, value, page_id) for chunk, value in enumerate(self._chunk_values(page_hash))])
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'bytes'", (size,))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            rows = conn.execute("SELECT p.id, p.namespace_id, p.hash, p.size, n.bits, n.chunks FROM duplicate_pages p "
+                                "JOIN namespaces n ON n.id = p.namespace_id ORDER BY p.last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for page_id, namespace_id, stored_hash, size, bits, chunks in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM duplicate_pages WHERE id = ?", (page_id,))
+                conn.executemany("DELETE FROM page_chunks WHERE namespace_id = ? AND chunk = ? AND value = ? AND page_id = ?",
+                                 [(namespace_id, chunk, value, page_id)
+                                  for chunk, value in enumerate(self._chunk_values(int(stored_hash, 16), hash_chunks(bits, chunks)))])
+                total -= size
+                evicted += 1
+        if evicted:
+            conn.execute("UPDATE counters SET value = ? WHERE name = 'bytes'", (total,))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (evicted,))
+            logger.debug(f"Duplicate index evicted {evicted} pages.")
+
+    def stats(self):
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM duplicate_pages").fetchone()[0]
+        return {"entries": entries, "size_bytes": counters["bytes"], "max_size_bytes": self.max_bytes,
+                "evictions": counters["evictions"], "mode": self.mode, "max_distance": self.max_distance,
+                "max_ink_difference": self.max_ink_difference}
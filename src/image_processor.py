@@ -1,58 +1,501 @@
 import os, sys
+import io
+import time
+import toml
+import hashlib
+import pstats
+import cProfile
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.logger import setup_logger
 from src.image_filter import *
 from src.textdetector import *
 from src.text_recognition import *
 from src.key_value_extractor import *
+from src.result_cache import ResultCache
+from src.image_source import ImageDecoder, split_page_item, expand_pages, cached_file_hash
+from src.rules import RULES
+from src.layout_cache import LayoutCache
+from src.duplicate_index import DuplicateIndex
+from src.roi_screen import RoiScreen
+from src.admission import DeadlineExceeded, check_deadline
+from src.stage_errors import ErrorRecorder
+config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
+config = toml.load(config_path)
+ocr_backend = config.get('ocr', {}).get('backend', 'per_box')
+filter_settings = config.get('filter', {})
+decode_settings = config.get('decode', {})
+detect_batch_size = config.get('detection', {}).get('batch_size', 1)
+layout_settings = config.get('layout_cache', {})
+duplicate_settings = config.get('duplicates', {})
+roi_settings = config.get('roi_screen', {})
+
+# Component settings that change how fast a result is computed, not the result; kept out of cache keys.
+CONCURRENCY_SETTINGS = ("max_workers",)
+
 logger = setup_logger()
 
 class ImageProcessor:
-    def __init__(self, nlp, punc, image_filter: ImageFilter, text_detector: TextDetector, text_recognizer: TextRecognizer, key_value_extractor: KeyValueExtractor):
+    def __init__(self, nlp, punc, image_filter: ImageFilter, text_detector: TextDetector, text_recognizer: TextRecognizer, key_value_extractor: KeyValueExtractor, result_cache: ResultCache = None, image_decoder: ImageDecoder = None, detect_batch_size=1, model_registry=None, layout_cache: LayoutCache = None, duplicate_index: DuplicateIndex = None, roi_screen: RoiScreen = None):
         self.nlp = nlp
         self.punc = punc
         self.image_filter = image_filter
         self.text_detector = text_detector
         self.text_recognizer = text_recognizer
         self.key_value_extractor = key_value_extractor
+        self.result_cache = result_cache
+        self.image_decoder = image_decoder or ImageDecoder()
+        self.detect_batch_size = max(1, detect_batch_size)
+        # Optional ModelRegistry: pages then use the requested model or the one routed to their document type.
+        self.model_registry = model_registry
+        # Optional LayoutCache: pages of a known form are OCR'd in its cached boxes without running detection.
+        self.layout_cache = layout_cache
+        # Optional DuplicateIndex of processed pages, consulted before detection and OCR.
+        self.duplicate_index = duplicate_index
+        # Optional RoiScreen between detection and OCR: drops blank and sliver boxes, merges boxes of one line.
+        self.roi_screen = roi_screen
+        self.batch_stats = []
+        self.stage_timings = {}
+        self.image_stats = {}
+        # time.time() by which the current request must finish; no stage starts after it.
+        self.deadline = None
+        # Opt-in cProfile per stage; see start_profiling / profile_report.
+        self.stage_profiles = None
+        self._fingerprint = None
 
-    def process_single_image(self, img_path):
-        logger.info(f"Processing image at path: {img_path}")
+    def _run_stage(self, stage, func, *args):
+        """Call func(*args) and add its wall time to stage_timings[stage]; raises DeadlineExceeded past the deadline.
+
+        An error the stage's component caught and logged instead of raising marks the page failed.
+        """
+        check_deadline(self.deadline)
+        component = getattr(func, "__self__", None)
+        if isinstance(component, ErrorRecorder):
+            component.take_error()
+        else:
+            component = None
+        profiler = None
+        if self.stage_profiles is not None:
+            profiler = self.stage_profiles.setdefault(stage, cProfile.Profile())
+            profiler.enable()
+        start = time.perf_counter()
         try:
-            img = cv2.imread(img_path)
-            if img is None:
-                logger.error(f"Image at path {img_path} could not be loaded.")
-                return {}
+            result = func(*args)
+            error = component.take_error() if component is not None else None
+            if error is not None:
+                self.record_failure(stage, error)
+            return result
+        finally:
+            self.stage_timings[stage] = self.stage_timings.get(stage, 0.0) + time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
 
-            filtered_img = self.image_filter.apply_filter(img)
-            logger.debug("Image filtering completed.")
+    def record_failure(self, stage, error):
+        """Mark the current page failed: its result is incomplete, so it is neither cached nor indexed."""
+        self.image_stats.setdefault("failed", {})[stage] = str(error) or type(error).__name__
 
-            result_image, text_boxes = self.text_detector.detect_text_areas(filtered_img)
-            logger.debug(f"Text detection completed. Found {len(text_boxes)} text boxes.")
+    def page_failed(self):
+        return bool(self.image_stats.get("failed"))
 
-            recognized_text = self.text_recognizer.recognize_text_in_boxes(result_image, text_boxes)
-            logger.debug(f"Text recognition completed. Recognized {len(recognized_text)} text segments.")
+    def start_profiling(self):
+        self.stage_profiles = {}
 
-            key_value_pairs = self.key_value_extractor.extract_key_value_pairs(recognized_text)
-            logger.info(f"Key-value extraction completed. Extracted {len(key_value_pairs)} pairs.")
+    def profile_report(self, limit=25):
+        """Stop profiling and return the top functions by cumulative time, per stage."""
+        report = {}
+        for stage, profiler in (self.stage_profiles or {}).items():
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+            report[stage] = stream.getvalue()
+        self.stage_profiles = None
+        return report
+
+    def cache_fingerprint(self):
+        """Everything besides the image bytes that changes the extracted result."""
+        if self._fingerprint is None:
+            def params(component):
+                return {k: v for k, v in vars(component).items()
+                        if isinstance(v, (bool, int, float, str)) and k not in CONCURRENCY_SETTINGS}
+            self._fingerprint = {
+                "nlp": self.nlp.meta,
+                "text_noise": self.punc,
+                "decoder": params(self.image_decoder),
+                "filter": [type(self.image_filter).__name__, params(self.image_filter)],
+                "detector": [type(self.text_detector).__name__, params(self.text_detector)],
+                "recognizer": [type(self.text_recognizer).__name__, params(self.text_recognizer)],
+            }
+            if self.layout_cache is not None:
+                self._fingerprint["layout_cache"] = self.layout_cache.settings()
+            if self.roi_screen is not None:
+                self._fingerprint["roi_screen"] = params(self.roi_screen)
+        return self._fingerprint
+
+    def pipeline_fingerprint(self, model=None):
+        """cache_fingerprint plus the versions of the models a request for model can use."""
+        fingerprint = self.cache_fingerprint()
+        if self.model_registry is not None:
+            fingerprint = dict(fingerprint, models=self.model_registry.fingerprint(model))
+        return fingerprint
+
+    def _cache_lookup(self, content_hash, img_path, model=None):
+        """Return (cache_key, cached_result) for the file with content_hash; both are None when caching is off."""
+        if self.result_cache is None:
+            return None, None
+        fingerprint = self.pipeline_fingerprint(model)
+        page = split_page_item(img_path)[1]
+        if page is not None:
+            fingerprint = dict(fingerprint, page=page)
+        cache_key = ResultCache.make_key(content_hash, fingerprint)
+        return cache_key, self.result_cache.get(cache_key)
+
+    @staticmethod
+    def read_image(img_path):
+        """Return (image bytes, content hash of the file).
+
+        A page of a multi-page file is decoded straight from the file, so its bytes
+        are None and the file hash is computed once per worker, not once per page.
+        """
+        path, page = split_page_item(img_path)
+        if page is not None:
+            return None, cached_file_hash(path)
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        return image_bytes, hashlib.sha256(image_bytes).hexdigest()
+
+    def decode_image(self, img_path, image_bytes):
+        return self.image_decoder.decode(img_path, image_bytes)
+
+    def load_filtered_image(self, img_path, image_bytes=None):
+        """Run the decode and filter stages; returns None when the image cannot be loaded."""
+        img = self._run_stage("decode", self.decode_image, img_path, image_bytes)
+        if img is None:
+            logger.error(f"Image at path {img_path} could not be loaded.")
+            self.record_failure("decode", "Image could not be loaded.")
+            return None
+        self.image_stats["height"], self.image_stats["width"] = img.shape[:2]
+
+        filtered_img = self._run_stage("filter", self.image_filter.apply_filter, img)
+        if filtered_img is None:
+            self.image_stats.setdefault("failed", {}).setdefault("filter", "Filter returned no image.")
+            return None
+        logger.debug("Image filtering completed.")
+        return filtered_img
+
+    def find_duplicate(self, filtered_img, model=None):
+        """Look a filtered page up in the duplicate index.
+
+        Returns None when there is no index, else (signature, namespace, duplicate)
+        where duplicate is (page id, key-value pairs) of a stored near-duplicate or None.
+        """
+        if self.duplicate_index is None:
+            return None
+        signature = self._run_stage("duplicates", self.duplicate_index.signature, filtered_img)
+        namespace = ResultCache.make_key("", self.pipeline_fingerprint(model))
+        duplicate = self._run_stage("duplicates", self.duplicate_index.find, signature, namespace)
+        return signature, namespace, duplicate
+
+    def reuse_duplicate(self, lookup):
+        """The near-duplicate's key-value pairs when the index is in reuse mode, else None."""
+        if lookup is None or lookup[2] is None or self.duplicate_index.mode != "reuse":
+            return None
+        page_id, key_value_pairs = lookup[2]
+        logger.info(f"Reusing the key-value pairs of near-duplicate page {page_id}.")
+        self.image_stats["duplicate"] = "reused"
+        return key_value_pairs
+
+    def remember_page(self, lookup, key_value_pairs):
+        """Index a processed page, or record whether the result of its near-duplicate agreed with it."""
+        if lookup is None or self.page_failed():
+            return
+        signature, namespace, duplicate = lookup
+        if duplicate is not None:
+            agreed = duplicate[1] == key_value_pairs
+            self.image_stats["duplicate"] = "agreed" if agreed else "disagreed"
+            if not agreed:
+                logger.info(f"Near-duplicate page {duplicate[0]} has different key-value pairs.")
+        elif key_value_pairs:
+            self.image_stats["duplicate"] = "new"
+            self._run_stage("duplicates", self.duplicate_index.add, signature, namespace, key_value_pairs)
+
+    def recognize_filtered_image(self, filtered_img):
+        """Run the detect and OCR stages on a filtered page and return the recognized lines."""
+        recognized_text = self.recognize_from_layout(filtered_img)
+        if recognized_text is not None:
+            return recognized_text
+
+        result_image, text_boxes = self._run_stage("detect", self.text_detector.detect_text_areas, filtered_img)
+        recognized_text = self.recognize_boxes(result_image, text_boxes, filtered_img)
+        self.learn_layout(filtered_img, text_boxes, recognized_text)
+        return recognized_text
+
+    def recognize_from_layout(self, filtered_img):
+        """OCR a page of a known form in its cached boxes, skipping detection.
+
+        Returns None when the page matches no template, or when its text does not
+        type as the template's document type; the page then goes through detection.
+        """
+        if self.layout_cache is None:
+            return None
+        template, boxes = self._run_stage("layout", self.layout_cache.match, filtered_img)
+        if template is None:
+            self.image_stats["layout"] = "miss"
+            return None
+        recognized_text = self.recognize_boxes(filtered_img, boxes)
+        if RULES.classify(recognized_text)[0] == template.document_type:
+            self.image_stats["layout"] = "hit"
+            return recognized_text
+        logger.info(f"Page did not confirm the {template.document_type} layout template; running text detection.")
+        self.layout_cache.record_fallback(template)
+        self.image_stats["layout"] = "fallback"
+        return None
+
+    def learn_layout(self, filtered_img, text_boxes, recognized_text):
+        """Teach the layout cache the detected boxes of a page that matched no template."""
+        if self.layout_cache is not None and self.image_stats.get("layout") == "miss":
+            document_type = RULES.classify(recognized_text)[0]
+            self._run_stage("layout", self.layout_cache.learn, filtered_img, text_boxes, document_type)
+
+    def recognize_boxes(self, result_image, text_boxes, filtered_img=None):
+        """Run the ROI screen and the OCR stage over the detected boxes of one image."""
+        logger.debug(f"Text detection completed. Found {len(text_boxes)} text boxes.")
+        self.image_stats["boxes"] = len(text_boxes)
+        if self.roi_screen is not None:
+            # OCR the clean page: merged boxes would otherwise take in the outlines detection drew between them.
+            if filtered_img is not None:
+                result_image = filtered_img
+            text_boxes, screened = self._run_stage("screen", self.roi_screen.screen, result_image, text_boxes)
+            self.image_stats["boxes_pruned"] = screened["pruned"]
+            self.image_stats["boxes_merged"] = screened["merged"]
+            logger.info(f"ROI screen kept {len(text_boxes)} of {self.image_stats['boxes']} boxes: "
+                        f"{screened['pruned']} pruned, {screened['merged']} merged into line boxes.")
+
+        recognized_text = self._run_stage("recognize", self.text_recognizer.recognize_text_in_boxes, result_image, text_boxes, self.deadline)
+        logger.debug(f"Text recognition completed. Recognized {len(recognized_text)} text segments.")
+        self.image_stats["lines"] = len(recognized_text)
+        return recognized_text
 
+    def resolve_model(self, recognized_text, model=None):
+        """Registry name of the model for a page: the requested one, else the one routed to its document type."""
+        document_type = None
+        if not model and self.model_registry.document_type_models:
+            document_type = RULES.classify(recognized_text)[0]
+        return self.model_registry.resolve(model, document_type)
+
+    def extractor_for_model(self, name):
+        nlp = self.model_registry.get(name)
+        if nlp is self.nlp:
+            return self.key_value_extractor
+        # Built per use, so an evicted model is not kept alive by a cached extractor.
+        return NLPKeyValueExtraction(nlp, self.punc)
+
+    def extract_entities(self, recognized_text, model=None):
+        if self.model_registry is None:
+            return self._run_stage("ner", self.key_value_extractor.extract_entities, recognized_text)
+        extractor = self.extractor_for_model(self.resolve_model(recognized_text, model))
+        return self._run_stage("ner", extractor.extract_entities, recognized_text)
+
+    def extract_entities_batch(self, recognized_texts, model=None):
+        """One batched NER pass per model over the pages routed to it; results in page order."""
+        if self.model_registry is None:
+            return self._run_stage("ner", self.key_value_extractor.extract_entities_batch, recognized_texts)
+        groups = {}
+        for index, recognized_text in enumerate(recognized_texts):
+            groups.setdefault(self.resolve_model(recognized_text, model), []).append(index)
+        extracted = [None] * len(recognized_texts)
+        for name, indices in groups.items():
+            extractor = self.extractor_for_model(name)
+            results = self._run_stage("ner", extractor.extract_entities_batch, [recognized_texts[index] for index in indices])
+            for index, key_value_pairs in zip(indices, results):
+                extracted[index] = key_value_pairs
+        return extracted
+
+    def cache_result(self, cache_key, key_value_pairs):
+        """Store a page's result unless the page failed in some stage or came out empty; either is tried again next time."""
+        if cache_key is None:
+            return
+        if self.page_failed() or not key_value_pairs:
+            logger.debug(f"Not caching the result of a page that {'failed' if self.page_failed() else 'had no key-value pairs'}.")
+            return
+        self.result_cache.put(cache_key, key_value_pairs)
+
+    def process_single_image(self, img_path, model=None, deadline=None):
+        """Key-value pairs of one image; raises DeadlineExceeded when deadline (a time.time() value) passes first.
+
+        A page that fails in some stage returns what was extracted (often {}) with
+        image_stats["failed"] naming the stages and their errors.
+        """
+        logger.info(f"Processing image at path: {img_path}")
+        self.stage_timings = {}
+        self.image_stats = {}
+        self.deadline = deadline
+        try:
+            image_bytes, content_hash = self._run_stage("decode", self.read_image, img_path)
+            cache_key, cached = self._cache_lookup(content_hash, img_path, model)
+            if cached is not None:
+                logger.info(f"Result cache hit for {img_path}.")
+                self.image_stats["cache_hit"] = True
+                return cached
+
+            filtered_img = self.load_filtered_image(img_path, image_bytes)
+            if filtered_img is None:
+                return {}
+
+            lookup = self.find_duplicate(filtered_img, model)
+            reused = self.reuse_duplicate(lookup)
+            if reused is not None:
+                self.cache_result(cache_key, reused)
+                return reused
+
+            recognized_text = self.recognize_filtered_image(filtered_img)
+            key_value_pairs = self.extract_entities(recognized_text, model)
+            key_value_pairs = self._run_stage("cleaning", self.key_value_extractor.clean_key_value_pairs, key_value_pairs)
+            logger.info(f"Key-value extraction completed. Extracted {len(key_value_pairs)} pairs.")
+            self.remember_page(lookup, key_value_pairs)
+            self.cache_result(cache_key, key_value_pairs)
             return key_value_pairs
             
+        except DeadlineExceeded:
+            logger.info(f"Deadline exceeded while processing {img_path}.")
+            raise
         except Exception as e:
             logger.error(f"Error during image processing: {e}")
+            self.record_failure("process", e)
             return {}
+        finally:
+            self.deadline = None
+
+    def process_image_batch(self, img_paths, model=None, deadline=None):
+        """Process several images, sending the lines of all of them through NER in one batch.
+
+        Text detection runs on chunks of detect_batch_size filtered pages at a time,
+        so at most that many decoded pages are held at once. Per-image stats are
+        left in batch_stats. Returns one key-value dict per path, in the order of img_paths.
+        Raises DeadlineExceeded when deadline passes before every image is done.
+        """
+        self.deadline = deadline
+        try:
+            return self._process_image_batch(img_paths, model)
+        finally:
+            self.deadline = None
+
+    def _process_image_batch(self, img_paths, model=None):
+        self.stage_timings = {}
+        self.batch_stats = [{} for _ in img_paths]
+        results = [{} for _ in img_paths]
+        pending, cache_keys, recognized_texts = [], [], []
+        lookups = {}
+        for start in range(0, len(img_paths), self.detect_batch_size):
+            loaded = []
+            for index in range(start, min(start + self.detect_batch_size, len(img_paths))):
+                img_path = img_paths[index]
+                self.image_stats = self.batch_stats[index]
+                logger.info(f"Processing image at path: {img_path}")
+                try:
+                    image_bytes, content_hash = self._run_stage("decode", self.read_image, img_path)
+                    cache_key, cached = self._cache_lookup(content_hash, img_path, model)
+                    if cached is not None:
+                        results[index] = cached
+                        self.image_stats["cache_hit"] = True
+                        continue
+                    filtered_img = self.load_filtered_image(img_path, image_bytes)
+                    if filtered_img is None:
+                        continue
+                    lookups[index] = self.find_duplicate(filtered_img, model)
+                    reused = self.reuse_duplicate(lookups[index])
+                    if reused is not None:
+                        results[index] = reused
+                        self.cache_result(cache_key, reused)
+                        continue
+                    recognized_text = self.recognize_from_layout(filtered_img)
+                    if recognized_text is not None:
+                        recognized_texts.append(recognized_text)
+                        pending.append(index)
+                        cache_keys.append(cache_key)
+                    else:
+                        loaded.append((index, cache_key, filtered_img))
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error during image processing: {e}")
+                    self.record_failure("process", e)
+            if not loaded:
+                continue
+
+            # Detection runs for the chunk at once; an error it caught is charged to the pages it left without boxes.
+            self.image_stats = {}
+            detections = self._run_stage("detect", self.text_detector.detect_text_areas_batch, [img for _, _, img in loaded])
+            detect_failure = self.image_stats.get("failed")
+            for (index, cache_key, filtered_img), (result_image, text_boxes) in zip(loaded, detections):
+                self.image_stats = self.batch_stats[index]
+                if result_image is None or (detect_failure and not text_boxes):
+                    self.record_failure("detect", (detect_failure or {}).get("detect", "No detection result."))
+                if result_image is None:
+                    continue
+                try:
+                    recognized_text = self.recognize_boxes(result_image, text_boxes, filtered_img)
+                    self.learn_layout(filtered_img, text_boxes, recognized_text)
+                    recognized_texts.append(recognized_text)
+                    pending.append(index)
+                    cache_keys.append(cache_key)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error during image processing: {e}")
+                    self.record_failure("process", e)
+        self.image_stats = {}
+
+        extracted = self.extract_entities_batch(recognized_texts, model)
+        extracted = [self._run_stage("cleaning", self.key_value_extractor.clean_key_value_pairs, key_value_pairs)
+                     for key_value_pairs in extracted]
+        # An error the batched NER pass caught leaves every page of the batch without its entities.
+        ner_failure = self.image_stats.get("failed", {})
+        for index, cache_key, key_value_pairs in zip(pending, cache_keys, extracted):
+            results[index] = key_value_pairs
+            self.image_stats = self.batch_stats[index]
+            for stage, error in ner_failure.items():
+                self.record_failure(stage, error)
+            self.remember_page(lookups.get(index), key_value_pairs)
+            self.cache_result(cache_key, key_value_pairs)
+        self.image_stats = {}
+        logger.info(f"Key-value extraction completed for {len(img_paths)} images.")
+        return results
+
+def create_text_recognizer(ocr_threads=None):
+    if ocr_backend == "page":
+        return PytesseractPageRecognition()
+    return PytesseractTextRecognition(max_workers=ocr_threads)
 
 # # Factory for creating ImageProcessor instances
 class ImageProcessorFactory:
     @staticmethod
-    def create(nlp, punc):
+    def create(nlp, punc, result_cache=None, ocr_threads=None, model_registry=None):
         return ImageProcessor(
             nlp=nlp,
             punc=punc,
-            image_filter=LinesFilter(),
+            image_filter=LinesFilter(method=filter_settings.get('line_removal', 'inpaint'),
+                                     detect_scale=filter_settings.get('detect_scale', 1.0)),
             text_detector=EASTTextDetection(),
-            text_recognizer=PytesseractTextRecognition(),
-            key_value_extractor=NLPKeyValueExtraction(nlp, punc)
+            text_recognizer=create_text_recognizer(ocr_threads),
+            key_value_extractor=NLPKeyValueExtraction(nlp, punc),
+            result_cache=result_cache,
+            image_decoder=ImageDecoder(grayscale=decode_settings.get('grayscale', True),
+                                       target_dpi=decode_settings.get('target_dpi', 300)),
+            detect_batch_size=detect_batch_size,
+            model_registry=model_registry,
+            layout_cache=LayoutCache(min_observations=layout_settings.get('min_observations', 3),
+                                     min_correlation=layout_settings.get('min_correlation', 0.95),
+                                     max_templates=layout_settings.get('max_templates', 32))
+                         if layout_settings.get('enabled', False) else None,
+            duplicate_index=DuplicateIndex(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', duplicate_settings.get('db_path', 'cache/duplicates.sqlite'))),
+                                           mode=duplicate_settings.get('mode', 'verify'),
+                                           max_distance=duplicate_settings.get('max_distance', 10),
+                                           max_ink_difference=duplicate_settings.get('max_ink_difference', 10),
+                                           max_size_mb=duplicate_settings.get('max_size_mb', 1024))
+                            if duplicate_settings.get('enabled', False) else None,
+            roi_screen=RoiScreen(min_width=roi_settings.get('min_width', 8),
+                                 min_height=roi_settings.get('min_height', 8),
+                                 min_ink=roi_settings.get('min_ink', 0.02),
+                                 merge_gap=roi_settings.get('merge_gap', 1.0))
+                       if roi_settings.get('enabled', False) else None
         )
     
 # Updated ImageListProcessor and DirectoryProcessor
@@ -63,14 +506,16 @@ class ImageListProcessor:
     def process_image_list(self, image_paths):
         all_folders_results = [{"folder_name": "Provided Images", "images": []}]
         for img_path in image_paths:
-            if os.path.isfile(img_path) and img_path.lower().endswith(('.png', '.jpg', '.jpeg', '.tif')):
-                image_result = self.process_single_image(img_path)
-                all_folders_results[0]["images"].append({
-                    "image_filename": os.path.basename(img_path),
-                    "key_value_pairs": image_result
-                })
-            else:
+            if not (os.path.isfile(img_path) and img_path.lower().endswith(('.png', '.jpg', '.jpeg', '.tif'))):
                 raise ValueError(f"Invalid image path: {img_path}")
+
+        image_paths = list(expand_pages(image_paths))
+        image_results = self.image_processor.process_image_batch(image_paths)
+        for img_path, image_result in zip(image_paths, image_results):
+            all_folders_results[0]["images"].append({
+                "image_filename": os.path.basename(img_path),
+                "key_value_pairs": image_result
+            })
         return all_folders_results
 
     def process_single_image(self, img_path):
@@ -81,20 +526,27 @@ class DirectoryProcessor:
         self.image_processor = ImageProcessorFactory.create(nlp, text_noise)
 
     def process_directory(self, path):
-        all_folders_results = []
+        folders = []
         for root, _, files in os.walk(path):
             folder_name = os.path.basename(root)
+            filenames = [filename for filename in files if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.tif'))]
+            if filenames:
+                folders.append((folder_name, root, filenames))
+
+        folders = [(folder_name, root, [os.path.basename(item) for item in expand_pages(os.path.join(root, filename) for filename in filenames)])
+                   for folder_name, root, filenames in folders]
+        img_paths = [os.path.join(root, filename) for _, root, filenames in folders for filename in filenames]
+        image_results = iter(self.image_processor.process_image_batch(img_paths))
+
+        all_folders_results = []
+        for folder_name, _, filenames in folders:
             folder_result = {"folder_name": folder_name, "images": []}
-            for filename in files:
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.tif')):
-                    img_path = os.path.join(root, filename)
-                    image_result = self.process_single_image(img_path)
-                    folder_result["images"].append({
-                        "image_filename": filename,
-                        "key_value_pairs": image_result
-                    })
-            if folder_result["images"]:
-                all_folders_results.append(folder_result)
+            for filename in filenames:
+                folder_result["images"].append({
+                    "image_filename": filename,
+                    "key_value_pairs": next(image_results)
+                })
+            all_folders_results.append(folder_result)
         return all_folders_results
 
     def process_single_image(self, img_path):
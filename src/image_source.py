@@ -0,0 +1,135 @@
+import os, sys
+import io
+import hashlib
+from functools import lru_cache
+import cv2
+import numpy as np
+from PIL import Image
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+# A page of a multi-page file is addressed as "<path>#page=<index>" so it can be queued as its own work item.
+PAGE_MARKER = "#page="
+MULTI_PAGE_EXTENSIONS = ('.tif', '.tiff')
+REDUCTION_FACTORS = (8, 4, 2)
+
+
+def file_hash(path):
+    """sha256 hex digest of a file, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=64)
+def _file_hash_at(path, size, mtime_ns):
+    return file_hash(path)
+
+
+def cached_file_hash(path):
+    """file_hash of path, computed once per process while the file keeps its size and mtime.
+
+    The pages of a multi-page TIFF are separate work items; this keeps a worker
+    from reading and hashing the whole file again for each page it gets.
+    """
+    stat = os.stat(path)
+    return _file_hash_at(path, stat.st_size, stat.st_mtime_ns)
+
+
+def page_item(path, page):
+    return f"{path}{PAGE_MARKER}{page}"
+
+
+def split_page_item(item):
+    """Return (path, page index) for a page item, or (item, None) for a plain path."""
+    path, marker, page = item.rpartition(PAGE_MARKER)
+    if marker and page.isdigit():
+        return path, int(page)
+    return item, None
+
+
+def page_count(path):
+    """Number of pages in a multi-page TIFF, read from its directory headers without decoding pixels."""
+    if not path.lower().endswith(MULTI_PAGE_EXTENSIONS):
+        return 1
+    try:
+        return max(1, cv2.imcount(path))
+    except cv2.error as e:
+        logger.error(f"Could not count pages of {path}: {e}")
+        return 1
+
+
+def expand_pages(paths):
+    """Yield one work item per page: plain paths for single-page files, page items for multi-page TIFFs."""
+    for path in paths:
+        count = page_count(path)
+        if count == 1:
+            yield path
+        else:
+            for page in range(count):
+                yield page_item(path, page)
+
+
+class ImageDecoder:
+    """Decode one image or one TIFF page at a time, optionally in grayscale and at reduced resolution.
+
+    target_dpi is the resolution the pipeline needs; sources scanned at two or more
+    times that are decoded at 1/2, 1/4 or 1/8 size. 0 disables reduction.
+    """
+
+    def __init__(self, grayscale=True, target_dpi=300):
+        self.grayscale = grayscale
+        self.target_dpi = target_dpi
+
+    @staticmethod
+    def source_dpi(source, page=None):
+        """Horizontal DPI from the header of a file path or of image bytes, or None when the format does not record it.
+
+        Pillow reads only the header (and, for a TIFF page, the directories up to it), not the pixels.
+        """
+        try:
+            with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+                if page:
+                    img.seek(page)
+                dpi = img.info.get("dpi")
+            return float(dpi[0]) if dpi and dpi[0] else None
+        except Exception as e:
+            logger.debug(f"Could not read DPI: {e}")
+            return None
+
+    def reduction(self, dpi):
+        if not self.target_dpi or not dpi:
+            return 1
+        for factor in REDUCTION_FACTORS:
+            if dpi / factor >= self.target_dpi:
+                return factor
+        return 1
+
+    def imread_flags(self, factor):
+        if factor == 1:
+            return cv2.IMREAD_GRAYSCALE if self.grayscale else cv2.IMREAD_COLOR
+        prefix = "IMREAD_REDUCED_GRAYSCALE_" if self.grayscale else "IMREAD_REDUCED_COLOR_"
+        return getattr(cv2, f"{prefix}{factor}")
+
+    def decode(self, item, image_bytes=None):
+        """Decode item from image_bytes; a page item is read from its file, decoding only that page of its TIFF."""
+        path, page = split_page_item(item)
+        if page is None and image_bytes is None:
+            with open(path, "rb") as f:
+                image_bytes = f.read()
+        factor = self.reduction(self.source_dpi(path if page is not None else image_bytes, page))
+        if page is None:
+            return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), self.imread_flags(factor))
+
+        # imreadmulti ignores the IMREAD_REDUCED_* flags, so a page is shrunk right after decoding.
+        ok, pages = cv2.imreadmulti(path, page, 1, flags=self.imread_flags(1))
+        if not ok or not pages:
+            return None
+        img = pages[0]
+        if factor > 1:
+            img = cv2.resize(img, (img.shape[1] // factor, img.shape[0] // factor), interpolation=cv2.INTER_AREA)
+        return img
@@ -0,0 +1,266 @@
+import os, sys
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from functools import partial
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+from src.worker_pool import TaskError, process_image_with_timings
+from src.admission import AdmissionRejected
+
+logger = setup_logger()
+
+QUEUED, RUNNING, FINISHED, FAILED = "queued", "running", "finished", "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """SQLite-backed job table; per-image results are committed as they complete."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    folder_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    stage_timings TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    profile INTEGER NOT NULL DEFAULT 0
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL,
+                    image_path TEXT NOT NULL,
+                    image_filename TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    profile TEXT,
+                    error TEXT,
+                    PRIMARY KEY (job_id, image_path)
+                )""")
+            self._add_column_if_missing(conn, "jobs", "profile", "INTEGER NOT NULL DEFAULT 0")
+            self._add_column_if_missing(conn, "job_results", "profile", "TEXT")
+            self._add_column_if_missing(conn, "jobs", "failed", "INTEGER NOT NULL DEFAULT 0")
+            self._add_column_if_missing(conn, "job_results", "error", "TEXT")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _add_column_if_missing(conn, table, column, definition):
+        columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def create(self, folder_path, profile=False):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, folder_path, status, created_at, profile) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, folder_path, QUEUED, time.time(), int(profile)))
+        return job_id
+
+    def delete(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["stage_timings"] = json.loads(job["stage_timings"])
+        return job
+
+    def unfinished(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                                (QUEUED, RUNNING)).fetchall()
+        return [row["id"] for row in rows]
+
+    def mark_running(self, job_id, total):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, total = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                         (RUNNING, total, time.time(), job_id))
+
+    def mark_done(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                         (status, error, time.time(), job_id))
+
+    def completed_paths(self, job_id):
+        """Images of a job with a stored result; images that failed are tried again when the job resumes."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT image_path FROM job_results WHERE job_id = ? AND error IS NULL", (job_id,)).fetchall()
+        return {row["image_path"] for row in rows}
+
+    def add_result(self, job_id, result):
+        """Store one image result, or its "error", and fold its stage timings into the job totals."""
+        with self._connect() as conn:
+            profile = json.dumps(result["profile"]) if "profile" in result else None
+            conn.execute("""INSERT OR REPLACE INTO job_results (job_id, image_path, image_filename, result, profile, error)
+                            VALUES (?, ?, ?, ?, ?, ?)""",
+                         (job_id, result["image_path"], result["image_filename"],
+                          json.dumps(result.get("key_value_pairs", {})), profile, result.get("error")))
+            row = conn.execute("SELECT stage_timings FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            timings = json.loads(row["stage_timings"])
+            for stage, seconds in result.get("stage_timings", {}).items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+            conn.execute("""UPDATE jobs SET stage_timings = ?,
+                            done = (SELECT COUNT(*) FROM job_results WHERE job_id = ?),
+                            failed = (SELECT COUNT(*) FROM job_results WHERE job_id = ? AND error IS NOT NULL) WHERE id = ?""",
+                         (json.dumps(timings), job_id, job_id, job_id))
+
+    def results(self, job_id):
+        with self._connect() as conn:
+            rows = conn.execute("""SELECT image_filename, result, profile, error FROM job_results WHERE job_id = ?
+                                   ORDER BY image_path""", (job_id,)).fetchall()
+        results = []
+        for row in rows:
+            image = {"image_filename": row["image_filename"], "key_value_pairs": json.loads(row["result"])}
+            if row["error"] is not None:
+                image["error"] = row["error"]
+            if row["profile"] is not None:
+                image["profile"] = json.loads(row["profile"])
+            results.append(image)
+        return results
+
+
+class JobManager:
+    """Runs folder jobs one at a time from a bounded queue on the shared worker pool.
+
+    Jobs left queued or running by a previous process are resumed on start, ahead of
+    new ones and counted against max_queued; images that already have a stored
+    result are not processed again. An image whose task fails or times out is
+    stored with its error and does not fail the rest of the job.
+
+    With an AdmissionController, a job's images are admitted slice_images at a
+    time like any request's, so a long job takes turns with interactive requests
+    for the pool instead of filling it.
+    """
+
+    def __init__(self, store, worker_pool, list_images, max_queued=16, admission=None, slice_images=32):
+        self.store = store
+        self.worker_pool = worker_pool
+        self.list_images = list_images
+        self.max_queued = max_queued
+        self.admission = admission
+        self.slice_images = max(1, slice_images)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            for job_id in self.store.unfinished():
+                logger.info(f"Resuming job {job_id}")
+                self.queue.put(job_id)
+            self.thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, folder_path, profile=False):
+        with self.lock:
+            # Resumed jobs count too, so a restart with a full backlog refuses new jobs until it drains.
+            if self.queue.qsize() >= self.max_queued:
+                raise JobQueueFull(f"Job queue is full ({self.queue.qsize()} jobs waiting).")
+            job_id = self.store.create(folder_path, profile)
+            self.queue.put(job_id)
+        logger.info(f"Queued job {job_id} for {folder_path}")
+        return job_id
+
+    def status(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        done = job["done"]
+        return {
+            "job_id": job["id"],
+            "folder_path": job["folder_path"],
+            "status": job["status"],
+            "profile": bool(job["profile"]),
+            "images_done": done,
+            "images_failed": job["failed"],
+            "images_total": job["total"],
+            "stage_timings": {
+                stage: {"total_seconds": round(seconds, 4), "mean_seconds": round(seconds / done, 4) if done else None}
+                for stage, seconds in job["stage_timings"].items()
+            },
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+        }
+
+    def results(self, job_id):
+        return self.store.results(job_id)
+
+    def _run(self):
+        while True:
+            self._run_job(self.queue.get())
+
+    def _admit(self, images):
+        while True:
+            try:
+                return self.admission.admit(images)
+            except AdmissionRejected as e:
+                logger.info(f"Job slice of {images} images not admitted; retrying in {e.retry_after} seconds.")
+                time.sleep(e.retry_after)
+
+    def _results(self, task, paths):
+        """Results of task over paths, admitted slice by slice when there is an admission controller."""
+        if self.admission is None:
+            yield from self.worker_pool.iter_unordered(task, paths)
+            return
+        for start in range(0, len(paths), self.slice_images):
+            batch = paths[start:start + self.slice_images]
+            admitted = self.worker_pool.iter_admitted(task, batch, self._admit(len(batch)))
+            try:
+                yield from admitted
+            finally:
+                admitted.close()
+
+    def _run_job(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["status"] in (FINISHED, FAILED):
+            return
+        start_time = time.time()
+        try:
+            image_paths = self.list_images(job["folder_path"])
+            completed = self.store.completed_paths(job_id)
+            remaining = [path for path in image_paths if path not in completed]
+            self.store.mark_running(job_id, len(image_paths))
+
+            task = partial(process_image_with_timings, profile=bool(job["profile"]))
+            failed = 0
+            for result in self._results(task, remaining):
+                if isinstance(result, TaskError):
+                    logger.error(f"Job {job_id}: error processing {result.item}: {result.error}")
+                    result = {"image_path": result.item, "image_filename": os.path.basename(result.item),
+                              "error": str(result.error) or type(result.error).__name__}
+                    failed += 1
+                self.store.add_result(job_id, result)
+
+            self.store.mark_done(job_id, FINISHED)
+            logger.info(f"Job {job_id} processed {len(remaining)} images ({failed} failed) in {time.time() - start_time:.2f} seconds")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.store.mark_done(job_id, FAILED, str(e))
@@ -1,39 +1,20 @@
+import os, sys
 import re
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.rules import RULES
 
 # Generic cleaning function
 def clean_text(value, patterns):
-    """Cleans the text by removing specified patterns."""
-    cleaned_value = re.sub(patterns, "", value, flags=re.IGNORECASE)
+    """Cleans the text by removing specified patterns (a compiled pattern or a regex string)."""
+    if isinstance(patterns, str):
+        patterns = re.compile(patterns, re.IGNORECASE)
+    cleaned_value = patterns.sub("", value)
     # cleaned_value = re.sub(r"[^\w\s/]", "", cleaned_value)  # Remove special characters
     return cleaned_value.strip()
 
-# Patterns for cleaning specific fields
-CLEANING_PATTERNS = {
-    "APPLICANT_NAME": r"(:|FIRST|Last|MIDDLE|NAME|MIDDIEE|MIDDIE|DRIVER|MIDDIT\s*)",
-
-    "DLN": r"(\bDLN\b|DL|:|DRIVER|NO|LICENSE|IDENTIFICATION|NUMBER|DENTIFIC|ATION|LICRNSE|NUMRER|NUMABR|DLN|LICENSF)\s*",
-
-    "DOB": r"(DATE|OF|BIRTH|RIRTH|Gt|NATE|:|DOB|RIRTII|SEX)\s*",
-
-    "DOC_DATE": r"(TODAY'S|:|PRINT|DATE|OF|ISSUE|TORAYS|TODAYS|TONAYS|DATT)\s*",
-
-    "DOC_NAME": r"[\(\)]",
-
-    "CITATION_DATE": r"(CITATION|DATE|:|CONVICTION|NY|REF|ID|COURT|REPORT)\s*",
-
-    "CONVICTION_DATE": r"(CITATION|DATE|:|CONVICTION|NY|REF|ID|COURT|REPORT|CONV)\s*",
-
-    "NY REF ID": r"(CITATION|DATE|:|CONVICTION|NY|REF|ID|COURT|REPORT)\s*",
-    
-    "COURT REPORT ID": r"(:|ID|ENTIFIER|COURT|REPORT|ACD|CODE|DETAIL)\s*",
-
-    "CONVICTION REASON": r"(REASON|OF|FOR|CONVICTION)\s*",
-
-}
+# Patterns for cleaning specific fields, compiled from the [cleaning] table of config/rules.toml
+CLEANING_PATTERNS = RULES.cleaning_patterns
 
 # Function to clean the OCR JSON output
 def clean_ocr_json(ocr_json):
-    for key, pattern in CLEANING_PATTERNS.items():
-        if key in ocr_json:
-            ocr_json[key] = clean_text(ocr_json[key], pattern)
-    return ocr_json
+    return RULES.clean_key_value_pairs(ocr_json)
@@ -1,9 +1,15 @@
 import os, sys
+import toml
 from abc import ABC, abstractmethod
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.logger import setup_logger
+from src.stage_errors import ErrorRecorder
 from src.json_cleaning import *
 from src.doc_identify import *
+config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
+config = toml.load(config_path)
+nlp_batch_size = config.get('nlp', {}).get('batch_size', 64)
+
 logger = setup_logger()
 
 class TextNoiseRemover(ABC):
@@ -11,53 +17,100 @@ class TextNoiseRemover(ABC):
     def remove_text_noise(self, text):
         pass
 
-class KeyValueExtractor(ABC):
+class KeyValueExtractor(ErrorRecorder, ABC):
     @abstractmethod
     def extract_key_value_pairs(self, recognized_text):
         pass
 
+    def extract_key_value_pairs_batch(self, recognized_texts):
+        """Extract key-value pairs for several pages; one result dict per page, in order."""
+        return [self.extract_key_value_pairs(recognized_text) for recognized_text in recognized_texts]
+
+    # Extraction split into its raw and cleaning halves, so callers can time them separately.
+    # Extractors without a separate cleaning step do everything in extract_entities.
+    def extract_entities(self, recognized_text):
+        return self.extract_key_value_pairs(recognized_text)
+
+    def extract_entities_batch(self, recognized_texts):
+        return self.extract_key_value_pairs_batch(recognized_texts)
+
+    def clean_key_value_pairs(self, key_value_pairs):
+        return key_value_pairs
+
 
 class CleanText(TextNoiseRemover):
     def __init__(self, text_noise):
         self.text_noise = text_noise
+        self.noise_table = str.maketrans("", "", text_noise)
 
     def remove_text_noise(self, text):
         # logger.info("Removing text noise from recognized text.")
-        for ele in self.text_noise:
-            text = text.replace(ele, "")
-        return text
+        return text.translate(self.noise_table)
 
 class NLPKeyValueExtraction(KeyValueExtractor):
-    def __init__(self, nlp, text_noise):
+    def __init__(self, nlp, text_noise, batch_size=None):
         self.nlp = nlp
         self.text_noise = text_noise
         self.text_noise_remover = CleanText(self.text_noise)
+        self.batch_size = batch_size or nlp_batch_size
+
+    @staticmethod
+    def merge_entities(key_value_pairs, doc):
+        for ent in doc.ents:
+            if ent.label_ in key_value_pairs:
+                if ent.text not in key_value_pairs[ent.label_]:
+                    key_value_pairs[ent.label_] += ", " + ent.text
+            else:
+                key_value_pairs[ent.label_] = ent.text
 
-    
     def extract_key_value_pairs(self, recognized_text):
+        return self.clean_key_value_pairs(self.extract_entities(recognized_text))
+
+    def extract_key_value_pairs_batch(self, recognized_texts):
+        return [self.clean_key_value_pairs(key_value_pairs) for key_value_pairs in self.extract_entities_batch(recognized_texts)]
+
+    def clean_key_value_pairs(self, key_value_pairs):
+        return clean_ocr_json(key_value_pairs)
+
+    def extract_entities(self, recognized_text):
         # logger.info("Starting key-value extraction from recognized text.")
         key_value_pairs = {}
         
         try:
-            document_type, document_name = identify_document_type(recognized_text)
-            #print(document_type, document_name)
-            for text in recognized_text:
-                text = self.text_noise_remover.remove_text_noise(text)
-                doc = self.nlp(text)
-                for ent in doc.ents:
-                    if ent.label_ in key_value_pairs:
-                        if ent.text not in key_value_pairs[ent.label_]:
-                            key_value_pairs[ent.label_] += ", " + ent.text
-                    else:
-                        key_value_pairs[ent.label_] = ent.text
+            texts = (self.text_noise_remover.remove_text_noise(text) for text in recognized_text)
+            for doc in self.nlp.pipe(texts, batch_size=self.batch_size):
+                self.merge_entities(key_value_pairs, doc)
 
             logger.info(f"Cleaning text & Key-value extraction completed. Extracted {len(key_value_pairs)} pairs.")
         except Exception as e:
             logger.error(f"Error during key-value extraction: {e}")
+            self.record_error(e)
         
         #print(key_value_pairs)
 
-        cleaned_key_value_pairs = clean_ocr_json(key_value_pairs)
-        return cleaned_key_value_pairs
-    
-    
\ No newline at end of file
+        return key_value_pairs
+
+    def extract_entities_batch(self, recognized_texts):
+        """Run the lines of every page through a single nlp.pipe stream.
+
+        Each line carries its page index as context, so entities are merged into
+        the dict of the page they came from with the same rules as the per-page path.
+        """
+        recognized_texts = list(recognized_texts)
+        results = [{} for _ in recognized_texts]
+
+        try:
+            lines = (
+                (self.text_noise_remover.remove_text_noise(text), page)
+                for page, recognized_text in enumerate(recognized_texts)
+                for text in recognized_text
+            )
+            for doc, page in self.nlp.pipe(lines, batch_size=self.batch_size, as_tuples=True):
+                self.merge_entities(results[page], doc)
+
+            logger.info(f"Batched key-value extraction completed for {len(recognized_texts)} pages.")
+        except Exception as e:
+            logger.error(f"Error during batched key-value extraction: {e}")
+            self.record_error(e)
+
+        return results
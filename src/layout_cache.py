@@ -0,0 +1,230 @@
+import os, sys
+import threading
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+
+def average_hash(thumbnail, hash_size=8):
+    """64-bit aHash of an ink thumbnail: whether each cell holds more ink than the page average."""
+    small = cv2.resize(thumbnail, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
+    return (small > small.mean()).ravel()
+
+
+def masked_correlation(a, b, mask):
+    """Normalised cross-correlation of two thumbnails over the pixels where mask is set."""
+    a = a[mask] - a[mask].mean()
+    b = b[mask] - b[mask].mean()
+    denominator = np.sqrt(float((a * a).sum()) * float((b * b).sum()))
+    return float((a * b).sum()) / denominator if denominator > 0 else 0.0
+
+
+def shift_image(image, dx, dy):
+    shift = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(image, shift, image.shape[::-1], borderMode=cv2.BORDER_REPLICATE)
+
+
+def box_overlap(a, b):
+    """Intersection of two (startX, startY, endX, endY) boxes over the area of the smaller one."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height / smaller if smaller > 0 else 0.0
+
+
+class LayoutTemplate:
+    """A known form layout: mean thumbnails of its pages, where they vary, and text boxes as fractions of the page size."""
+
+    def __init__(self, document_type, alignment, thumbnail, page_hash, aspect):
+        self.document_type = document_type
+        self.alignment = alignment
+        self.thumbnail = thumbnail
+        self.variation = np.zeros_like(thumbnail)
+        self.page_hash = page_hash
+        self.aspect = aspect
+        self.boxes = []
+        self.observations = 0
+        self.hits = 0
+        self.fallbacks = 0
+
+    def stable_mask(self, tolerance):
+        """Thumbnail pixels that looked the same on every page seen: printed labels and rules, not filled-in values."""
+        variation = cv2.dilate(self.variation, np.ones((3, 3), np.uint8))
+        return variation < tolerance
+
+    def add_page(self, alignment, thumbnail):
+        """Fold an aligned page into the mean thumbnails and the per-pixel variation."""
+        if self.observations:
+            self.variation = np.maximum(self.variation, np.abs(thumbnail - self.thumbnail))
+            weight = 1.0 / (self.observations + 1)
+            self.alignment += (alignment - self.alignment) * weight
+            self.thumbnail += (thumbnail - self.thumbnail) * weight
+
+    def add_boxes(self, boxes, overlap=0.5):
+        """Fold the boxes of another page of this form in; a box mostly covering a known one widens it."""
+        for box in boxes:
+            for index, known in enumerate(self.boxes):
+                if box_overlap(box, known) >= overlap:
+                    self.boxes[index] = (min(box[0], known[0]), min(box[1], known[1]),
+                                         max(box[2], known[2]), max(box[3], known[3]))
+                    break
+            else:
+                self.boxes.append(tuple(box))
+        self.observations += 1
+
+
+class LayoutCache:
+    """Text boxes of known forms, so pages of a known form skip EAST detection.
+
+    A page is fingerprinted by two thumbnails of its ink. An aHash of the small one
+    picks candidate templates cheaply; phase correlation of the larger one gives the
+    page's offset from the template, and correlation over the pixels that were
+    stable across the template's pages (printed labels and rules, not values)
+    confirms the match. Only pages whose OCR text the rule engine typed as a
+    document type are learned, and a template is served once it has been seen
+    min_observations times; its boxes are the union of the boxes detected on those
+    pages. Callers should check that the OCR of a hit still types as the template's
+    document type, and fall back to detection (record_fallback) when it does not.
+    """
+
+    def __init__(self, thumbnail_size=64, alignment_size=256, max_hash_distance=10, min_correlation=0.95,
+                 stable_tolerance=8, max_aspect_difference=0.05, min_observations=3, max_templates=32):
+        self.thumbnail_size = thumbnail_size
+        self.alignment_size = alignment_size
+        self.max_hash_distance = max_hash_distance
+        self.min_correlation = min_correlation
+        self.stable_tolerance = stable_tolerance
+        self.max_aspect_difference = max_aspect_difference
+        self.min_observations = min_observations
+        self.max_templates = max_templates
+        self.templates = []
+        self.lookups = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.lock = threading.Lock()
+
+    def fingerprint(self, image):
+        """(alignment thumbnail, thumbnail, aHash, aspect ratio) of a page, thumbnails in ink density."""
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        height, width = image.shape[:2]
+        # Area averaging by a whole factor first is several times faster than one fractional INTER_AREA resize.
+        factor = max(1, min(height, width) // self.alignment_size)
+        small = cv2.resize(image[:height - height % factor, :width - width % factor], (width // factor, height // factor),
+                           interpolation=cv2.INTER_AREA)
+        alignment = cv2.resize(small, (self.alignment_size, self.alignment_size), interpolation=cv2.INTER_AREA)
+        # Area averaging is linear, so inverting the small image gives the ink density for less work.
+        alignment = 255 - alignment.astype(np.float32)
+        thumbnail = self.thumbnail(alignment)
+        return alignment, thumbnail, average_hash(thumbnail), width / height
+
+    def thumbnail(self, alignment):
+        return cv2.resize(alignment, (self.thumbnail_size, self.thumbnail_size), interpolation=cv2.INTER_AREA)
+
+    def _find(self, fingerprint, ready_only):
+        """Best matching template and the page's (dx, dy) offset from it as fractions of the page, or (None, None)."""
+        alignment, thumbnail, page_hash, aspect = fingerprint
+        candidates = []
+        for template in self.templates:
+            if ready_only and template.observations < self.min_observations:
+                continue
+            if abs(template.aspect - aspect) > self.max_aspect_difference * template.aspect:
+                continue
+            distance = int(np.count_nonzero(template.page_hash != page_hash))
+            if distance <= self.max_hash_distance:
+                candidates.append((distance, template))
+
+        for _, template in sorted(candidates, key=lambda candidate: candidate[0]):
+            (dx, dy), _ = cv2.phaseCorrelate(template.alignment, alignment)
+            # Shift at the alignment resolution; a sub-pixel shift of the small thumbnail would smear it.
+            aligned = self.thumbnail(shift_image(alignment, -dx, -dy))
+            correlation = masked_correlation(aligned, template.thumbnail, template.stable_mask(self.stable_tolerance))
+            if correlation >= self.min_correlation:
+                return template, (dx / self.alignment_size, dy / self.alignment_size)
+        return None, None
+
+    def match(self, image):
+        """Return (template, boxes in page pixels) for a page of a known form, or (None, None)."""
+        with self.lock:
+            self.lookups += 1
+            if not self.templates:
+                return None, None
+            template, offset = self._find(self.fingerprint(image), ready_only=True)
+            if template is None:
+                return None, None
+            self.hits += 1
+            template.hits += 1
+            # Most recently hit templates first, so they are evicted last.
+            self.templates.remove(template)
+            self.templates.insert(0, template)
+
+        height, width = image.shape[:2]
+        dx, dy = offset
+        boxes = []
+        for startX, startY, endX, endY in template.boxes:
+            box = (int(max(0, (startX + dx) * width)), int(max(0, (startY + dy) * height)),
+                   int(min(width, (endX + dx) * width)), int(min(height, (endY + dy) * height)))
+            if box[2] > box[0] and box[3] > box[1]:
+                boxes.append(box)
+        return template, boxes
+
+    def record_fallback(self, template):
+        """A hit whose OCR did not confirm the template; the page went through detection after all."""
+        with self.lock:
+            self.hits -= 1
+            self.fallbacks += 1
+            template.hits -= 1
+            template.fallbacks += 1
+
+    def learn(self, image, boxes, document_type):
+        """Store the detected boxes of a page typed as document_type, into its template or a new one."""
+        if document_type is None or not boxes:
+            return
+        height, width = image.shape[:2]
+        fingerprint = self.fingerprint(image)
+        with self.lock:
+            template, offset = self._find(fingerprint, ready_only=False)
+            if template is not None and template.document_type != document_type:
+                return
+            if template is None:
+                template = LayoutTemplate(document_type, *fingerprint)
+                self.templates.insert(0, template)
+                if len(self.templates) > self.max_templates:
+                    self.templates.pop()
+                offset = (0.0, 0.0)
+            dx, dy = offset
+            alignment = shift_image(fingerprint[0], -dx * self.alignment_size, -dy * self.alignment_size)
+            template.add_page(alignment, self.thumbnail(alignment))
+            template.add_boxes([(startX / width - dx, startY / height - dy, endX / width - dx, endY / height - dy)
+                                for startX, startY, endX, endY in boxes])
+            if template.observations == self.min_observations:
+                logger.info(f"Layout template for {document_type} ready with {len(template.boxes)} boxes.")
+
+    def settings(self):
+        """The configuration that decides which boxes a page gets, without the running counters."""
+        return {
+            "thumbnail_size": self.thumbnail_size,
+            "alignment_size": self.alignment_size,
+            "max_hash_distance": self.max_hash_distance,
+            "min_correlation": self.min_correlation,
+            "stable_tolerance": self.stable_tolerance,
+            "max_aspect_difference": self.max_aspect_difference,
+            "min_observations": self.min_observations,
+            "max_templates": self.max_templates,
+        }
+
+    def stats(self):
+        with self.lock:
+            return {
+                "templates": len(self.templates),
+                "ready_templates": sum(1 for template in self.templates if template.observations >= self.min_observations),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+            }
@@ -1,5 +1,13 @@
 import os
+import time
+import queue
+import atexit
 import logging
+import threading
+import collections
+import multiprocessing
+from multiprocessing import util
+from logging.handlers import QueueHandler
 from datetime import datetime
 import toml
 
@@ -7,12 +15,22 @@ import toml
 config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
 config = toml.load(config_path)
 log_max_size_mb = config['logging']['max_size_mb']
+log_batch_size = config['logging'].get('batch_size', 256)
+log_send_interval = config['logging'].get('send_interval', 0.05)
 logs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
 
 logger_setup_done = False  # Global flag to track if logger has been set up
 
+# Outside the 'Image_Processing' tree, so the file handler can report on itself without re-entering emit().
+handler_logger = logging.getLogger(__name__)
+
 
 class CallFileHandler(logging.Handler):
+    """Append to the newest log file and start a new one once max_size_mb is reached.
+
+    The file is opened on the first record, so processes that only forward records
+    to a LogWriter never open it. Writes are not flushed per record; call flush().
+    """
     def __init__(self, base_filename, max_size_mb, logs_dir):
         super().__init__()
         self.base_filename = base_filename
@@ -20,7 +38,7 @@ class CallFileHandler(logging.Handler):
         self.logs_dir = logs_dir
         self.current_filename = None
         self.current_file = None
-        self.init_log_file()
+        self.current_size = 0
 
     def init_log_file(self):
         """Initialize or continue using the most recent log file."""
@@ -36,24 +54,31 @@ class CallFileHandler(logging.Handler):
         if log_files:
             latest_file = log_files[0]
             latest_file_size = os.path.getsize(latest_file) / (1024 * 1024)  # Convert to MB
-            print(f"Checking file: {latest_file}, Size: {latest_file_size:.2f} MB")  # Debug statement
+            handler_logger.debug("Checking file: %s, Size: %.2f MB", latest_file, latest_file_size)
 
             if latest_file_size < self.max_size_mb:
-                print(f"Continuing with existing log file: {latest_file}")  # Debug statement
+                handler_logger.debug("Continuing with existing log file: %s", latest_file)
                 self.current_filename = latest_file
                 self.current_file = open(self.current_filename, 'a')
+                self.current_size = os.path.getsize(latest_file)
                 return
 
         self.start_new_file()
 
     def emit(self, record):
-        """Write a log message to the current log file."""
+        """Write a log message to the current log file, rotating when it is full."""
         if self.current_file is None:
+            self.init_log_file()
+        elif self.current_size >= self.max_size_mb * 1024 * 1024:
             self.start_new_file()
 
-        msg = self.format(record)
-        self.current_file.write(msg + '\n')
-        self.current_file.flush()
+        msg = self.format(record) + '\n'
+        self.current_file.write(msg)
+        self.current_size += len(msg.encode('utf-8', errors='replace'))
+
+    def flush(self):
+        if self.current_file:
+            self.current_file.flush()
 
     def start_new_file(self):
         """Start a new log file."""
@@ -62,13 +87,122 @@ class CallFileHandler(logging.Handler):
 
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         self.current_filename = os.path.join(self.logs_dir, f"{self.base_filename}_{timestamp}.log")
-        print(f"Creating new log file: {self.current_filename}")  # Debug statement
+        suffix = 1
+        while os.path.exists(self.current_filename):
+            # Rotated more than once within a second
+            self.current_filename = os.path.join(self.logs_dir, f"{self.base_filename}_{timestamp}_{suffix}.log")
+            suffix += 1
+        handler_logger.debug("Creating new log file: %s", self.current_filename)
         self.current_file = open(self.current_filename, 'a')
+        self.current_size = 0
 
     def close(self):
         """Close the current log file when the handler is closed."""
         if self.current_file:
             self.current_file.close()
+            self.current_file = None
+        super().close()
+
+
+# Fields of a LogRecord that travel through the log queue, in RecordQueueHandler.prepare order.
+RECORD_FIELDS = ("name", "levelno", "levelname", "msg", "created", "msecs", "process")
+
+
+class RecordQueueHandler(QueueHandler):
+    """Collect records in process and send them to log_queue as one list per send_interval.
+
+    emit only appends the record to a deque. The sender thread reduces each record
+    to the fields the log format needs, pickles the batch and writes it to the
+    pipe; formatting happens in the LogWriter. As with any deferred handler, a
+    record's message is built when it is sent, so log arguments must not be
+    mutated after the call.
+    """
+
+    def __init__(self, log_queue, send_interval=0.05):
+        super().__init__(log_queue)
+        self.pending = collections.deque()
+        self.send_interval = send_interval
+        self.sender = threading.Thread(target=self._send_loop, name="log-sender", daemon=True)
+        self.sender.start()
+        # Runs on normal interpreter exit and when a pool worker process finishes.
+        util.Finalize(self, self.flush, exitpriority=10)
+
+    def emit(self, record):
+        self.pending.append(record)
+
+    def flush(self):
+        batch = []
+        while self.pending:
+            batch.append(self.prepare(self.pending.popleft()))
+        if batch:
+            self.queue.put(batch)
+
+    def _send_loop(self):
+        while True:
+            time.sleep(self.send_interval)
+            self.flush()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def prepare(self, record):
+        try:
+            message = record.getMessage()
+        except Exception as e:
+            message = f"{record.msg} (arguments could not be formatted: {e})"
+        if record.exc_info:
+            message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+        return (record.name, record.levelno, record.levelname, message, record.created, record.msecs, record.process)
+
+
+class LogWriter:
+    """The one writer of the log file: drains records that every process puts on log_queue.
+
+    Each queue item is a list of records from one process. Whatever is queued (up
+    to batch_size items) is written in one go and the handlers are flushed once per
+    batch, so a burst costs one flush, not one per record.
+    """
+
+    def __init__(self, log_queue, handlers, batch_size=256):
+        self.log_queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            batch = [self.log_queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            for records in batch:
+                for record in records or ():
+                    record = logging.makeLogRecord(dict(zip(RECORD_FIELDS, record)))
+                    for handler in self.handlers:
+                        if record.levelno >= handler.level:
+                            handler.handle(record)
+            for handler in self.handlers:
+                handler.flush()
+            if batch[-1] is None:
+                return
+
+    def stop(self):
+        """Write everything already queued, then stop the writer thread."""
+        if self.thread is None:
+            return
+        self.log_queue.put(None)
+        self.thread.join()
+        self.thread = None
+        for handler in self.handlers:
+            handler.close()
 
 
 def setup_logger():
@@ -102,3 +236,34 @@ def setup_logger():
 
     logger_setup_done = True
     return logger
+
+
+def start_log_writer():
+    """Move this process's log handlers onto a LogWriter thread and return the queue it reads.
+
+    Call once in the parent process; pass the queue to every worker's attach_log_queue.
+    """
+    logger = setup_logger()
+    handlers = [handler for handler in logger.handlers if not isinstance(handler, QueueHandler)]
+    log_queue = multiprocessing.Queue()
+    writer = LogWriter(log_queue, handlers, log_batch_size).start()
+    attach_log_queue(log_queue)
+
+    def stop_log_writer():
+        # Send this process's last records before the writer drains and stops.
+        for handler in logger.handlers:
+            handler.flush()
+        writer.stop()
+    atexit.register(stop_log_writer)
+    return log_queue
+
+
+def attach_log_queue(log_queue):
+    """Send this process's records to log_queue instead of writing them here."""
+    logger = setup_logger()
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        if isinstance(handler, RecordQueueHandler):
+            handler.flush()
+    logger.addHandler(RecordQueueHandler(log_queue, log_send_interval))
+    return logger
@@ -0,0 +1,180 @@
+import os, sys
+import json
+import hashlib
+import tempfile
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+from src.image_source import split_page_item, page_item, file_hash
+
+logger = setup_logger()
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif')
+
+# One lock per manifest file, so concurrent runs over one root in this process take turns.
+_manifest_locks = {}
+_manifest_locks_guard = threading.Lock()
+
+
+class FolderManifest:
+    """Change manifest for one root folder: per-image stats, content hash and last result.
+
+    Use it as a context manager: entering takes the root's lock and loads the
+    manifest, so two runs over one root never interleave their scans and saves.
+
+    Directory listings are cached with the directory's mtime: a directory whose
+    mtime has not changed is not listed again, but each of its images is still
+    stat'ed, so a file rewritten in place is caught by its size or mtime. Files
+    whose size and mtime are unchanged are not read; pass full=True to scan to
+    list every directory and hash every file again.
+    """
+
+    def __init__(self, root, manifest_dir):
+        self.root = os.path.abspath(root)
+        name = hashlib.sha1(os.path.normcase(self.root).encode("utf-8")).hexdigest()
+        self.manifest_path = os.path.join(manifest_dir, f"{name}.json")
+        self.dirs = {}
+        self.files = {}
+        with _manifest_locks_guard:
+            self.lock = _manifest_locks.setdefault(self.manifest_path, threading.Lock())
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.load()
+        except Exception:
+            self.lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.lock.release()
+
+    def load(self):
+        self.dirs, self.files = {}, {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.dirs = data.get("dirs", {})
+            self.files = data.get("files", {})
+
+    def _walk(self, path, dir_stat, full, found, visited):
+        visited.add(path)
+        cached = self.dirs.get(path)
+        if not full and cached is not None and cached["mtime_ns"] == dir_stat.st_mtime_ns:
+            for name in cached["files"]:
+                file_path = os.path.join(path, name)
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                found[file_path] = (stat.st_size, stat.st_mtime_ns)
+            subdirs = cached["subdirs"]
+            for name in subdirs:
+                sub_path = os.path.join(path, name)
+                try:
+                    self._walk(sub_path, os.stat(sub_path), full, found, visited)
+                except FileNotFoundError:
+                    pass
+            return
+
+        files, subdirs = [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    self._walk(entry.path, entry.stat(follow_symlinks=False), full, found, visited)
+                elif entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    files.append(entry.name)
+                    stat = entry.stat()
+                    found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        self.dirs[path] = {"mtime_ns": dir_stat.st_mtime_ns, "files": files, "subdirs": subdirs}
+
+    def scan(self, full=False):
+        """Return (changed, unchanged, deleted) image paths relative to the last saved results."""
+        found, visited = {}, set()
+        self._walk(self.root, os.stat(self.root), full, found, visited)
+        self.dirs = {path: listing for path, listing in self.dirs.items() if path in visited}
+
+        changed, unchanged = [], []
+        for path, stat in found.items():
+            entry = self.files.get(path)
+            if not full and entry is not None and "result" in entry and stat == (entry["size"], entry["mtime_ns"]):
+                unchanged.append(path)
+                continue
+            content_hash = file_hash(path)
+            if entry is not None and "result" in entry and entry["hash"] == content_hash:
+                # Touched but identical: keep the stored result.
+                entry["size"], entry["mtime_ns"] = stat
+                unchanged.append(path)
+                continue
+            self.files[path] = {"size": stat[0], "mtime_ns": stat[1], "hash": content_hash}
+            changed.append(path)
+
+        deleted = [path for path in self.files if path not in found]
+        for path in deleted:
+            del self.files[path]
+
+        logger.info(f"Manifest scan of {self.root}: {len(changed)} changed, {len(unchanged)} unchanged, {len(deleted)} deleted.")
+        return changed, unchanged, deleted
+
+    def set_result(self, item, result):
+        """Store the result for an image path, or for one page when item is a page item."""
+        path, page = split_page_item(item)
+        entry = self.files[path]
+        if page is None:
+            entry["result"] = result
+        else:
+            entry.setdefault("result", {})[str(page)] = result
+            entry["pages"] = True
+            unfinished = [other for other in entry.get("unfinished", []) if other != page]
+            if unfinished:
+                entry["unfinished"] = unfinished
+            else:
+                entry.pop("unfinished", None)
+
+    def clear_result(self, item):
+        """Forget the result of an image, or of one page of a multi-page file, so the next run processes it again.
+
+        The other pages of the file keep their results; the page is listed by unfinished_pages.
+        """
+        path, page = split_page_item(item)
+        entry = self.files.get(path)
+        if entry is None:
+            return
+        if page is None:
+            entry.pop("result", None)
+            entry.pop("pages", None)
+        else:
+            entry.setdefault("result", {}).pop(str(page), None)
+            entry["pages"] = True
+            entry["unfinished"] = sorted(set(entry.get("unfinished", [])) | {page})
+
+    def unfinished_pages(self):
+        """Page items cleared by clear_result in files the scan found unchanged, to be processed again."""
+        return [page_item(path, page) for path, entry in sorted(self.files.items()) for page in entry.get("unfinished", [])]
+
+    def results(self):
+        results = []
+        for path, entry in sorted(self.files.items()):
+            if "result" not in entry:
+                continue
+            if entry.get("pages"):
+                for page, result in sorted(entry["result"].items(), key=lambda item: int(item[0])):
+                    results.append({"image_filename": os.path.basename(page_item(path, page)), "key_value_pairs": result})
+            else:
+                results.append({"image_filename": os.path.basename(path), "key_value_pairs": entry["result"]})
+        return results
+
+    def save(self):
+        directory = os.path.dirname(self.manifest_path)
+        os.makedirs(directory, exist_ok=True)
+        # A temp file of its own, so a save by another process cannot be renamed into place half-written.
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.manifest_path) + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"root": self.root, "dirs": self.dirs, "files": self.files}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,166 @@
+import os, sys
+import glob
+import json
+import bisect
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+MEGAPIXEL_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64)
+# Layout cache outcome of a page (image_stats["layout"]) -> counter
+LAYOUT_COUNTERS = {"hit": "layout_cache_hits", "miss": "layout_cache_misses", "fallback": "layout_cache_fallbacks"}
+# Duplicate index outcome of a page (image_stats["duplicate"]) -> counter
+DUPLICATE_COUNTERS = {"reused": "duplicate_pages_reused", "agreed": "duplicate_checks_agreed",
+                      "disagreed": "duplicate_checks_disagreed", "new": "duplicate_pages_indexed"}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style; counts[i] covers values <= buckets[i]."""
+
+    def __init__(self, buckets, counts=None, total=0.0, count=0):
+        self.buckets = tuple(buckets)
+        self.counts = list(counts) if counts is not None else [0] * (len(self.buckets) + 1)
+        self.total = total
+        self.count = count
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def to_dict(self):
+        return {"buckets": list(self.buckets), "counts": self.counts, "sum": self.total, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["buckets"], data["counts"], data["sum"], data["count"])
+
+
+class PipelineMetrics:
+    """Per-process aggregate of ImageProcessor stage timings, box counts and image sizes.
+
+    Each process writes its snapshot to its own file in metrics_dir; collect()
+    merges every file, so the app can report totals across all pool workers.
+    """
+
+    def __init__(self, metrics_dir=None, name=None):
+        self.metrics_dir = metrics_dir
+        self.name = name or f"worker-{os.getpid()}"
+        self.histograms = {}
+        self.counters = {}
+
+    def _histogram(self, name, buckets):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(buckets)
+        return self.histograms[name]
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_image(self, stage_timings, image_stats):
+        self.increment("images_processed")
+        if image_stats.get("cache_hit"):
+            self.increment("result_cache_hits")
+        if image_stats.get("failed"):
+            self.increment("images_failed")
+        if "layout" in image_stats:
+            self.increment(LAYOUT_COUNTERS[image_stats["layout"]])
+        if "duplicate" in image_stats:
+            self.increment(DUPLICATE_COUNTERS[image_stats["duplicate"]])
+        for stage, seconds in stage_timings.items():
+            self._histogram(f"stage_seconds:{stage}", DURATION_BUCKETS).observe(seconds)
+        self._histogram("image_seconds", DURATION_BUCKETS).observe(sum(stage_timings.values()))
+        if "boxes" in image_stats:
+            self._histogram("text_boxes", COUNT_BUCKETS).observe(image_stats["boxes"])
+        if "boxes_pruned" in image_stats:
+            self._histogram("text_boxes_pruned", COUNT_BUCKETS).observe(image_stats["boxes_pruned"])
+            self._histogram("text_boxes_merged", COUNT_BUCKETS).observe(image_stats["boxes_merged"])
+        if "lines" in image_stats:
+            self._histogram("text_lines", COUNT_BUCKETS).observe(image_stats["lines"])
+        if "width" in image_stats and "height" in image_stats:
+            self._histogram("image_megapixels", MEGAPIXEL_BUCKETS).observe(image_stats["width"] * image_stats["height"] / 1e6)
+
+    def record_batch(self, stage_timings, batch_stats):
+        """Record images processed together: stage time is shared equally among the images that were not cache hits."""
+        processed = sum(1 for image_stats in batch_stats if not image_stats.get("cache_hit")) or 1
+        per_image = {stage: seconds / processed for stage, seconds in stage_timings.items()}
+        for image_stats in batch_stats:
+            self.record_image({} if image_stats.get("cache_hit") else per_image, image_stats)
+
+    def snapshot(self):
+        return {
+            "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            "counters": dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        for name, data in snapshot.get("histograms", {}).items():
+            histogram = Histogram.from_dict(data)
+            if name in self.histograms:
+                self.histograms[name].merge(histogram)
+            else:
+                self.histograms[name] = histogram
+        for name, value in snapshot.get("counters", {}).items():
+            self.increment(name, value)
+
+    def flush(self):
+        if not self.metrics_dir:
+            return
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f"{self.name}.json")
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Could not write metrics to {path}: {e}")
+
+    @classmethod
+    def collect(cls, metrics_dir):
+        merged = cls()
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            try:
+                with open(path) as f:
+                    merged.merge(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping unreadable metrics file {path}: {e}")
+        return merged
+
+    @staticmethod
+    def reset(metrics_dir):
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            os.remove(path)
+
+    def to_prometheus(self, prefix="doc_ai"):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        grouped = {}
+        for name, histogram in self.histograms.items():
+            base, _, stage = name.partition(":")
+            grouped.setdefault(base, []).append((stage, histogram))
+
+        for base, series in sorted(grouped.items()):
+            metric = f"{prefix}_{base}"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(series, key=lambda item: item[0]):
+                labels = f'stage="{stage}",' if stage else ""
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {cumulative}')
+                suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+                lines.append(f"{metric}_sum{suffix} {histogram.total}")
+                lines.append(f"{metric}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,193 @@
+import os, sys
+import json
+import threading
+from collections import OrderedDict
+import toml
+import spacy
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
+config = toml.load(config_path)
+models_config = config.get('models', {})
+
+logger = setup_logger()
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ModelInfo:
+    """A spaCy pipeline directory: its registry name, meta.json fields and on-disk size."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self.version = meta.get("version")
+        self.lang = meta.get("lang")
+        self.labels = meta.get("labels", {}).get("ner", [])
+        self.size_bytes = directory_size(path)
+
+    def as_dict(self):
+        return {"name": self.name, "path": self.path, "version": self.version, "lang": self.lang,
+                "labels": self.labels, "size_mb": round(self.size_bytes / (1024 * 1024), 1)}
+
+
+class ModelRegistry:
+    """Discovered spaCy pipelines, loaded on first use and kept in an LRU under a memory budget.
+
+    Model memory is estimated from the size of the pipeline directory. The default
+    model is never evicted. Models loaded before the worker pool forks are shared
+    with the workers copy-on-write; see preload. Spawned workers load their own.
+    """
+
+    def __init__(self, models_dir, default=None, memory_budget_mb=2048, document_type_models=None, loader=spacy.load):
+        self.models_dir = models_dir
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.document_type_models = dict(document_type_models or {})
+        self.loader = loader
+        self.models = {}
+        # Names found under models_dir: the only ones a client request may pick (see named).
+        self.discovered = set()
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+        self.discover()
+        self.default = default
+        if default:
+            try:
+                self.default = self.register(default)
+            except KeyError:
+                logger.error(f"Default model {default} was not found.")
+
+    @classmethod
+    def from_config(cls):
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        return cls(os.path.join(root, models_config.get('dir', 'models')),
+                   default=models_config.get('default') or config['paths']['nlp_model'],
+                   memory_budget_mb=models_config.get('memory_budget_mb', 2048),
+                   document_type_models=models_config.get('document_types', {}))
+
+    def discover(self):
+        """Register every directory under models_dir that holds a meta.json, named by its relative path."""
+        if not os.path.isdir(self.models_dir):
+            logger.info(f"Model directory {self.models_dir} not found; only explicit model paths are available.")
+            return
+        for root, dirs, files in os.walk(self.models_dir):
+            if "meta.json" in files:
+                name = os.path.relpath(root, self.models_dir).replace(os.sep, "/")
+                self.models[name] = ModelInfo(name, root)
+                self.discovered.add(name)
+                dirs[:] = []
+        logger.info(f"Discovered {len(self.models)} models in {self.models_dir}.")
+
+    def register(self, name_or_path):
+        """Return the registry name for a discovered name or a pipeline path, registering the path if needed."""
+        if name_or_path in self.models:
+            return name_or_path
+        path = os.path.abspath(name_or_path)
+        with self.lock:
+            registered = list(self.models.items())
+        for name, info in registered:
+            if os.path.normcase(os.path.abspath(info.path)) == os.path.normcase(path):
+                return name
+        if not os.path.isdir(path):
+            raise KeyError(f"Unknown model: {name_or_path}")
+        info = ModelInfo(name_or_path, path)
+        with self.lock:
+            return self.models.setdefault(name_or_path, info).name
+
+    def named(self, name):
+        """The model a client asked for by name: only pipelines discovered under models_dir, never a path.
+
+        Raises KeyError for anything else, so requests cannot make the service load
+        (and run the code of) arbitrary directories; paths are for config and the CLI.
+        """
+        if name not in self.discovered:
+            raise KeyError(f"Unknown model: {name}")
+        return name
+
+    def resolve(self, name=None, document_type=None):
+        """Model name for a request: the named model, else the one mapped to document_type, else the default."""
+        if name:
+            return self.register(name)
+        routed = self.document_type_models.get(document_type) if document_type else None
+        return self.register(routed) if routed else self.default
+
+    def get(self, name=None, document_type=None):
+        """Return the loaded pipeline for resolve(name, document_type), loading it on first use."""
+        name = self.resolve(name, document_type)
+        with self.lock:
+            if name in self.loaded:
+                self.loaded.move_to_end(name)
+                return self.loaded[name]
+            info = self.models.get(name)
+            if info is None:
+                raise KeyError(f"Unknown model: {name}")
+            logger.info(f"Loading model {name} (version {info.version}) from {info.path}.")
+            nlp = self.loader(info.path)
+            self.loaded[name] = nlp
+            self._evict(keep=name)
+            return nlp
+
+    def _evict(self, keep):
+        used = sum(self.models[name].size_bytes for name in self.loaded)
+        for name in list(self.loaded):
+            if used <= self.memory_budget_bytes:
+                break
+            if name in (keep, self.default):
+                continue
+            del self.loaded[name]
+            used -= self.models[name].size_bytes
+            logger.info(f"Evicted model {name} to stay within the {self.memory_budget_bytes // (1024 * 1024)} MB model budget.")
+
+    def preload(self, names=()):
+        """Load the default model and names now, e.g. in the parent process before workers fork."""
+        for name in [None] + list(names):
+            self.get(name)
+
+    def fingerprint(self, name=None):
+        """Versions of every model a request for name could use, for result cache keys."""
+        names = {self.resolve(name)}
+        if not name:
+            names.update(self.register(model) for model in self.document_type_models.values() if model)
+        return {model: [self.models[model].path, self.models[model].version] if model in self.models else None
+                for model in sorted(names)}
+
+    def describe(self):
+        with self.lock:
+            models = sorted(self.models.items())
+            loaded = set(self.loaded)
+        return {
+            "default": self.default,
+            "memory_budget_mb": self.memory_budget_bytes // (1024 * 1024),
+            "document_types": self.document_type_models,
+            "models": [dict(info.as_dict(), loaded=name in loaded) for name, info in models],
+        }
+
+
+_registry = None
+
+
+def get_model_registry():
+    """The process-wide registry, created from config on first use.
+
+    Forked pool workers inherit it, including every pipeline the parent already
+    loaded, so those are shared copy-on-write instead of being loaded again.
+    Spawned workers build their own registry and load what they use.
+    """
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry.from_config()
+    return _registry
@@ -0,0 +1,138 @@
+import os, sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from multiprocessing import util
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+
+class ResultCache:
+    """Per-image key-value results on local disk, shared by every worker process.
+
+    Entries are keyed by a hash of the image file plus the pipeline fingerprint
+    (NER model metadata and processing parameters), so an unchanged image is never
+    reprocessed and a changed one can never be served stale. The store is a
+    single SQLite file in WAL mode; once it grows past max_size_mb the least
+    recently used entries are evicted.
+
+    Lookups only read, so processes never queue on the write lock for a hit. Hit
+    and miss counts are kept in memory and, with the access times of entries last
+    touched more than touch_interval seconds ago, written in one transaction at
+    most every flush_interval seconds, on put and at process exit.
+    """
+
+    def __init__(self, db_path, max_size_mb=512, flush_interval=30, touch_interval=300):
+        self.db_path = db_path
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.flush_interval = flush_interval
+        self.touch_interval = touch_interval
+        self.counts = {"hits": 0, "misses": 0}
+        self.touched = {}
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                             [("hits",), ("misses",), ("evictions",), ("bytes",)])
+        # Pool workers leave through os._exit, which skips atexit; multiprocessing runs finalizers first.
+        util.Finalize(self, self.flush, exitpriority=10)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def make_key(content_hash, fingerprint):
+        """Key of an image given the hex digest of its file and the fingerprint (which names the page of a multi-page file)."""
+        digest = hashlib.sha256(content_hash.encode("ascii"))
+        digest.update(json.dumps(fingerprint, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, last_access FROM results WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        with self.lock:
+            if row is None:
+                self.counts["misses"] += 1
+            else:
+                self.counts["hits"] += 1
+                # Eviction order only needs coarse access times.
+                if now - row[1] >= self.touch_interval:
+                    self.touched[key] = now
+            due = now - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return None if row is None else json.loads(row[0])
+
+    def flush(self):
+        """Write the hit and miss counts and access times gathered since the last flush."""
+        with self.lock:
+            counts, touched = self.counts, self.touched
+            self.counts, self.touched = {"hits": 0, "misses": 0}, {}
+            self.last_flush = time.time()
+        if not any(counts.values()) and not touched:
+            return
+        with self._connect() as conn:
+            conn.executemany("UPDATE counters SET value = value + ? WHERE name = ?",
+                             [(count, name) for name, count in counts.items() if count])
+            conn.executemany("UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?",
+                             [(access, key) for key, access in touched.items()])
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        size = len(data) + len(key)
+        with self._connect() as conn:
+            old = conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                         (key, data, size, time.time()))
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'bytes'", (size - (old[0] if old else 0),))
+            self._evict(conn)
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        conn.execute("UPDATE counters SET value = ? WHERE name = 'bytes'", (total,))
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (evicted,))
+        logger.debug(f"Result cache evicted {evicted} entries.")
+
+    def stats(self):
+        """Totals across processes; other processes' hits and misses show up within their flush_interval."""
+        self.flush()
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "size_bytes": counters["bytes"],
+            "max_size_bytes": self.max_bytes,
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "evictions": counters["evictions"],
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,92 @@
+import os, sys
+import cv2
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+from src.layout_cache import box_overlap
+
+logger = setup_logger()
+
+
+def ink_integral(image):
+    """Integral image of the ink pixels of a page: Otsu-binarized, so sums over any box cost four lookups."""
+    if len(image.shape) == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, bw = cv2.threshold(image, 0, 1, cv2.THRESH_OTSU | cv2.THRESH_BINARY_INV)
+    return cv2.integral(bw)
+
+
+def box_ink(integral, boxes):
+    """Ink pixel count of each (startX, startY, endX, endY) box."""
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    height, width = integral.shape[0] - 1, integral.shape[1] - 1
+    x1, x2 = np.clip(boxes[:, 0], 0, width), np.clip(boxes[:, 2], 0, width)
+    y1, y2 = np.clip(boxes[:, 1], 0, height), np.clip(boxes[:, 3], 0, height)
+    return (integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]).astype(np.int64)
+
+
+def same_line(a, b, min_overlap, max_gap):
+    """Whether two boxes hold text of one line: similar heights, mostly the same rows, close side by side."""
+    height_a, height_b = a[3] - a[1], b[3] - b[1]
+    shorter = min(height_a, height_b)
+    if shorter <= 0 or max(height_a, height_b) > 2 * shorter:
+        return False
+    overlap = min(a[3], b[3]) - max(a[1], b[1])
+    gap = max(a[0], b[0]) - min(a[2], b[2])
+    return overlap >= min_overlap * shorter and gap <= max_gap * shorter
+
+
+class RoiScreen:
+    """Pre-OCR pass over detected boxes: drops boxes that cannot hold text and merges boxes of one text line.
+
+    Boxes narrower than min_width, lower than min_height, or whose ink covers less
+    than min_ink of their area (blank regions and slivers left by line removal)
+    are dropped; ink is summed from an integral image of the binarized page. A box
+    lying mostly inside another is folded into it, and boxes on the same text line
+    with a gap of at most merge_gap times the line height are merged, so one OCR
+    call reads the line. merge_gap = 0 only folds boxes that overlap.
+    """
+
+    def __init__(self, min_width=8, min_height=8, min_ink=0.02, merge_gap=1.0, min_line_overlap=0.6, contained=0.9):
+        self.min_width = min_width
+        self.min_height = min_height
+        self.min_ink = min_ink
+        self.merge_gap = merge_gap
+        self.min_line_overlap = min_line_overlap
+        self.contained = contained
+
+    def prune(self, boxes, integral):
+        """Return (kept boxes, boxes too small, boxes too blank)."""
+        if not boxes:
+            return [], 0, 0
+        sizes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        widths, heights = sizes[:, 2] - sizes[:, 0], sizes[:, 3] - sizes[:, 1]
+        large = (widths >= self.min_width) & (heights >= self.min_height)
+        inked = box_ink(integral, sizes) >= self.min_ink * np.maximum(widths * heights, 1)
+        kept = [tuple(box) for box, keep in zip(boxes, large & inked) if keep]
+        return kept, int(np.count_nonzero(~large)), int(np.count_nonzero(large & ~inked))
+
+    def merge_lines(self, boxes):
+        """Fold contained boxes into their container and merge boxes of one line, until nothing changes."""
+        merged = sorted(boxes, key=lambda box: (box[0], box[1]))
+        changed = True
+        while changed:
+            changed = False
+            result = []
+            for box in merged:
+                for index, other in enumerate(result):
+                    if box_overlap(box, other) >= self.contained or same_line(box, other, self.min_line_overlap, self.merge_gap):
+                        result[index] = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                        changed = True
+                        break
+                else:
+                    result.append(box)
+            merged = result
+        return merged
+
+    def screen(self, image, boxes):
+        """Return (boxes to OCR, {"pruned": n, "merged": n}) for the detected boxes of a page."""
+        kept, small, blank = self.prune(list(boxes), ink_integral(image))
+        screened = self.merge_lines(kept)
+        logger.debug(f"ROI screen: {len(boxes)} boxes, {small} too small, {blank} blank, {len(kept) - len(screened)} merged.")
+        return screened, {"pruned": small + blank, "merged": len(kept) - len(screened)}
@@ -0,0 +1,220 @@
+import os, sys
+import re
+import toml
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.toml'))
+config = toml.load(config_path)
+rules_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', config.get('rules', {}).get('path', 'config/rules.toml')))
+
+logger = setup_logger()
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton: finds every keyword in a line with one pass over its characters.
+
+    The goto and failure functions are folded into a full transition table at build
+    time, so matching is one dict lookup per character however many keywords there are.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        transitions = [{}]
+        outputs = [set()]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in transitions[state]:
+                    transitions.append({})
+                    outputs.append(set())
+                    transitions[state][char] = len(transitions) - 1
+                state = transitions[state][char]
+            outputs[state].add(index)
+
+        # Breadth-first, so a state's failure target (always shallower) is complete before the state.
+        fail = [0] * len(transitions)
+        delta = [dict(transitions[0])] + [None] * (len(transitions) - 1)
+        order = list(transitions[0].values())
+        for state in order:
+            delta[state] = {**delta[fail[state]], **transitions[state]}
+            for char, child in transitions[state].items():
+                fail[child] = delta[fail[state]].get(char, 0)
+                outputs[child] |= outputs[fail[child]]
+                order.append(child)
+
+        self.delta = delta
+        self.outputs = [frozenset(output) for output in outputs]
+
+    def find(self, text):
+        """Indices of the keywords that occur in text."""
+        found = set()
+        delta, outputs = self.delta, self.outputs
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+REGEX_SPECIAL = set(".^$*+?{}[]|()\\")
+
+
+def literal_prefix(pattern):
+    """Literal text every match of pattern starts with, or "" when it cannot be read off the pattern."""
+    depth, in_class, escaped = 0, False, False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return ""
+
+    prefix = []
+    for char in pattern:
+        if char in REGEX_SPECIAL:
+            if char in "*?{" and prefix:
+                # The last literal may repeat zero times.
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+class DocumentType:
+    def __init__(self, name, patterns=(), keywords=(), pattern_score=2, keyword_score=1, threshold=2):
+        self.name = name
+        self.patterns = list(patterns)
+        self.keywords = list(keywords)
+        self.pattern_score = pattern_score
+        self.keyword_score = keyword_score
+        self.threshold = threshold
+
+
+# Document types from which the keyword automaton beats trying every rule on every line (see benchmarks/bench_rules.py).
+AUTOMATON_MIN_TYPES = 8
+
+
+class RuleEngine:
+    """Noise removal, value cleaning and document typing rules, compiled once.
+
+    Keywords of all document types and the literal prefixes of their patterns go
+    into one keyword automaton. Typing a line is one automaton pass plus a regex
+    search only for the patterns whose prefix occurs in it, so the cost per page
+    stays flat as types and keywords are added. The pure-Python automaton costs
+    more per character than str.find, so with fewer than automaton_min_types
+    types every pattern and keyword is simply tried on every line instead; both
+    give the same result.
+    """
+
+    def __init__(self, noise_characters="", cleaning=None, document_types=(), automaton_min_types=AUTOMATON_MIN_TYPES):
+        self.noise_characters = noise_characters
+        self.cleaning_patterns = {label: re.compile(pattern, re.IGNORECASE) for label, pattern in (cleaning or {}).items()}
+        self.document_types = list(document_types)
+        self.use_automaton = len(self.document_types) >= automaton_min_types
+        self.compiled_patterns = [[re.compile(pattern) for pattern in document_type.patterns]
+                                  for document_type in self.document_types]
+
+        # Automaton entries: (type index, None) for a keyword, (type index, compiled pattern) for a pattern prefix.
+        entries, words, self.unanchored_patterns = [], [], []
+        for type_index, document_type in enumerate(self.document_types):
+            for keyword in document_type.keywords:
+                entries.append((type_index, None))
+                words.append(keyword)
+            for pattern in document_type.patterns:
+                compiled = re.compile(pattern)
+                prefix = literal_prefix(pattern)
+                if prefix:
+                    entries.append((type_index, compiled))
+                    words.append(prefix)
+                else:
+                    self.unanchored_patterns.append((len(entries), type_index, compiled))
+                    entries.append((type_index, compiled))
+                    words.append(None)
+        self.entries = entries
+        self.keyword_matcher = KeywordMatcher(word for word in words if word is not None)
+        self.matcher_entries = [index for index, word in enumerate(words) if word is not None]
+
+    @classmethod
+    def from_file(cls, path):
+        rules = toml.load(path)
+        document_types = [DocumentType(**document_type) for document_type in rules.get('document_types', [])]
+        engine = cls(rules.get('noise', {}).get('characters', ""), rules.get('cleaning', {}), document_types)
+        logger.info(f"Loaded {len(engine.cleaning_patterns)} cleaning rules and {len(document_types)} document types from {path}.")
+        return engine
+
+    def clean_key_value_pairs(self, key_value_pairs):
+        for label, pattern in self.cleaning_patterns.items():
+            if label in key_value_pairs:
+                key_value_pairs[label] = pattern.sub("", key_value_pairs[label]).strip()
+        return key_value_pairs
+
+    def classify(self, lines):
+        """Return (document type name or None, document name, score) for a page's OCR lines."""
+        if self.use_automaton:
+            scores, names = self.score_automaton(lines)
+        else:
+            scores, names = self.score_scan(lines)
+        return self.best_type(scores, names)
+
+    def score_scan(self, lines):
+        """Per-type scores and last pattern matches, trying every pattern and keyword on every line."""
+        scores = [0] * len(self.document_types)
+        names = [None] * len(self.document_types)
+        for text in lines:
+            for type_index, document_type in enumerate(self.document_types):
+                for pattern in self.compiled_patterns[type_index]:
+                    match = pattern.search(text)
+                    if match:
+                        scores[type_index] += document_type.pattern_score
+                        names[type_index] = match.group()
+                        break
+                for keyword in document_type.keywords:
+                    if keyword in text:
+                        scores[type_index] += document_type.keyword_score
+        return scores, names
+
+    def score_automaton(self, lines):
+        """score_scan through the keyword automaton: regexes run only on lines holding their literal prefix."""
+        scores = [0] * len(self.document_types)
+        names = [None] * len(self.document_types)
+        for text in lines:
+            candidates = sorted(self.matcher_entries[found] for found in self.keyword_matcher.find(text))
+            if self.unanchored_patterns:
+                candidates = sorted(candidates + [index for index, _, _ in self.unanchored_patterns])
+            matched = set()
+            for index in candidates:
+                type_index, pattern = self.entries[index]
+                if pattern is None:
+                    scores[type_index] += self.document_types[type_index].keyword_score
+                elif type_index not in matched:
+                    match = pattern.search(text)
+                    if match:
+                        # A type's patterns score once per line, like a single pattern did.
+                        matched.add(type_index)
+                        scores[type_index] += self.document_types[type_index].pattern_score
+                        names[type_index] = match.group()
+        return scores, names
+
+    def best_type(self, scores, names):
+        best = None
+        for type_index, document_type in enumerate(self.document_types):
+            if scores[type_index] >= document_type.threshold and (best is None or scores[type_index] > scores[best]):
+                best = type_index
+        if best is None:
+            # Not typed; still report the strongest candidate's name and score, as identify_document_type did.
+            best = max(range(len(scores)), key=scores.__getitem__) if scores else None
+            return None, names[best] if best is not None else None, scores[best] if best is not None else 0
+        return self.document_types[best].name, names[best], scores[best]
+
+
+RULES = RuleEngine.from_file(rules_path)
@@ -0,0 +1,20 @@
+import os, sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class ErrorRecorder:
+    """Mixin for pipeline components that log an error and return an empty result instead of raising.
+
+    The caught error is kept until the caller takes it, so ImageProcessor can tell
+    a page that failed from a page that holds no text.
+    """
+
+    _caught_error = None
+
+    def record_error(self, error):
+        self._caught_error = error
+
+    def take_error(self):
+        """The last error caught since the previous call, or None."""
+        error, self._caught_error = self._caught_error, None
+        return error
@@ -1,22 +1,40 @@
 import os, sys
 from abc import ABC, abstractmethod
+import numpy as np
 import pytesseract
 from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 pytesseract.pytesseract.tesseract_cmd = r"D:\Tesseract-OCR\tesseract.exe"
 from src.logger import setup_logger
+from src.stage_errors import ErrorRecorder
+from src.admission import DeadlineExceeded, remaining
 logger = setup_logger()
 
-class TextRecognizer(ABC):
+
+def run_tesseract(func, *args, deadline=None, **kwargs):
+    """Call a pytesseract function; with a deadline, its tesseract subprocess is killed when the deadline passes."""
+    timeout = remaining(deadline)
+    if timeout is not None and timeout <= 0:
+        raise DeadlineExceeded("Request deadline exceeded before OCR.")
+    try:
+        return func(*args, timeout=timeout or 0, **kwargs)
+    except RuntimeError as e:
+        if timeout is not None and "timeout" in str(e).lower():
+            raise DeadlineExceeded("Request deadline exceeded during OCR; tesseract was killed.") from e
+        raise
+
+class TextRecognizer(ErrorRecorder, ABC):
     @abstractmethod
-    def recognize_text_in_boxes(self, image, text_boxes):
+    def recognize_text_in_boxes(self, image, text_boxes, deadline=None):
         pass
 
 class PytesseractTextRecognition(TextRecognizer):
-    def __init__(self):
-        pass
+    def __init__(self, max_workers=None):
+        # Upper bound on concurrent tesseract subprocesses; None lets the executor decide.
+        self.max_workers = max_workers
+        self.executor = None
 
-    def recognize_text_in_boxes(self, image, text_boxes):
+    def recognize_text_in_boxes(self, image, text_boxes, deadline=None):
         logger.info("Starting text recognition in boxes.")
         recognized_text = []
         
@@ -28,18 +46,112 @@ class PytesseractTextRecognition(TextRecognizer):
             def process_box(box):
                 startX, startY, endX, endY = box
                 roi = image[startY:endY, startX:endX]
-                return pytesseract.image_to_string(roi, config='--psm 6').strip().replace('\n', ' ')
+                return run_tesseract(pytesseract.image_to_string, roi, config='--psm 6', deadline=deadline).strip().replace('\n', ' ')
 
-            # Run OCR in parallel using ThreadPoolExecutor
-            with ThreadPoolExecutor() as executor:
-                results = list(executor.map(process_box, text_boxes))
+            # Run OCR in parallel on a ThreadPoolExecutor kept for the life of this recognizer
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            results = list(self.executor.map(process_box, text_boxes))
 
             # Filter out empty results
             recognized_text = [text for text in results if text]
 
             logger.info(f"Text recognition completed. Recognized {len(recognized_text)} texts.")
         
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error during text recognition: {e}")
+            self.record_error(e)
+
+        return recognized_text
+
+
+class PytesseractPageRecognition(TextRecognizer):
+    """Recognize every box of a page with a single tesseract invocation.
+
+    The ROIs are stacked top to bottom, in the same (y, x) reading order as
+    PytesseractTextRecognition, on one white canvas separated by blank gaps. One
+    image_to_data call reads the canvas and each word is assigned back to the ROI
+    whose band contains its vertical centre, so a page costs one process launch
+    instead of one per box.
+    """
+
+    def __init__(self, gap=40, margin=10):
+        self.gap = gap
+        self.margin = margin
+
+    def build_canvas(self, image, text_boxes):
+        rois = []
+        for startX, startY, endX, endY in text_boxes:
+            roi = image[startY:endY, startX:endX]
+            if roi.size:
+                rois.append(roi)
+            else:
+                rois.append(None)
+
+        present = [roi for roi in rois if roi is not None]
+        if not present:
+            return None, []
+
+        width = max(roi.shape[1] for roi in present) + 2 * self.margin
+        height = sum(roi.shape[0] for roi in present) + self.gap * (len(present) - 1) + 2 * self.margin
+        channels = image.shape[2:]
+        canvas = np.full((height, width) + channels, 255, dtype=image.dtype)
+
+        bands = []
+        y = self.margin
+        for roi in rois:
+            if roi is None:
+                bands.append(None)
+                continue
+            h, w = roi.shape[:2]
+            canvas[y:y + h, self.margin:self.margin + w] = roi
+            bands.append((y, y + h))
+            y += h + self.gap
+        return canvas, bands
+
+    def recognize_text_in_boxes(self, image, text_boxes, deadline=None):
+        logger.info("Starting page-level text recognition.")
+        recognized_text = []
+
+        try:
+            # Sort the boxes by Y-coordinate and then by X-coordinate to maintain reading order
+            text_boxes = sorted(text_boxes, key=lambda box: (box[1], box[0]))
+            canvas, bands = self.build_canvas(image, text_boxes)
+            if canvas is None:
+                return recognized_text
+
+            data = run_tesseract(pytesseract.image_to_data, canvas, config='--psm 6', output_type=pytesseract.Output.DICT,
+                                 deadline=deadline)
+
+            placed = [index for index, band in enumerate(bands) if band is not None]
+            band_starts = [bands[index][0] for index in placed]
+            words = [[] for _ in bands]
+            for text, top, height, block, par, line, word in zip(
+                    data["text"], data["top"], data["height"], data["block_num"],
+                    data["par_num"], data["line_num"], data["word_num"]):
+                text = text.strip()
+                if not text:
+                    continue
+                centre = top + height / 2
+                position = int(np.searchsorted(band_starts, centre, side="right")) - 1
+                if position < 0 or centre >= bands[placed[position]][1] + self.gap / 2:
+                    continue
+                index = placed[position]
+                words[index].append(((block, par, line, word), text))
+
+            for box_words in words:
+                text = " ".join(text for _, text in sorted(box_words))
+                if text:
+                    recognized_text.append(text)
+
+            logger.info(f"Text recognition completed. Recognized {len(recognized_text)} texts.")
+
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error during text recognition: {e}")
+            self.record_error(e)
 
-        return recognized_text
\ No newline at end of file
+        return recognized_text
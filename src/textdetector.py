@@ -5,20 +5,275 @@ import cv2, numpy as np
 from abc import ABC, abstractmethod
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__),'..')))
 from src.logger import setup_logger
+from src.stage_errors import ErrorRecorder
 config_path = os.path.abspath(os.path.join(os.path.dirname(__file__),'..', 'config', 'config.toml'))
 config = toml.load(config_path)
 east_model_path = config['paths']['east_model_path']
+detection_settings = config.get('detection', {})
+box_postprocess = detection_settings.get('postprocess', 'fast')
+
+# Rectangular kernel and iteration count used to merge word boxes into regions.
+GROUP_KERNEL_SIZE = (5, 4)
+GROUP_ITERATIONS = 10
+
+# EAST emits one score/geometry cell per 4x4 input pixels and needs input sides divisible by 32.
+EAST_CELL = 4
+EAST_STRIDE = 32
 
 
 logger = setup_logger()
 
-class TextDetector(ABC):
+
+def decode_predictions(scores, geometry, min_confidence):
+    """Vectorized decoding of the EAST score/geometry maps into (startX, startY, endX, endY) rects."""
+    ys, xs = np.nonzero(scores[0, 0] >= min_confidence)
+    if len(ys) == 0:
+        return [], []
+
+    confidences = scores[0, 0, ys, xs]
+    xData0, xData1, xData2, xData3, angles = (geometry[0, i, ys, xs] for i in range(5))
+
+    # Keep the float32 products and float64 sums of the per-cell loop so the
+    # truncated box coordinates are identical to decode_predictions_loop.
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    h = (xData0 + xData2).astype(np.float64)
+    w = (xData1 + xData3).astype(np.float64)
+    offsetX = xs * float(EAST_CELL)
+    offsetY = ys * float(EAST_CELL)
+    endX = (offsetX + (cos * xData1) + (sin * xData2)).astype(np.int64)
+    endY = (offsetY - (sin * xData1) + (cos * xData2)).astype(np.int64)
+    startX = (endX - w).astype(np.int64)
+    startY = (endY - h).astype(np.int64)
+
+    rects = list(zip(startX.tolist(), startY.tolist(), endX.tolist(), endY.tolist()))
+    return rects, list(confidences)
+
+
+def decode_predictions_loop(scores, geometry, min_confidence):
+    """Reference per-cell decoder, kept for parity checks and benchmarks."""
+    (numRows, numCols) = scores.shape[2:4]
+    rects = []
+    confidences = []
+
+    for y in range(0, numRows):
+        scoresData = scores[0, 0, y]
+        xData0 = geometry[0, 0, y]
+        xData1 = geometry[0, 1, y]
+        xData2 = geometry[0, 2, y]
+        xData3 = geometry[0, 3, y]
+        anglesData = geometry[0, 4, y]
+
+        for x in range(0, numCols):
+            if scoresData[x] < min_confidence:
+                continue
+
+            (offsetX, offsetY) = (x * float(EAST_CELL), y * float(EAST_CELL))
+            angle = anglesData[x]
+            cos = np.cos(angle)
+            sin = np.sin(angle)
+            h = xData0[x] + xData2[x]
+            w = xData1[x] + xData3[x]
+            endX = int(offsetX + (cos * xData1[x]) + (sin * xData2[x]))
+            endY = int(offsetY - (sin * xData1[x]) + (cos * xData2[x]))
+            startX = int(endX - w)
+            startY = int(endY - h)
+
+            rects.append((startX, startY, endX, endY))
+            confidences.append(scoresData[x])
+
+    return rects, confidences
+
+def non_max_suppression_legacy(boxes, probs=None, overlapThresh=0.3):
+    """Greedy suppression that re-slices the candidate array on every pick (quadratic)."""
+    if len(boxes) == 0:
+        logger.warning("No boxes provided for non-max suppression.")
+        return []
+
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float")
+
+    pick = []
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = boxes[:, 2]
+    y2 = boxes[:, 3]
+
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    idxs = y2
+
+    if probs is not None:
+        idxs = probs
+
+    idxs = np.argsort(idxs)
+
+    while len(idxs) > 0:
+        last = len(idxs) - 1
+        i = idxs[last]
+        pick.append(i)
+
+        xx1 = np.maximum(x1[i], x1[idxs[:last]])
+        yy1 = np.maximum(y1[i], y1[idxs[:last]])
+        xx2 = np.minimum(x2[i], x2[idxs[:last]])
+        yy2 = np.minimum(y2[i], y2[idxs[:last]])
+
+        w = np.maximum(0, xx2 - xx1 + 1)
+        h = np.maximum(0, yy2 - yy1 + 1)
+
+        overlap = (w * h) / area[idxs[:last]]
+
+        idxs = np.delete(idxs, np.concatenate(([last], np.where(overlap > overlapThresh)[0])))
+
+    logger.debug("Non-max suppression completed.")
+    return boxes[pick].astype("int")
+
+
+def fast_non_max_suppression(boxes, probs=None, overlapThresh=0.3):
+    """Same greedy suppression as non_max_suppression_legacy, in O(n log n) for local boxes.
+
+    Boxes are indexed by their left edge so each pick only compares against the
+    candidates that can overlap it horizontally, and suppression is recorded in a
+    boolean mask instead of deleting from the index array.
+    """
+    if len(boxes) == 0:
+        logger.warning("No boxes provided for non-max suppression.")
+        return []
+
+    boxes = np.asarray(boxes, dtype="float")
+    x1 = boxes[:, 0]
+    y1 = boxes[:, 1]
+    x2 = boxes[:, 2]
+    y2 = boxes[:, 3]
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+
+    keys = y2 if probs is None else np.asarray(probs)
+    # The same (unstable) argsort as the legacy version, so tied keys are picked in the same order.
+    order = np.argsort(keys)[::-1]
+
+    by_x1 = np.argsort(x1, kind="stable")
+    x1_sorted = x1[by_x1]
+    max_width = max(float((x2 - x1).max()), 0.0)
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    pick = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        pick.append(i)
+        suppressed[i] = True
+
+        lo = np.searchsorted(x1_sorted, x1[i] - max_width, side="left")
+        hi = np.searchsorted(x1_sorted, x2[i], side="right")
+        candidates = by_x1[lo:hi]
+        candidates = candidates[~suppressed[candidates]]
+        if len(candidates) == 0:
+            continue
+
+        w = np.maximum(0, np.minimum(x2[i], x2[candidates]) - np.maximum(x1[i], x1[candidates]) + 1)
+        h = np.maximum(0, np.minimum(y2[i], y2[candidates]) - np.maximum(y1[i], y1[candidates]) + 1)
+        overlap = (w * h) / area[candidates]
+        suppressed[candidates[overlap > overlapThresh]] = True
+
+    logger.debug("Non-max suppression completed.")
+    return boxes[pick].astype("int")
+
+
+def _padded_bounding_boxes(contours, newW, newH, padding):
+    text_boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        x = max(0, x - padding)
+        y = max(0, y - padding)
+        w = min(newW - x, w + 2 * padding)
+        h = min(newH - y, h + 2 * padding)
+        text_boxes.append((x, y, w, h))
+    return text_boxes
+
+
+def group_boxes_dilate(boxes, newW, newH, padding):
+    """Group boxes by drawing them into a mask and dilating it GROUP_ITERATIONS times."""
+    mask = np.zeros((newH, newW), dtype=np.uint8)
+    for (startX, startY, endX, endY) in boxes:
+        cv2.rectangle(mask, (startX, startY), (endX, endY), 255, -1)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, GROUP_KERNEL_SIZE)
+    dilated = cv2.dilate(mask, kernel, iterations=GROUP_ITERATIONS)
+
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return _padded_bounding_boxes(contours, newW, newH, padding)
+
+
+def group_boxes(boxes, newW, newH, padding):
+    """Single-pass equivalent of group_boxes_dilate.
+
+    Dilating a union of rectangles with a rectangular kernel equals the union of
+    the individually grown rectangles, so each box is clipped, grown by the total
+    dilation reach and filled once; no morphology pass over the page is needed.
+    """
+    if len(boxes) == 0:
+        return []
+
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x1 = np.minimum(boxes[:, 0], boxes[:, 2])
+    x2 = np.maximum(boxes[:, 0], boxes[:, 2])
+    y1 = np.minimum(boxes[:, 1], boxes[:, 3])
+    y2 = np.maximum(boxes[:, 1], boxes[:, 3])
+
+    visible = (x2 >= 0) & (y2 >= 0) & (x1 < newW) & (y1 < newH)
+    x1, x2, y1, y2 = x1[visible], x2[visible], y1[visible], y2[visible]
+
+    kw, kh = GROUP_KERNEL_SIZE
+    left, up = kw // 2 * GROUP_ITERATIONS, (kh - 1 - kh // 2) * GROUP_ITERATIONS
+    right, down = (kw - 1 - kw // 2) * GROUP_ITERATIONS, kh // 2 * GROUP_ITERATIONS
+    x1 = np.clip(x1, 0, newW - 1) - left
+    x2 = np.clip(x2, 0, newW - 1) + right
+    y1 = np.clip(y1, 0, newH - 1) - up
+    y2 = np.clip(y2, 0, newH - 1) + down
+    x1, x2 = np.clip(x1, 0, newW - 1), np.clip(x2, 0, newW - 1)
+    y1, y2 = np.clip(y1, 0, newH - 1), np.clip(y2, 0, newH - 1)
+
+    mask = np.zeros((newH, newW), dtype=np.uint8)
+    for sx, sy, ex, ey in zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist()):
+        mask[sy:ey + 1, sx:ex + 1] = 255
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return _padded_bounding_boxes(contours, newW, newH, padding)
+
+
+def tile_spans(length, tile_size, overlap):
+    """Split [0, length) into overlapping tiles and the core each one owns.
+
+    Returns (start, end, core_start, core_end) per tile. Tiles are tile_size long
+    (the last one is shifted back to end at length), cores partition [0, length)
+    and each core boundary sits in the middle of the overlap between two tiles.
+    All values are multiples of EAST_CELL when the inputs are multiples of EAST_STRIDE.
+    """
+    if length <= tile_size:
+        return [(0, length, 0, length)]
+    stride = max(EAST_STRIDE, tile_size - overlap)
+    starts = list(range(0, length - tile_size, stride)) + [length - tile_size]
+    ends = [start + tile_size for start in starts]
+    bounds = [0] + [(ends[i] + starts[i + 1]) // 2 // EAST_CELL * EAST_CELL for i in range(len(starts) - 1)] + [length]
+    return [(starts[i], ends[i], bounds[i], bounds[i + 1]) for i in range(len(starts))]
+
+
+class TextDetector(ErrorRecorder, ABC):
     @abstractmethod
     def detect_text_areas(self, img):
         pass
 
+    def detect_text_areas_batch(self, imgs):
+        """Detect text areas in several images; returns one (image, boxes) pair per input."""
+        return [self.detect_text_areas(img) for img in imgs]
+
 class EASTTextDetection(TextDetector):
-    def __init__(self, min_confidence=0.5, padding=5):
+    """EAST text detector.
+
+    max_side caps the longer side of the network input; larger pages are scaled
+    down and boxes are mapped back. tile_size > 0 runs pages larger than one tile
+    as overlapping tiles whose score maps are stitched before decoding.
+    """
+    def __init__(self, min_confidence=0.5, padding=5, postprocess=None, max_side=None, tile_size=None, tile_overlap=None):
         try:
             self.net = cv2.dnn.readNet(east_model_path)
             self.layerNames = [
@@ -27,53 +282,23 @@ class EASTTextDetection(TextDetector):
             ]
             self.min_confidence = min_confidence
             self.padding = padding
+            self.postprocess = postprocess or box_postprocess
+            if self.postprocess not in ("fast", "legacy"):
+                raise ValueError(f"Unknown box post-processing mode: {self.postprocess}")
+            self.max_side = detection_settings.get('max_side', 0) if max_side is None else max_side
+            self.tile_size = detection_settings.get('tile_size', 0) if tile_size is None else tile_size
+            self.tile_overlap = detection_settings.get('tile_overlap', 256) if tile_overlap is None else tile_overlap
+            if self.tile_size % EAST_STRIDE or self.tile_overlap % EAST_STRIDE or (self.tile_size and self.tile_overlap >= self.tile_size):
+                raise ValueError("tile_size and tile_overlap must be multiples of 32 with tile_overlap < tile_size")
             logger.info("EASTTextDetection initialized successfully.")
         except Exception as e:
             logger.error(f"Error initializing EASTTextDetection: {e}")
             raise
 
     def non_max_suppression(self, boxes, probs=None, overlapThresh=0.3):
-        # logger.debug("Starting non-max suppression.")
-        if len(boxes) == 0:
-            logger.warning("No boxes provided for non-max suppression.")
-            return []
-
-        if boxes.dtype.kind == "i":
-            boxes = boxes.astype("float")
-
-        pick = []
-        x1 = boxes[:, 0]
-        y1 = boxes[:, 1]
-        x2 = boxes[:, 2]
-        y2 = boxes[:, 3]
-
-        area = (x2 - x1 + 1) * (y1 - y2 + 1)
-        idxs = y2
-
-        if probs is not None:
-            idxs = probs
-
-        idxs = np.argsort(idxs)
-
-        while len(idxs) > 0:
-            last = len(idxs) - 1
-            i = idxs[last]
-            pick.append(i)
-
-            xx1 = np.maximum(x1[i], x1[idxs[:last]])
-            yy1 = np.maximum(y1[i], y1[idxs[:last]])
-            xx2 = np.minimum(x2[i], x2[idxs[:last]])
-            yy2 = np.minimum(y2[i], y2[idxs[:last]])
-
-            w = np.maximum(0, xx2 - xx1 + 1)
-            h = np.maximum(0, yy2 - yy1 + 1)
-
-            overlap = (w * h) / area[idxs[:last]]
-
-            idxs = np.delete(idxs, np.concatenate(([last], np.where(overlap > overlapThresh)[0])))
-
-        logger.debug("Non-max suppression completed.")
-        return boxes[pick].astype("int")
+        if self.postprocess == "legacy":
+            return non_max_suppression_legacy(boxes, probs, overlapThresh)
+        return fast_non_max_suppression(boxes, probs, overlapThresh)
 
     def preprocess_image(self, image):
         try:
@@ -82,7 +307,9 @@ class EASTTextDetection(TextDetector):
                 image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
 
             (H, W) = image.shape[:2]
-            (newW, newH) = (int(W / 32) * 32, int(H / 32) * 32)
+            scale = min(1.0, self.max_side / max(H, W)) if self.max_side else 1.0
+            (newW, newH) = (max(EAST_STRIDE, int(W * scale / EAST_STRIDE) * EAST_STRIDE),
+                            max(EAST_STRIDE, int(H * scale / EAST_STRIDE) * EAST_STRIDE))
             rW = W / float(newW)
             rH = H / float(newH)
 
@@ -91,79 +318,75 @@ class EASTTextDetection(TextDetector):
             return image, (H, W), (newW, newH), rW, rH
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
+            self.record_error(e)
             return None, None, None, None, None
 
+    def forward(self, image):
+        """Run EAST on image and return its (scores, geometry) maps."""
+        blob = cv2.dnn.blobFromImage(image, 1.0, (image.shape[1], image.shape[0]),
+                                     (123.68, 116.78, 103.94), swapRB=True, crop=False)
+        self.net.setInput(blob)
+        return self.net.forward(self.layerNames)
+
+    def forward_tiled(self, image):
+        """Run EAST tile by tile and stitch each tile's core into full-page score and geometry maps."""
+        (H, W) = image.shape[:2]
+        scores = np.zeros((1, 1, H // EAST_CELL, W // EAST_CELL), dtype=np.float32)
+        geometry = np.zeros((1, 5, H // EAST_CELL, W // EAST_CELL), dtype=np.float32)
+        for y0, y1, cy0, cy1 in tile_spans(H, self.tile_size, self.tile_overlap):
+            for x0, x1, cx0, cx1 in tile_spans(W, self.tile_size, self.tile_overlap):
+                tile_scores, tile_geometry = self.forward(image[y0:y1, x0:x1])
+                rows = slice((cy0 - y0) // EAST_CELL, (cy1 - y0) // EAST_CELL)
+                cols = slice((cx0 - x0) // EAST_CELL, (cx1 - x0) // EAST_CELL)
+                page_rows = slice(cy0 // EAST_CELL, cy1 // EAST_CELL)
+                page_cols = slice(cx0 // EAST_CELL, cx1 // EAST_CELL)
+                scores[:, :, page_rows, page_cols] = tile_scores[:, :, rows, cols]
+                geometry[:, :, page_rows, page_cols] = tile_geometry[:, :, rows, cols]
+        return scores, geometry
+
     def detect_text(self, image):
         try:
             # logger.debug("Starting text detection.")
-            blob = cv2.dnn.blobFromImage(image, 1.0, (image.shape[1], image.shape[0]),
-                                         (123.68, 116.78, 103.94), swapRB=True, crop=False)
-            self.net.setInput(blob)
-            (scores, geometry) = self.net.forward(self.layerNames)
-
-            (numRows, numCols) = scores.shape[2:4]
-            rects = []
-            confidences = []
-
-            for y in range(0, numRows):
-                scoresData = scores[0, 0, y]
-                xData0 = geometry[0, 0, y]
-                xData1 = geometry[0, 1, y]
-                xData2 = geometry[0, 2, y]
-                xData3 = geometry[0, 3, y]
-                anglesData = geometry[0, 4, y]
-
-                for x in range(0, numCols):
-                    if scoresData[x] < self.min_confidence:
-                        continue
-
-                    (offsetX, offsetY) = (x * 4.0, y * 4.0)
-                    angle = anglesData[x]
-                    cos = np.cos(angle)
-                    sin = np.sin(angle)
-                    h = xData0[x] + xData2[x]
-                    w = xData1[x] + xData3[x]
-                    endX = int(offsetX + (cos * xData1[x]) + (sin * xData2[x]))
-                    endY = int(offsetY - (sin * xData1[x]) + (cos * xData2[x]))
-                    startX = int(endX - w)
-                    startY = int(endY - h)
-
-                    rects.append((startX, startY, endX, endY))
-                    confidences.append(scoresData[x])
+            if self.tile_size and max(image.shape[:2]) > self.tile_size:
+                (scores, geometry) = self.forward_tiled(image)
+            else:
+                (scores, geometry) = self.forward(image)
+
+            rects, confidences = decode_predictions(scores, geometry, self.min_confidence)
 
             logger.debug("Text detection complete.")
             return rects, confidences
         except Exception as e:
             logger.error(f"Error detecting text: {e}")
+            self.record_error(e)
             return [], []
 
     def box_process(self, boxes, newW, newH):
         try:
             # logger.debug("Processing bounding boxes.")
-            mask = np.zeros((newH, newW), dtype=np.uint8)
-            for (startX, startY, endX, endY) in boxes:
-                cv2.rectangle(mask, (startX, startY), (endX, endY), 255, -1)
-
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 4))
-            dilated = cv2.dilate(mask, kernel, iterations=10)
-
-            contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            text_boxes = []
-            for contour in contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                x = max(0, x - self.padding)
-                y = max(0, y - self.padding)
-                w = min(newW - x, w + 2 * self.padding)
-                h = min(newH - y, h + 2 * self.padding)
-                text_boxes.append((x, y, w, h))
-
-            # logger.debug("Bounding box processing complete.")
-            return text_boxes
+            if self.postprocess == "legacy":
+                return group_boxes_dilate(boxes, newW, newH, self.padding)
+            return group_boxes(boxes, newW, newH, self.padding)
         except Exception as e:
             logger.error(f"Error processing boxes: {e}")
+            self.record_error(e)
             return []
 
+    def boxes_from_predictions(self, orig, rects, confidences, newW, newH, rW, rH):
+        """Suppress, group and scale decoded rects back to orig, drawing them on it."""
+        boxes = self.non_max_suppression(np.array(rects), probs=confidences)
+
+        text_boxes = self.box_process(boxes, newW, newH)
+
+        final_boxes = []
+        for (x, y, w, h) in text_boxes:
+            startX, startY = int(x * rW), int(y * rH)
+            endX, endY = int((x + w) * rW), int((y + h) * rH)
+
+            cv2.rectangle(orig, (startX, startY), (endX, endY), (0, 255, 0), 2)
+            final_boxes.append((startX, startY, endX, endY))
+        return orig, final_boxes
+
     def detect_text_areas(self, image):
         try:
             # logger.info("Detecting text areas in the image.")
@@ -174,20 +397,50 @@ class EASTTextDetection(TextDetector):
 
             rects, confidences = self.detect_text(image)
 
-            boxes = self.non_max_suppression(np.array(rects), probs=confidences)
-
-            text_boxes = self.box_process(boxes, newW, newH)
-
-            final_boxes = []
-            for (x, y, w, h) in text_boxes:
-                startX, startY = int(x * rW), int(y * rH)
-                endX, endY = int((x + w) * rW), int((y + h) * rH)
-
-                cv2.rectangle(orig, (startX, startY), (endX, endY), (0, 255, 0), 2)
-                final_boxes.append((startX, startY, endX, endY))
+            orig, final_boxes = self.boxes_from_predictions(orig, rects, confidences, newW, newH, rW, rH)
 
             logger.info("Text area detection complete.")
             return orig, final_boxes
         except Exception as e:
             logger.error(f"Error detecting text areas: {e}")
-            return None, []
\ No newline at end of file
+            self.record_error(e)
+            return None, []
+
+    def detect_text_areas_batch(self, images):
+        """Detect text areas in several pages with one forward pass per network input size.
+
+        Pages are bucketed by their EAST input size (page size rounded down to
+        multiples of 32, after the max_side cap), so same-scanner pages share one
+        blobFromImages call; the outputs are decoded per page. Pages that need
+        tiling go through detect_text_areas one at a time.
+        """
+        results = [(None, []) for _ in images]
+        buckets = {}
+        for index, image in enumerate(images):
+            try:
+                if len(image.shape) == 2:
+                    image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+                resized, (H, W), (newW, newH), rW, rH = self.preprocess_image(image)
+                if self.tile_size and max(newW, newH) > self.tile_size:
+                    results[index] = self.detect_text_areas(image)
+                    continue
+                buckets.setdefault((newW, newH), []).append((index, image.copy(), resized, rW, rH))
+            except Exception as e:
+                logger.error(f"Error preparing image {index} for batch detection: {e}")
+                self.record_error(e)
+
+        for (newW, newH), members in buckets.items():
+            try:
+                blob = cv2.dnn.blobFromImages([resized for _, _, resized, _, _ in members], 1.0, (newW, newH),
+                                              (123.68, 116.78, 103.94), swapRB=True, crop=False)
+                self.net.setInput(blob)
+                (scores, geometry) = self.net.forward(self.layerNames)
+                for position, (index, orig, _, rW, rH) in enumerate(members):
+                    rects, confidences = decode_predictions(scores[position:position + 1], geometry[position:position + 1],
+                                                            self.min_confidence)
+                    results[index] = self.boxes_from_predictions(orig, rects, confidences, newW, newH, rW, rH)
+            except Exception as e:
+                logger.error(f"Error detecting text areas for a batch of {len(members)} images at {newW}x{newH}: {e}")
+                self.record_error(e)
+        logger.info(f"Batch text area detection complete for {len(images)} images in {len(buckets)} forward passes.")
+        return results
\ No newline at end of file
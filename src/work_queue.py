@@ -0,0 +1,330 @@
+import os, sys
+import json
+import time
+import uuid
+import random
+import sqlite3
+import hashlib
+from abc import ABC, abstractmethod
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger
+
+logger = setup_logger()
+
+QUEUED, LEASED, DONE, FAILED = "queued", "leased", "done", "failed"
+
+
+def task_id_for(key):
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+class Task:
+    """A leased work item: its payload, how many times it has been leased, and the lease it is held under."""
+
+    def __init__(self, task_id, payload, attempts, token):
+        self.id = task_id
+        self.payload = payload
+        self.attempts = attempts
+        self.token = token
+
+
+class WorkQueue(ABC):
+    """Work items shared by worker processes on any number of hosts.
+
+    A worker leases items for lease_seconds, then acks each with its result or
+    fails it with an error. A lease that runs out, because its worker died or hung,
+    puts the item back in the queue for another worker; an item leased or failed
+    max_attempts times is marked failed. Delivery is at least once: a worker that
+    outlives its lease may ack an item another worker already finished, and the
+    first result is kept. Items are keyed, and enqueueing a key again is a no-op.
+    """
+
+    def __init__(self, lease_seconds=300, max_attempts=3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def enqueue(self, payloads):
+        """Add payloads (dicts with a unique "key") and return how many were new."""
+        pass
+
+    @abstractmethod
+    def lease(self, worker, count):
+        """Lease up to count queued items to worker and return them as Tasks."""
+        pass
+
+    @abstractmethod
+    def renew(self, tasks):
+        """Extend the leases of tasks still held; return the tasks whose lease was lost."""
+        pass
+
+    @abstractmethod
+    def ack(self, task, result):
+        pass
+
+    @abstractmethod
+    def fail(self, task, error):
+        """Requeue a task that raised, or mark it failed once it used its attempts."""
+        pass
+
+    @abstractmethod
+    def results(self):
+        """Yield (payload, status, result or error) for every finished or failed item."""
+        pass
+
+    @abstractmethod
+    def stats(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in one SQLite file: for the processes of one host, and for tests.
+
+    Leasing is a single write transaction, so concurrent workers never lease the
+    same item. SQLite in WAL mode needs every process on the same host; use
+    DirectoryWorkQueue on a shared folder across hosts.
+    """
+
+    def __init__(self, db_path, lease_seconds=300, max_attempts=3):
+        super().__init__(lease_seconds, max_attempts)
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    token TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    finished REAL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=60)
+
+    def enqueue(self, payloads):
+        now = time.time()
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks (key, payload, status, created) VALUES (?, ?, ?, ?)",
+                             ((payload["key"], json.dumps(payload), QUEUED, now) for payload in payloads))
+            return conn.total_changes - before
+
+    def lease(self, worker, count):
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._connect() as conn:
+            # Take the write lock up front, so two workers cannot select the same rows.
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE tasks SET status = ?, error = ?, finished = ? WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                         (FAILED, "lease expired", now, LEASED, now, self.max_attempts))
+            rows = conn.execute("""SELECT id, payload, attempts FROM tasks
+                                   WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT ?""",
+                                (QUEUED, LEASED, now, count)).fetchall()
+            conn.executemany("UPDATE tasks SET status = ?, attempts = attempts + 1, worker = ?, token = ?, lease_expires = ? WHERE id = ?",
+                             ((LEASED, worker, token, now + self.lease_seconds, task_id) for task_id, _, _ in rows))
+        return [Task(task_id, json.loads(payload), attempts + 1, token) for task_id, payload, attempts in rows]
+
+    def renew(self, tasks):
+        expires = time.time() + self.lease_seconds
+        lost = []
+        with self._connect() as conn:
+            for task in tasks:
+                updated = conn.execute("UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = ? AND token = ?",
+                                       (expires, task.id, LEASED, task.token)).rowcount
+                if not updated:
+                    lost.append(task)
+        return lost
+
+    def ack(self, task, result):
+        with self._connect() as conn:
+            conn.execute("UPDATE tasks SET status = ?, result = ?, error = NULL, finished = ? WHERE id = ? AND status != ?",
+                         (DONE, json.dumps(result), time.time(), task.id, DONE))
+
+    def fail(self, task, error):
+        status = FAILED if task.attempts >= self.max_attempts else QUEUED
+        with self._connect() as conn:
+            conn.execute("UPDATE tasks SET status = ?, error = ?, finished = ? WHERE id = ? AND status = ? AND token = ?",
+                         (status, str(error), time.time() if status == FAILED else None, task.id, LEASED, task.token))
+
+    def results(self):
+        with self._connect() as conn:
+            for payload, status, result, error in conn.execute(
+                    "SELECT payload, status, result, error FROM tasks WHERE status IN (?, ?) ORDER BY id", (DONE, FAILED)):
+                yield json.loads(payload), status, json.loads(result) if status == DONE else error
+
+    def stats(self):
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            expired = conn.execute("SELECT COUNT(*) FROM tasks WHERE status = ? AND lease_expires < ?", (LEASED, now)).fetchone()[0]
+        return {**{status: counts.get(status, 0) for status in (QUEUED, LEASED, DONE, FAILED)}, "expired_leases": expired}
+
+
+class DirectoryWorkQueue(WorkQueue):
+    """Work queue as files in a directory tree, e.g. on a share every host mounts.
+
+    Each item is a file whose state is the subdirectory it is in, and whose attempt
+    count, lease expiry and lease token are in its name:
+
+        queued/<id>~<attempts>.json
+        leased/<id>~<attempts>~<expires ms>~<token>.json
+        done/<id>.json, failed/<id>.json
+
+    Every state change is a rename, which is atomic on local disks, SMB and NFS, so
+    of several workers renaming the same queued file exactly one succeeds. Lease
+    expiry is compared with each host's clock, so hosts need synchronised clocks,
+    within a small fraction of lease_seconds.
+    """
+
+    def __init__(self, root, lease_seconds=300, max_attempts=3, scan_batch=256):
+        super().__init__(lease_seconds, max_attempts)
+        self.root = root
+        self.scan_batch = scan_batch
+        for state in (QUEUED, LEASED, DONE, FAILED, "tmp"):
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+        self.candidates = []
+        self.last_expiry_scan = 0.0
+
+    def _path(self, state, name):
+        return os.path.join(self.root, state, name)
+
+    def _write(self, state, name, value):
+        tmp_path = self._path("tmp", f"{uuid.uuid4().hex}.json")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, self._path(state, name))
+
+    @staticmethod
+    def _read(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _claim(self, source, target):
+        """Rename source to target; False when another process moved source first."""
+        try:
+            os.rename(source, target)
+            return True
+        except (FileNotFoundError, FileExistsError, PermissionError):
+            return False
+
+    def _mark_failed(self, leased, task_id, error):
+        # Claimed into tmp/ first, so failed/ only ever holds complete records.
+        claimed = self._path("tmp", f"{task_id}~failed.json")
+        if self._claim(leased, claimed):
+            self._write(FAILED, f"{task_id}.json", {"payload": self._read(claimed), "error": str(error)})
+            os.remove(claimed)
+
+    def enqueue(self, payloads):
+        known = {name.split("~")[0].split(".")[0] for state in (QUEUED, LEASED, DONE, FAILED)
+                 for name in os.listdir(os.path.join(self.root, state))}
+        added = 0
+        for payload in payloads:
+            task_id = task_id_for(payload["key"])
+            if task_id not in known:
+                self._write(QUEUED, f"{task_id}~0.json", payload)
+                known.add(task_id)
+                added += 1
+        return added
+
+    def _requeue_expired(self):
+        """Move leases that ran out back to queued/, or to failed/ once out of attempts. At most once per lease_seconds / 10."""
+        now = time.time()
+        if now - self.last_expiry_scan < self.lease_seconds / 10:
+            return
+        self.last_expiry_scan = now
+        for name in os.listdir(os.path.join(self.root, LEASED)):
+            task_id, attempts, expires, _ = name[:-len(".json")].split("~")
+            if int(expires) / 1000 >= now:
+                continue
+            source = self._path(LEASED, name)
+            if int(attempts) < self.max_attempts:
+                if self._claim(source, self._path(QUEUED, f"{task_id}~{attempts}.json")):
+                    logger.info(f"Lease on task {task_id} expired; requeued.")
+            else:
+                self._mark_failed(source, task_id, "lease expired")
+
+    def lease(self, worker, count):
+        self._requeue_expired()
+        tasks = []
+        for _ in range(2):
+            if not self.candidates:
+                names = sorted(os.listdir(os.path.join(self.root, QUEUED)))
+                # Workers listing together would all race for the same first files; each takes its own order.
+                batches = [names[i:i + self.scan_batch] for i in range(0, len(names), self.scan_batch)]
+                random.shuffle(batches)
+                self.candidates = [name for batch in batches for name in batch][::-1]
+            while self.candidates and len(tasks) < count:
+                name = self.candidates.pop()
+                task_id, attempts = name[:-len(".json")].split("~")
+                attempts = int(attempts) + 1
+                token = uuid.uuid4().hex[:12]
+                expires = int((time.time() + self.lease_seconds) * 1000)
+                leased = self._path(LEASED, f"{task_id}~{attempts}~{expires}~{token}.json")
+                if self._claim(self._path(QUEUED, name), leased):
+                    tasks.append(Task(task_id, self._read(leased), attempts, (token, expires)))
+            if tasks:
+                break
+        return tasks
+
+    def _leased_path(self, task):
+        token, expires = task.token
+        return self._path(LEASED, f"{task.id}~{task.attempts}~{expires}~{token}.json")
+
+    def renew(self, tasks):
+        expires = int((time.time() + self.lease_seconds) * 1000)
+        lost = []
+        for task in tasks:
+            token, _ = task.token
+            if self._claim(self._leased_path(task), self._path(LEASED, f"{task.id}~{task.attempts}~{expires}~{token}.json")):
+                task.token = (token, expires)
+            else:
+                lost.append(task)
+        return lost
+
+    def ack(self, task, result):
+        if not os.path.exists(self._path(DONE, f"{task.id}.json")):
+            self._write(DONE, f"{task.id}.json", {"payload": task.payload, "result": result})
+        try:
+            os.remove(self._leased_path(task))
+        except FileNotFoundError:
+            pass
+
+    def fail(self, task, error):
+        if task.attempts < self.max_attempts:
+            self._claim(self._leased_path(task), self._path(QUEUED, f"{task.id}~{task.attempts}.json"))
+        else:
+            self._mark_failed(self._leased_path(task), task.id, error)
+
+    def results(self):
+        for state in (DONE, FAILED):
+            for name in sorted(os.listdir(os.path.join(self.root, state))):
+                try:
+                    entry = self._read(self._path(state, name))
+                except (FileNotFoundError, ValueError):
+                    continue
+                yield entry["payload"], state, entry["result"] if state == DONE else entry["error"]
+
+    def stats(self):
+        now = time.time()
+        counts = {state: len(os.listdir(os.path.join(self.root, state))) for state in (QUEUED, LEASED, DONE, FAILED)}
+        expired = sum(1 for name in os.listdir(os.path.join(self.root, LEASED))
+                      if int(name[:-len(".json")].split("~")[2]) / 1000 < now)
+        return {**counts, "expired_leases": expired}
+
+
+def create_work_queue(backend, path, lease_seconds=300, max_attempts=3):
+    if backend == "sqlite":
+        return SQLiteWorkQueue(path, lease_seconds, max_attempts)
+    if backend == "directory":
+        return DirectoryWorkQueue(path, lease_seconds, max_attempts)
+    raise ValueError(f"Unknown work queue backend: {backend}")
@@ -0,0 +1,318 @@
+import os, sys
+import time
+import atexit
+import queue
+import threading
+from multiprocessing import Pool, cpu_count
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.logger import setup_logger, attach_log_queue, log_send_interval
+from src.image_processor import ImageProcessorFactory
+from src.result_cache import ResultCache
+from src.metrics import PipelineMetrics
+from src.model_registry import get_model_registry
+from src.admission import DeadlineExceeded
+
+logger = setup_logger()
+
+# Per-process state, filled once by init_worker in every pool worker.
+_worker_processor = None
+_worker_metrics = PipelineMetrics()
+
+
+def init_worker(nlp_model_path, text_noise, cache_settings=None, cpu_budget=None, metrics_dir=None, log_queue=None):
+    """Pool initializer: load the spaCy pipeline and EAST net once for this worker process.
+
+    Pipelines the parent preloaded into the model registry are inherited on fork, not loaded again.
+    Under spawn (Windows, macOS) every worker starts empty and loads its own copy here.
+    """
+    global _worker_processor, _worker_metrics
+    if log_queue is not None:
+        attach_log_queue(log_queue)
+    _worker_metrics = PipelineMetrics(metrics_dir)
+    if cpu_budget is not None:
+        cpu_budget.apply()
+    model_registry = get_model_registry()
+    nlp = model_registry.get(nlp_model_path)
+    result_cache = ResultCache(**cache_settings) if cache_settings else None
+    ocr_threads = cpu_budget.ocr_threads if cpu_budget is not None else None
+    _worker_processor = ImageProcessorFactory.create(nlp, text_noise, result_cache, ocr_threads, model_registry)
+    logger.info(f"Worker {os.getpid()} initialized with model {nlp_model_path}.")
+
+
+def get_worker_processor():
+    if _worker_processor is None:
+        raise RuntimeError("Worker processor requested outside of an initialized pool worker.")
+    return _worker_processor
+
+
+class ImageProcessingError(Exception):
+    """A pipeline stage failed on the image, so its key-value pairs are incomplete."""
+
+
+def run_processor(image_path, model=None, deadline=None, strict=False):
+    """Process one image on this worker's processor and fold its stage metrics into the worker's histograms.
+
+    With strict=True a page on which a stage failed raises ImageProcessingError
+    instead of returning its partial result, so callers can record it as an error.
+    """
+    processor = get_worker_processor()
+    try:
+        key_value_pairs = processor.process_single_image(image_path, model, deadline)
+    except DeadlineExceeded:
+        _worker_metrics.increment("images_deadline_exceeded")
+        _worker_metrics.flush()
+        raise
+    _worker_metrics.record_image(processor.stage_timings, processor.image_stats)
+    _worker_metrics.flush()
+    if strict and processor.page_failed():
+        failed = "; ".join(f"{stage}: {error}" for stage, error in processor.image_stats["failed"].items())
+        raise ImageProcessingError(f"{image_path} failed in {failed}")
+    return key_value_pairs
+
+
+def process_image(image_path, model=None, deadline=None):
+    """Pool task: run the warm ImageProcessor of this worker on one image."""
+    return {
+        "image_filename": os.path.basename(image_path),
+        "key_value_pairs": run_processor(image_path, model, deadline)
+    }
+
+
+def process_image_chunk(image_paths, model=None, deadline=None):
+    """Pool task: process several images together so same-sized pages share EAST forward passes."""
+    processor = get_worker_processor()
+    try:
+        results = processor.process_image_batch(image_paths, model, deadline)
+    except DeadlineExceeded:
+        _worker_metrics.increment("images_deadline_exceeded", len(image_paths))
+        _worker_metrics.flush()
+        raise
+    _worker_metrics.record_batch(processor.stage_timings, processor.batch_stats)
+    _worker_metrics.flush()
+    return [
+        {"image_filename": os.path.basename(image_path), "key_value_pairs": key_value_pairs}
+        for image_path, key_value_pairs in zip(image_paths, results)
+    ]
+
+
+def run_indexed(func, indexed_item):
+    """Pool task: func(item) for an (index, item) pair, returned as (index, result) so unordered results can be put back in order."""
+    index, item = indexed_item
+    return index, func(item)
+
+
+class TaskError:
+    """Result placeholder for a task that raised inside a worker."""
+
+    def __init__(self, item, error):
+        self.item = item
+        self.error = error
+
+
+class TaskTimeout(Exception):
+    """A pool task did not finish within the task timeout; its worker may have died or hung."""
+
+
+class WorkerPool:
+    """Long-lived process pool whose workers each keep a loaded ImageProcessor."""
+
+    def __init__(self, processes, nlp_model_path, text_noise, cache_settings=None, cpu_budget=None, metrics_dir=None, log_queue=None,
+                 task_timeout=None):
+        self.metrics_dir = metrics_dir
+        self.log_queue = log_queue
+        self.cpu_budget = cpu_budget
+        self.processes = processes or (cpu_budget.processes if cpu_budget is not None else cpu_count())
+        self.nlp_model_path = nlp_model_path
+        self.text_noise = text_noise
+        self.cache_settings = cache_settings
+        # Seconds a task may take before iter_unordered gives up on it; None or 0 waits forever.
+        self.task_timeout = task_timeout
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            logger.info(f"Starting worker pool with {self.processes} processes.")
+            self.pool = Pool(self.processes, initializer=init_worker,
+                             initargs=(self.nlp_model_path, self.text_noise, self.cache_settings,
+                                       self.cpu_budget, self.metrics_dir, self.log_queue))
+            atexit.register(self.close)
+        return self
+
+    def map(self, func, iterable):
+        return self.start().pool.map(func, iterable)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        return self.start().pool.imap_unordered(func, iterable, chunksize)
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        return self.start().pool.apply_async(func, args, callback=callback, error_callback=error_callback)
+
+    def iter_unordered(self, func, items, max_in_flight=None, timeout=None, on_done=None):
+        """Yield func(item) results in completion order, with at most max_in_flight tasks submitted.
+
+        Unlike Pool.imap_unordered, which drains the whole input into the pool's task
+        queue and buffers every finished result, this only takes the next item from
+        items when it can be submitted, so memory stays flat for arbitrarily large
+        inputs. The pool's shared task handler never blocks, and if the caller stops
+        iterating only the tasks already in flight are left to finish.
+
+        A task still running timeout seconds (default task_timeout) after it was
+        submitted yields TaskError(item, TaskTimeout) and its late result is dropped:
+        multiprocessing.Pool never reports a task whose worker died, so without a
+        timeout such a task would block the caller forever.
+
+        on_done(item) is called exactly once per submitted item, when its task
+        finishes or times out, even after the caller stopped iterating; it runs on
+        the pool's result thread or a timer thread, so it must be quick.
+        """
+        max_in_flight = max_in_flight or 2 * self.processes
+        timeout = self.task_timeout if timeout is None else timeout
+        done = queue.Queue()
+        # Submission sequence number -> (item, time.monotonic() by which it must finish)
+        pending = {}
+        counter = iter(range(sys.maxsize))
+
+        def release(item):
+            if on_done is not None:
+                try:
+                    on_done(item)
+                except Exception as e:
+                    # An exception here would stop the pool's result thread.
+                    logger.error(f"on_done failed for {item}: {e}")
+
+        def finish(seq, result):
+            # Runs on the pool's result thread; a task given up on is no longer pending.
+            entry = pending.pop(seq, None)
+            if entry is not None:
+                done.put(result)
+                release(entry[0])
+
+        def submit(item):
+            seq = next(counter)
+            pending[seq] = (item, time.monotonic() + timeout if timeout else None)
+            self.apply_async(func, (item,), callback=lambda result: finish(seq, result),
+                             error_callback=lambda e: finish(seq, TaskError(item, e)))
+
+        def next_expiry():
+            expiries = [expiry for _, expiry in list(pending.values()) if expiry is not None]
+            return min(expiries) if expiries else None
+
+        def expire():
+            now = time.monotonic()
+            for seq, (item, expiry) in list(pending.items()):
+                if expiry is not None and expiry <= now and pending.pop(seq, None) is not None:
+                    logger.error(f"Task for {item} did not finish within {timeout} seconds; giving up on it.")
+                    done.put(TaskError(item, TaskTimeout(f"Task did not finish within {timeout} seconds.")))
+                    release(item)
+
+        def next_result():
+            while True:
+                expiry = next_expiry()
+                try:
+                    return done.get(timeout=None if expiry is None else max(0.0, expiry - time.monotonic()))
+                except queue.Empty:
+                    expire()
+
+        def expire_abandoned():
+            # The caller stopped iterating: still give up on tasks that overrun, so on_done fires for them.
+            while True:
+                expiry = next_expiry()
+                if expiry is None:
+                    return
+                time.sleep(max(0.0, expiry - time.monotonic()))
+                expire()
+
+        in_flight = 0
+        try:
+            for item in items:
+                submit(item)
+                in_flight += 1
+                while in_flight >= max_in_flight:
+                    yield next_result()
+                    in_flight -= 1
+
+            while in_flight:
+                yield next_result()
+                in_flight -= 1
+        finally:
+            if on_done is not None and timeout and pending:
+                threading.Thread(target=expire_abandoned, name="task-expiry", daemon=True).start()
+
+    def iter_admitted(self, func, items, admission, images_per_item=1):
+        """iter_unordered within an Admission: each task holds the units of its images until it finishes or times out.
+
+        Items not yet submitted when the caller stops iterating are cancelled, so
+        their units go back to the controller at once.
+        """
+        items = list(items)
+        submitted = 0
+
+        def submission_order():
+            nonlocal submitted
+            for item in items:
+                submitted += 1
+                yield item
+
+        results = self.iter_unordered(func, submission_order(), max(1, admission.units // images_per_item),
+                                      on_done=lambda item: admission.release(images_per_item))
+        try:
+            yield from results
+        finally:
+            results.close()
+            admission.cancel((len(items) - submitted) * images_per_item)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def terminate(self):
+        """Stop the workers now, abandoning tasks in flight (e.g. on Ctrl-C)."""
+        if self.pool is not None:
+            if self.log_queue is not None:
+                # Terminated workers run no exit handlers; let their log senders ship what they have
+                # buffered (one send interval) and the queue's feeder threads write it to the pipe.
+                time.sleep(2 * log_send_interval)
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+def process_image_with_path(image_path, model=None, deadline=None, strict=False):
+    """Pool task: like process_image, but keeps the full path so callers can key results by it."""
+    return {
+        "image_path": image_path,
+        "key_value_pairs": run_processor(image_path, model, deadline, strict)
+    }
+
+
+def process_queued_task(task):
+    """Pool task for distributed workers: process the image of a leased work queue item, given as (task id, payload).
+
+    A page on which a stage failed raises, so the item is failed and retried instead of acked.
+    """
+    task_id, payload = task
+    return task_id, run_processor(payload["item"], payload.get("model"), strict=True)
+
+
+def process_image_with_timings(image_path, profile=False):
+    """Pool task for jobs: like process_image, plus the path, per-stage timings and image stats.
+
+    With profile=True the stages are run under cProfile and the pstats summaries
+    are returned under "profile".
+    """
+    processor = get_worker_processor()
+    if profile:
+        processor.start_profiling()
+    key_value_pairs = run_processor(image_path)
+    result = {
+        "image_path": image_path,
+        "image_filename": os.path.basename(image_path),
+        "key_value_pairs": key_value_pairs,
+        "stage_timings": dict(processor.stage_timings),
+        "image_stats": dict(processor.image_stats)
+    }
+    if profile:
+        result["profile"] = processor.profile_report()
+    return result
@@ -0,0 +1,56 @@
+import os, sys
+import random
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.rules import RuleEngine, DocumentType, RULES, literal_prefix
+
+WORDS = ["APPLICANT", "NAME", "DATE", "BIRTH", "LICENSE", "NUMBER", "COURT", "REPORT", "Health", "Questionnaire",
+         "Driver", "MOTOR", "VEHICLE", "ADMINISTRATION", "DC-1234", "F0003-123", "ID 12", "X9"]
+
+
+def synthetic_types(count, rng):
+    """The shipped types plus made-up ones, with anchored, unanchored and alternation patterns."""
+    types = list(RULES.document_types)
+    for index in range(len(types), count):
+        patterns = [rf"F{index:04d}[-\s]?\d{{3,4}}", r"\d{2}\s?X\d", rf"(ID|NO) {index}", rf"F?{index}-\d"][:rng.randint(1, 4)]
+        keywords = [" ".join(rng.choice(WORDS) for _ in range(2)) for _ in range(rng.randint(0, 3))]
+        types.append(DocumentType(f"T{index}", patterns, keywords, threshold=rng.randint(1, 4)))
+    return types[:count]
+
+
+def synthetic_page(rng, count):
+    lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6))) + f" {rng.randint(0, 99)}" for _ in range(count)]
+    lines[0] = "MOTOR VEHICLE ADMINISTRATION"
+    lines[1] = f"Form (DC-{rng.randint(100, 9999)})"
+    return lines
+
+
+@pytest.mark.parametrize("types", [1, 3, 12, 40])
+def test_automaton_matches_scan(types):
+    rng = random.Random(types)
+    document_types = synthetic_types(types, rng)
+    scan = RuleEngine("", {}, document_types, automaton_min_types=types + 1)
+    automaton = RuleEngine("", {}, document_types, automaton_min_types=0)
+    assert not scan.use_automaton and automaton.use_automaton
+    for _ in range(50):
+        page = synthetic_page(rng, rng.randint(2, 30))
+        assert automaton.score_automaton(page) == scan.score_scan(page)
+        assert automaton.classify(page) == scan.classify(page)
+
+
+def test_shipped_rules_type_a_dc_page():
+    page = ["MOTOR VEHICLE ADMINISTRATION", "Health Questionnaire", "Form (DC-0421)"]
+    assert RULES.classify(page) == ("DC", "DC-0421", 4)
+    assert RULES.classify(["nothing to see"])[0] is None
+
+
+@pytest.mark.parametrize("pattern, prefix", [
+    (r"DC[-\s]?\d{3,4}", "DC"),
+    (r"F?12-\d", ""),
+    (r"(ID|NO) 7", ""),
+    (r"ID|NO", ""),
+    (r"ABC?D", "AB"),
+    (r"\d+X", ""),
+])
+def test_literal_prefix(pattern, prefix):
+    assert literal_prefix(pattern) == prefix
@@ -0,0 +1,90 @@
+import os, sys
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.textdetector import (decode_predictions, decode_predictions_loop, non_max_suppression_legacy,
+                              fast_non_max_suppression, group_boxes_dilate, group_boxes)
+
+
+def random_maps(rows, cols, seed):
+    """EAST-shaped score and geometry maps: distances up to 60 px, angles within +-pi/4."""
+    rng = np.random.default_rng(seed)
+    scores = rng.random((1, 1, rows, cols), dtype=np.float32)
+    geometry = np.empty((1, 5, rows, cols), dtype=np.float32)
+    geometry[0, :4] = rng.random((4, rows, cols), dtype=np.float32) * 60
+    geometry[0, 4] = (rng.random((rows, cols), dtype=np.float32) - 0.5) * (np.pi / 2)
+    return scores, geometry
+
+
+def assert_same_decoding(scores, geometry, min_confidence):
+    rects, confidences = decode_predictions(scores, geometry, min_confidence)
+    loop_rects, loop_confidences = decode_predictions_loop(scores, geometry, min_confidence)
+    assert rects == loop_rects
+    assert [float(c) for c in confidences] == [float(c) for c in loop_confidences]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("min_confidence", [0.0, 0.5, 0.95])
+def test_decode_predictions_matches_loop(seed, min_confidence):
+    scores, geometry = random_maps(40, 56, seed)
+    assert_same_decoding(scores, geometry, min_confidence)
+
+
+def test_decode_predictions_all_below_threshold():
+    scores, geometry = random_maps(16, 16, 0)
+    assert decode_predictions(scores, geometry, 1.5) == ([], [])
+    assert_same_decoding(scores, geometry, 1.5)
+
+
+def test_decode_predictions_empty_maps():
+    scores, geometry = random_maps(0, 0, 0)
+    assert decode_predictions(scores, geometry, 0.5) == ([], [])
+    assert_same_decoding(scores, geometry, 0.5)
+
+
+def candidate_boxes(count, width, height, seed):
+    """EAST-like candidates: jittered, overlapping copies of word boxes along text lines."""
+    rng = np.random.default_rng(seed)
+    words = max(1, count // 8)
+    cx = rng.integers(0, width, words)
+    cy = rng.integers(0, height // 40, words) * 40 + 20
+    ww = rng.integers(20, 160, words)
+    hh = rng.integers(12, 30, words)
+    owner = rng.integers(0, words, count)
+    jitter = rng.normal(0, 3, (count, 4))
+    x1 = cx[owner] - ww[owner] // 2 + jitter[:, 0]
+    y1 = cy[owner] - hh[owner] // 2 + jitter[:, 1]
+    x2 = np.maximum(cx[owner] + ww[owner] // 2 + jitter[:, 2], x1)
+    y2 = np.maximum(cy[owner] + hh[owner] // 2 + jitter[:, 3], y1)
+    boxes = np.stack([x1, y1, x2, y2], axis=1).astype(int)
+    return boxes, list(rng.random(count).astype(np.float32) * 0.5 + 0.5)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("count", [1, 50, 2000])
+@pytest.mark.parametrize("keys", ["probs", "tied_probs", "none"])
+def test_fast_nms_matches_legacy(seed, count, keys):
+    boxes, probs = candidate_boxes(count, 1280, 1600, seed)
+    # Without probs, and with coarse ones, many keys tie: both versions must break ties alike.
+    probs = {"probs": probs, "tied_probs": [round(float(p), 1) for p in probs], "none": None}[keys]
+    legacy = non_max_suppression_legacy(boxes, probs)
+    fast = fast_non_max_suppression(boxes, probs)
+    assert sorted(map(tuple, fast.tolist())) == sorted(map(tuple, legacy.tolist()))
+
+
+def test_nms_without_boxes():
+    assert fast_non_max_suppression(np.zeros((0, 4), dtype=int)) == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("count", [1, 50, 2000])
+def test_group_boxes_matches_dilation(seed, count):
+    boxes, _ = candidate_boxes(count, 1280, 1600, seed)
+    assert sorted(group_boxes(boxes, 1280, 1600, 5)) == sorted(group_boxes_dilate(boxes, 1280, 1600, 5))
+
+
+def test_group_boxes_off_page_and_empty():
+    # Boxes partly or wholly outside the page, and reversed corners.
+    boxes = [(-50, -50, 10, 10), (1270, 1590, 1400, 1700), (2000, 2000, 2100, 2100), (300, 200, 250, 180)]
+    assert sorted(group_boxes(boxes, 1280, 1600, 5)) == sorted(group_boxes_dilate(boxes, 1280, 1600, 5))
+    assert group_boxes([], 1280, 1600, 5) == []